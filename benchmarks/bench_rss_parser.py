@@ -0,0 +1,50 @@
+"""
+RSS Parser Benchmark
+====================
+Compares the streaming XML parser with the old regex parser on large
+synthetic Atom feeds shaped like Reddit's.
+
+Run from the project root:
+    python -m benchmarks.bench_rss_parser
+"""
+
+import time
+
+from benchmarks.fixtures import make_atom_feed
+from src.reddit_fetcher import _parse_rss_regex
+from src.rss_parser import iter_rss_posts
+
+FEED_SIZES = [100, 1000, 10000]
+LIMITS = [5, 100, None]
+REPEATS = 5
+
+
+def _best_of(fn, repeats=REPEATS):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'entries':>8} {'limit':>6} {'regex (ms)':>12} {'stream (ms)':>12} {'speedup':>8}")
+    for size in FEED_SIZES:
+        feed = make_atom_feed(size)
+        for limit in LIMITS:
+            effective = size if limit is None else limit
+            regex_posts = _parse_rss_regex(feed, effective)
+            stream_posts = list(iter_rss_posts(feed, limit))
+            assert regex_posts == stream_posts, "Parsers disagree"
+
+            regex_time = _best_of(lambda: _parse_rss_regex(feed, effective))
+            stream_time = _best_of(lambda: list(iter_rss_posts(feed, limit)))
+            print(
+                f"{size:>8} {str(limit):>6} {regex_time * 1000:>12.2f} "
+                f"{stream_time * 1000:>12.2f} {regex_time / stream_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Benchmark Suite
+===============
+Offline throughput and peak-memory benchmarks for the hot paths, and for
+a whole run against local stand-ins (no network, no API key, no inbox):
+
+    parse_rss      reddit_fetcher._parse_rss on an Atom feed of N entries
+    parse_json     json.loads + reddit_fetcher._parse_json_listing on N posts
+    format_posts   llm_analyzer._format_posts_for_ai on N posts
+    build_prompt   llm_analyzer.build_prompt (with the default token budget)
+    build_email    email_sender.build_message + render_message for N stories
+    enrich         comments.fetch_top_comments for N threads from the Reddit
+                   stand-in (no cache; set --latency to see the worker pool at work)
+    pipeline       main.run_newsletter for N posts over 4 subreddits, fetched
+                   from benchmarks/reddit_stub.py, curated by the LLM stub
+                   server and delivered to benchmarks/smtp_sink.py
+
+Run from the project root:
+
+    python -m benchmarks.bench_suite                          # everything, sizes 10..10000
+    python -m benchmarks.bench_suite --cases parse_rss pipeline --sizes 100 1000
+    python -m benchmarks.bench_suite --latency 0.02 --forbidden-rate 0.05 --rate-limit-rate 0.1
+
+Each case is timed best-of-N, then run once more under tracemalloc for its
+peak memory. Results are saved to benchmarks/results/<time>-<commit>.json;
+compare against an earlier run to catch regressions between commits:
+
+    python -m benchmarks.bench_suite --baseline latest --fail-on-regression
+    python -m benchmarks.bench_suite --compare benchmarks/results/A.json benchmarks/results/B.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+from benchmarks import reddit_stub, smtp_sink
+from benchmarks.fixtures import make_atom_feed, make_json_listing, make_newsletter_html, make_posts
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+SIZES = [10, 100, 1000, 10000]
+SUBREDDITS = ["LocalLLaMA", "MachineLearning", "technews", "AI_Agents"]
+
+# Repeats per case (best-of), fewer for the slow end-to-end run
+REPEATS = {"pipeline": 3}
+DEFAULT_REPEATS = 7
+
+# Per-host limit for the stand-ins: high enough never to be the bottleneck
+LOCAL_RATE_LIMIT = {"requests_per_second": 1000, "burst": 1000}
+
+# Relative change that counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+# --- Micro benchmarks: each returns a zero-argument callable for size N ---
+
+def _case_parse_rss(size):
+    from src.reddit_fetcher import _parse_rss
+    feed = make_atom_feed(size)
+    return lambda: _parse_rss(feed, size)
+
+
+def _case_parse_json(size):
+    from src.reddit_fetcher import _parse_json_listing
+    body = json.dumps(make_json_listing(size))
+    return lambda: _parse_json_listing(json.loads(body), size)
+
+
+def _case_format_posts(size):
+    from src.llm_analyzer import _format_posts_for_ai
+    posts = make_posts(size)
+    return lambda: _format_posts_for_ai(posts)
+
+
+def _case_build_prompt(size):
+    from src.llm_analyzer import build_prompt
+    posts = make_posts(size)
+    return lambda: build_prompt(posts, token_budget=30000)
+
+
+def _case_build_email(size):
+    from src import email_sender
+    html = make_newsletter_html(make_posts(size), stories=size)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            msg = email_sender.build_message(html, "Benchmark", "bench@example.com", newsletter="bench")
+        return email_sender.render_message(msg)
+    return run
+
+
+# --- End to end ---
+
+class _StandIns:
+    """Reddit stand-in, LLM stub and SMTP sink, plus a settings file using them."""
+
+    def __init__(self, latency, forbidden_rate, rate_limit_rate, seed):
+        from src.llm_stub_server import serve as serve_llm
+
+        self.directory = Path(tempfile.mkdtemp(prefix="newsletter-bench-"))
+        self.reddit = reddit_stub.serve(
+            port=0, posts_per_subreddit=0, latency=latency, forbidden_rate=forbidden_rate,
+            rate_limit_rate=rate_limit_rate, seed=seed,
+        )
+        self.llm = serve_llm(port=0, latency=0.0, chunk_delay=0.0, chunk_chars=400, seed=seed)
+        self.smtp = smtp_sink.serve(port=0)
+
+    def close(self):
+        for server in (self.reddit, self.llm, self.smtp):
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def settings(self, size):
+        """Settings for a run over `size` posts, with all state under a scratch directory."""
+        state = self.directory / "state"
+        per_subreddit = math.ceil(size / len(SUBREDDITS))
+        self.reddit.settings.posts_per_subreddit = per_subreddit
+        return {
+            "subreddits": SUBREDDITS,
+            "fetch": {
+                "posts_per_subreddit": per_subreddit,
+                "delay_between_requests": 0,
+                "base_url": f"http://127.0.0.1:{self.reddit.server_address[1]}",
+                "rate_limits": {"127.0.0.1": LOCAL_RATE_LIMIT},
+                "endpoint_health": {"state_file": str(state / "endpoint_health.json")},
+            },
+            "cache": {"enabled": False, "directory": str(state / "http")},
+            "newsletter": {"output_directory": str(state / "newsletters")},
+            "llm": {
+                "provider": "openai",
+                "model": "stub",
+                "fallback_model": None,
+                "base_url": f"http://127.0.0.1:{self.llm.server_address[1]}/v1",
+                "retry": {"base_delay": 0.01, "max_delay": 0.05},
+                "cache": {"enabled": False, "directory": str(state / "llm")},
+            },
+            "email": {
+                "smtp": {"host": "127.0.0.1", "port": self.smtp.server_address[1], "security": "none",
+                         "batch_delay": 0},
+                "spool": {"directory": str(state / "spool")},
+            },
+            "seen_index": {"path": str(state / "seen_posts.sqlite3")},
+            "archive": {"directory": str(state / "archive"), "site_directory": str(state / "site")},
+            "checkpoints": {"directory": str(state / "runs")},
+            "metrics": {"enabled": False},
+        }
+
+    def enrich(self, size):
+        from src import comments, reddit_fetcher
+
+        reddit_fetcher.configure_endpoints(f"http://127.0.0.1:{self.reddit.server_address[1]}")
+        reddit_fetcher.configure_rate_limits(0, {"127.0.0.1": LOCAL_RATE_LIMIT})
+        comments.configure(cache_directory=None)
+        posts = make_posts(size)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = comments.fetch_top_comments(posts)
+            if not all(results):
+                raise RuntimeError("some comment threads could not be fetched")
+        return run
+
+    def pipeline(self, size):
+        import main
+
+        config_path = self.directory / f"settings-{size}.yaml"
+        config_path.write_text(yaml.safe_dump(self.settings(size)), encoding="utf-8")
+        os.environ["NEWSLETTER_CONFIG"] = str(config_path)
+        os.environ.update(EMAIL_ADDRESS="bench@example.com", EMAIL_APP_PASSWORD="",
+                          RECIPIENT_EMAIL="reader@example.com")
+        state = self.directory / "state"
+
+        def run():
+            shutil.rmtree(state, ignore_errors=True)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                ok = main.run_newsletter(send_email_flag=True, use_llm_cache=False)
+            if not ok:
+                raise RuntimeError("pipeline run failed:\n" + output.getvalue()[-2000:])
+        return run
+
+
+CASES = {
+    "parse_rss": _case_parse_rss,
+    "parse_json": _case_parse_json,
+    "format_posts": _case_format_posts,
+    "build_prompt": _case_build_prompt,
+    "build_email": _case_build_email,
+    "enrich": None,
+    "pipeline": None,
+}
+
+
+def measure(fn, repeats):
+    """
+    Time `fn` best-of-`repeats` (after one warm-up call), then once more
+    under tracemalloc.
+
+    Returns:
+        Dictionary with 'best_seconds', 'median_seconds' and 'peak_memory_bytes'
+    """
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"best_seconds": min(times), "median_seconds": statistics.median(times), "peak_memory_bytes": peak}
+
+
+def run_suite(cases, sizes, latency=0.0, forbidden_rate=0.0, rate_limit_rate=0.0, seed=1):
+    """
+    Run the selected cases at every size.
+
+    Returns:
+        List of result dictionaries (case, size, timings, throughput, peak memory)
+    """
+    results = []
+    stand_ins = None
+    try:
+        for case in cases:
+            for size in sizes:
+                if case in ("enrich", "pipeline"):
+                    if stand_ins is None:
+                        stand_ins = _StandIns(latency, forbidden_rate, rate_limit_rate, seed)
+                    fn = getattr(stand_ins, case)(size)
+                else:
+                    fn = CASES[case](size)
+                stats = measure(fn, REPEATS.get(case, DEFAULT_REPEATS))
+                result = {
+                    "case": case,
+                    "size": size,
+                    **stats,
+                    "items_per_second": size / stats["best_seconds"] if stats["best_seconds"] else None,
+                }
+                results.append(result)
+                print(f"    {case:<14} {size:>6}  {stats['best_seconds'] * 1000:>10.2f} ms  "
+                      f"{result['items_per_second']:>12,.0f} items/s  "
+                      f"{stats['peak_memory_bytes'] / 1024 / 1024:>8.2f} MB peak")
+    finally:
+        if stand_ins is not None:
+            stand_ins.close()
+    return results
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, settings):
+    """
+    Save a run to benchmarks/results/<time>-<commit>.json.
+
+    Returns:
+        Path of the saved file
+    """
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results,
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return path
+
+
+def load_results(path):
+    """A saved run ("latest" for the most recent one in benchmarks/results)."""
+    if path == "latest":
+        saved = sorted(RESULTS_DIR.glob("*.json"))
+        if not saved:
+            raise FileNotFoundError(f"no saved results in {RESULTS_DIR}")
+        path = saved[-1]
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Print throughput and peak-memory changes per (case, size).
+
+    Returns:
+        Number of regressions beyond `threshold`
+    """
+    before = {(r["case"], r["size"]): r for r in baseline["results"]}
+    print(f"\n📊 Compared with {baseline.get('commit', '?')} ({baseline.get('created_at', '?')})")
+    print(f"    {'case':<14} {'size':>6}  {'throughput':>11}  {'peak memory':>11}")
+    regressions = 0
+    for result in current["results"]:
+        old = before.get((result["case"], result["size"]))
+        if old is None:
+            continue
+        speed = result["items_per_second"] / old["items_per_second"] - 1
+        memory = result["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1) - 1
+        flags = []
+        if speed < -threshold:
+            flags.append("slower")
+        if memory > threshold:
+            flags.append("more memory")
+        regressions += bool(flags)
+        mark = f"  ❌ {', '.join(flags)}" if flags else ""
+        print(f"    {result['case']:<14} {result['size']:>6}  {speed:>+10.1%}  {memory:>+11.1%}{mark}")
+    if regressions:
+        print(f"\n    ❌ {regressions} regression(s) beyond {threshold:.0%}")
+    else:
+        print(f"\n    ✅ No regressions beyond {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--latency", type=float, default=0.0, help="Reddit stand-in latency (seconds)")
+    parser.add_argument("--forbidden-rate", type=float, default=0.0, help="Share of feed requests answered with 403")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of feed requests answered with 429")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the injected failures")
+    parser.add_argument("--baseline", help="Saved results to compare with (a path, or 'latest')")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two saved results without running anything")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change that counts as a regression (default 0.10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--no-save", action="store_true", help="Don't save the results")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(load_results(args.compare[0]), load_results(args.compare[1]), args.threshold)
+        sys.exit(1 if regressions and args.fail_on_regression else 0)
+
+    # Load the baseline first, so "latest" isn't the run we're about to save
+    baseline = load_results(args.baseline) if args.baseline else None
+
+    settings = {
+        "latency": args.latency,
+        "forbidden_rate": args.forbidden_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "seed": args.seed,
+    }
+    print(f"⏱️  Benchmarking {', '.join(args.cases)} at sizes {', '.join(map(str, args.sizes))}\n")
+    results = run_suite(args.cases, args.sizes, **settings)
+
+    current = {"results": results}
+    if not args.no_save:
+        path = save_results(results, settings)
+        print(f"\n💾 Saved to {path.relative_to(PROJECT_ROOT)}")
+
+    if baseline is not None:
+        regressions = compare(baseline, current, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark Fixtures
+==================
+Deterministic Reddit-shaped data for the benchmarks and the local Reddit
+stand-in: Atom feeds, JSON listings, posts and newsletter HTML.
+
+The same (subreddit, index) always yields the same post, so results are
+comparable between commits. Titles and bodies are drawn from a word pool
+rather than repeated, so duplicate detection and ranking see realistic,
+mostly distinct stories instead of collapsing everything into one.
+"""
+
+import hashlib
+import random
+from datetime import datetime, timezone
+from html import escape
+
+WORDS = (
+    "model agent benchmark release open weights inference quantized context window "
+    "training dataset research paper startup funding chip gpu cluster latency memory "
+    "reasoning vision speech robot policy regulation privacy security breach outage "
+    "framework library compiler kernel browser phone cloud pricing license lawsuit "
+    "acquisition layoffs hiring survey leak roadmap preview update patch exploit "
+    "energy battery satellite network protocol database storage editor terminal"
+).split()
+
+DOMAINS = ("example.com", "news.example.org", "blog.example.net", "arxiv.example.edu", "github.example.io")
+
+# Fixed "now" for every fixture (2026-01-01T00:00:00Z)
+EPOCH = 1767225600
+
+
+def _random(subreddit, index):
+    seed = hashlib.sha256(f"{subreddit}:{index}".encode("utf-8")).digest()
+    return random.Random(seed)
+
+
+def make_post_id(subreddit, index):
+    """Reddit-like base-36 ID, unique per (subreddit, index)."""
+    value = int(hashlib.sha256(f"{subreddit}/{index}".encode("utf-8")).hexdigest()[:12], 16)
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while value:
+        value, rest = divmod(value, 36)
+        out = digits[rest] + out
+    return out[:9]
+
+
+def make_post(subreddit, index):
+    """
+    One deterministic post, in the same shape the fetcher returns.
+
+    Returns:
+        Dictionary with 'id', 'title', 'score', 'url', 'reddit_link', 'text',
+        'created_utc' and 'author'
+    """
+    rng = _random(subreddit, index)
+    post_id = make_post_id(subreddit, index)
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 12))).capitalize()
+    slug = "_".join(title.lower().split()[:5])
+    sentences = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        for _ in range(rng.randint(3, 12))
+    ]
+    return {
+        "id": post_id,
+        "title": f"{title} ({subreddit} #{index})",
+        "score": rng.randint(1, 5000),
+        "url": f"https://{rng.choice(DOMAINS)}/{subreddit.lower()}/{post_id}/{slug}",
+        "reddit_link": f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/{slug}/",
+        "text": " ".join(sentences),
+        "created_utc": float(EPOCH - index * 600 - rng.randint(0, 599)),
+        "author": f"user{rng.randint(1, 99999)}",
+    }
+
+
+def make_posts(count, subreddits=("LocalLLaMA", "MachineLearning", "technews", "AI_Agents")):
+    """`count` posts spread round-robin over `subreddits`."""
+    return [make_post(subreddits[i % len(subreddits)], i // len(subreddits)) for i in range(count)]
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def make_atom_feed(entries, subreddit="LocalLLaMA", start=0):
+    """
+    A Reddit-style Atom feed with `entries` entries, starting at post `start`.
+    """
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/">'
+        f'<category term="{subreddit}" label="r/{subreddit}"/>'
+        f'<id>/r/{subreddit}/top/.rss?t=week</id>'
+        f'<link rel="self" href="https://www.reddit.com/r/{subreddit}/top/.rss?t=week" type="application/atom+xml" />'
+        f'<title>top scoring links : {subreddit}</title>'
+    ]
+    for index in range(start, start + entries):
+        post = make_post(subreddit, index)
+        body = (
+            '<!-- SC_OFF --><div class="md"><p>'
+            + escape(post["text"]).replace(". ", ". <em>Also:</em> ", 1)
+            + "</p></div><!-- SC_ON --> &#32; submitted by &#32; "
+            f'<a href="https://www.reddit.com/user/{post["author"]}"> /u/{post["author"]} </a> <br/> '
+            f'<span><a href="{post["url"]}">[link]</a></span> &#32; '
+            f'<span><a href="{post["reddit_link"]}">[comments]</a></span>'
+        )
+        published = _iso(post["created_utc"])
+        parts.append(
+            "<entry>"
+            f"<author><name>/u/{post['author']}</name><uri>https://www.reddit.com/user/{post['author']}</uri></author>"
+            f'<category term="{subreddit}" label="r/{subreddit}"/>'
+            f'<content type="html">{escape(body)}</content>'
+            f"<id>t3_{post['id']}</id>"
+            f'<media:thumbnail url="https://{DOMAINS[0]}/thumb/{post["id"]}.jpg" />'
+            f'<link href="{post["reddit_link"]}" />'
+            f"<updated>{published}</updated>"
+            f"<published>{published}</published>"
+            f"<title>{escape(post['title'])}</title>"
+            "</entry>"
+        )
+    parts.append("</feed>")
+    return "".join(parts)
+
+
+def make_json_listing(entries, subreddit="LocalLLaMA", start=0):
+    """
+    A Reddit-style JSON listing (as a dictionary) with `entries` posts,
+    starting at post `start`.
+    """
+    children = []
+    for index in range(start, start + entries):
+        post = make_post(subreddit, index)
+        children.append({
+            "kind": "t3",
+            "data": {
+                "id": post["id"],
+                "name": f"t3_{post['id']}",
+                "subreddit": subreddit,
+                "title": post["title"],
+                "score": post["score"],
+                "url": post["url"],
+                "permalink": post["reddit_link"].replace("https://www.reddit.com", ""),
+                "selftext": post["text"],
+                "author": post["author"],
+                "created_utc": post["created_utc"],
+                "num_comments": post["score"] // 7,
+            },
+        })
+    after = children[-1]["data"]["name"] if children else None
+    return {"kind": "Listing", "data": {"after": after, "dist": len(children), "children": children}}
+
+
+def make_comment_thread(subreddit, post_id, comments=20):
+    """
+    A Reddit-style comments response for a thread: [post listing, comment listing].
+    The first comment is a stickied moderator note, like on many subreddits.
+    """
+    rng = _random(subreddit, post_id)
+    children = [{"kind": "t1", "data": {"author": "AutoModerator", "score": 1, "stickied": True,
+                                       "body": "Please keep the discussion civil."}}]
+    for i in range(comments):
+        body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 60))).capitalize() + "."
+        children.append({"kind": "t1", "data": {
+            "id": f"c{i}",
+            "author": f"user{rng.randint(1, 99999)}",
+            "score": rng.randint(-5, 2000),
+            "stickied": False,
+            "body": "[deleted]" if i % 9 == 8 else body,
+            "replies": "",
+        }})
+    children.append({"kind": "more", "data": {"count": 42, "children": ["x1", "x2"]}})
+    post = {"kind": "t3", "data": {"id": post_id, "name": f"t3_{post_id}", "subreddit": subreddit}}
+    return [
+        {"kind": "Listing", "data": {"children": [post]}},
+        {"kind": "Listing", "data": {"children": children}},
+    ]
+
+
+def make_newsletter_html(posts, stories=7):
+    """Newsletter HTML shaped like the LLM's output, for the first `stories` posts."""
+    html = ["<h2>This Week in Tech</h2>\n"]
+    for post in posts[:stories]:
+        html.append(
+            '<div style="margin-bottom: 25px;">\n'
+            f'    <h3 style="color: #1a1a1a; margin-bottom: 5px;">{escape(post["title"])}</h3>\n'
+            f'    <p style="color: #333; line-height: 1.6;">{escape(post["text"][:600])}</p>\n'
+            '    <p style="font-size: 14px; margin-top: 5px;">\n'
+            f'        <a href="{post["url"]}" style="color: #990000; font-weight: bold; text-decoration: none;">[Read Article]</a>\n'
+            '        <span style="color: #ccc;">|</span>\n'
+            f'        <a href="{post["reddit_link"]}" style="color: #666; text-decoration: none;">[Discuss on Reddit]</a>\n'
+            "    </p>\n"
+            "</div>\n"
+        )
+    return "".join(html)
@@ -0,0 +1,187 @@
+"""
+Reddit Stand-in Server
+======================
+A local server that answers Reddit's listing URLs with deterministic
+fixtures (see benchmarks/fixtures.py), for running the fetcher offline:
+
+    /r/<subreddit>/top/.rss?t=week&limit=100&after=t3_<id>     Atom feed
+    /r/<subreddit>/top.json?t=week&limit=100&after=t3_<id>     JSON listing
+    /r/<subreddit>/comments/<id>/<slug>.json                    comment thread
+
+Every subreddit has `posts_per_subreddit` posts and pages follow the
+`after` cursor like Reddit's. Latency, 403 blocks and 429 rate limits can
+be injected to exercise the fetcher's retry and fallback paths:
+
+    python -m benchmarks.reddit_stub --port 8900 --latency 0.05 --forbidden-rate 0.05 --rate-limit-rate 0.1
+
+Then point the fetcher at it in config/settings.yaml:
+
+    fetch:
+      base_url: http://127.0.0.1:8900
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fixtures import make_atom_feed, make_comment_thread, make_json_listing, make_post_id
+
+_PATH_RE = re.compile(r"^/r/([A-Za-z0-9_]+)/top(/\.rss|\.json)/?$")
+_COMMENTS_RE = re.compile(r"^/r/([A-Za-z0-9_]+)/comments/([a-z0-9]+)(?:/[^/]*)?/?\.json$")
+
+PAGE_SIZE_CAP = 100
+
+
+class StubSettings:
+    """Behaviour knobs shared by all request handlers."""
+
+    def __init__(self, posts_per_subreddit=1000, latency=0.0, forbidden_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=0, seed=None):
+        self.posts_per_subreddit = posts_per_subreddit
+        self.latency = latency
+        self.forbidden_rate = forbidden_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def roll(self):
+        """Decide the fate of one request: 'forbidden', 'rate_limit' or 'ok'."""
+        with self._lock:
+            self.requests += 1
+            r = self._random.random()
+        if r < self.forbidden_rate:
+            return "forbidden"
+        if r < self.forbidden_rate + self.rate_limit_rate:
+            return "rate_limit"
+        return "ok"
+
+
+@lru_cache(maxsize=64)
+def _post_index(subreddit, posts):
+    """Post ID -> position in the subreddit's listing (for the `after` cursor)."""
+    return {make_post_id(subreddit, i): i for i in range(posts)}
+
+
+@lru_cache(maxsize=1024)
+def _render_page(kind, subreddit, start, count):
+    if kind == "rss":
+        return make_atom_feed(count, subreddit, start).encode("utf-8"), "application/atom+xml; charset=UTF-8"
+    listing = make_json_listing(count, subreddit, start)
+    return json.dumps(listing).encode("utf-8"), "application/json; charset=UTF-8"
+
+
+@lru_cache(maxsize=1024)
+def _render_thread(subreddit, post_id):
+    return json.dumps(make_comment_thread(subreddit, post_id)).encode("utf-8")
+
+
+def make_handler(settings):
+    """Request handler class bound to `settings`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type="text/plain", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = _PATH_RE.match(url.path)
+            thread = _COMMENTS_RE.match(url.path)
+            if not match and not thread:
+                self._send(404, b"not found")
+                return
+
+            time.sleep(settings.latency)
+            fate = settings.roll()
+            if fate == "forbidden":
+                self._send(403, b"blocked")
+                return
+            if fate == "rate_limit":
+                self._send(429, b"too many requests", headers={"Retry-After": str(settings.retry_after)})
+                return
+
+            if thread:
+                self._send(200, _render_thread(*thread.groups()), "application/json; charset=UTF-8")
+                return
+
+            subreddit, kind = match.group(1), "rss" if match.group(2) == "/.rss" else "json"
+            query = parse_qs(url.query)
+            try:
+                limit = min(int(query.get("limit", ["25"])[0]), PAGE_SIZE_CAP)
+            except ValueError:
+                limit = 25
+            start = 0
+            after = query.get("after", [""])[0]
+            if after.startswith("t3_"):
+                index = _post_index(subreddit, settings.posts_per_subreddit).get(after[3:])
+                start = settings.posts_per_subreddit if index is None else index + 1
+            count = max(0, min(limit, settings.posts_per_subreddit - start))
+
+            body, content_type = _render_page(kind, subreddit, start, count)
+            self._send(200, body, content_type)
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8900, **settings):
+    """
+    Start the stand-in server in a background thread.
+
+    Returns:
+        The running ThreadingHTTPServer (call shutdown() to stop it); its
+        `settings` attribute can be changed while it runs
+    """
+    stub_settings = StubSettings(**settings)
+    server = ThreadingHTTPServer((host, port), make_handler(stub_settings))
+    server.settings = stub_settings
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="reddit-stub").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Reddit listing stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--posts", type=int, default=1000, help="Posts in every subreddit's listing")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--forbidden-rate", type=float, default=0.0, help="Share of requests answered with 403")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible failures")
+    args = parser.parse_args()
+
+    server = serve(
+        args.host, args.port,
+        posts_per_subreddit=args.posts, latency=args.latency, forbidden_rate=args.forbidden_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed,
+    )
+    print(f"🧪 Reddit stand-in on http://{args.host}:{args.port} ({args.posts} posts per subreddit, "
+          f"latency {args.latency}s, 403s {args.forbidden_rate:.0%}, 429s {args.rate_limit_rate:.0%})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+SMTP Sink
+=========
+A minimal local SMTP server that accepts every message and keeps only
+counts, for delivering newsletters offline (no credentials, no inbox):
+
+    python -m benchmarks.smtp_sink --port 8025
+
+Then in config/settings.yaml:
+
+    email:
+      smtp: {host: 127.0.0.1, port: 8025, security: none}
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT), without the smtpd module that newer Pythons no longer ship.
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SinkStats:
+    """What the sink has received so far."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+def make_handler(stats):
+    """Connection handler class that records into `stats`."""
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def _reply(self, line):
+            self.wfile.write(line.encode("ascii") + b"\r\n")
+
+        def handle(self):
+            stats.add(connections=1)
+            self._reply("220 localhost benchmark sink")
+            recipients = 0
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                verb = line[:4].upper()
+                if verb == b"EHLO":
+                    self.wfile.write(b"250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+                elif verb == b"HELO":
+                    self._reply("250 localhost")
+                elif verb == b"MAIL":
+                    recipients = 0
+                    self._reply("250 OK")
+                elif verb == b"RCPT":
+                    recipients += 1
+                    self._reply("250 OK")
+                elif verb == b"DATA":
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    size = 0
+                    for data_line in self.rfile:
+                        if data_line in (b".\r\n", b".\n"):
+                            break
+                        size += len(data_line)
+                    stats.add(messages=1, recipients=recipients, bytes=size)
+                    self._reply("250 OK queued")
+                elif verb in (b"RSET", b"NOOP"):
+                    recipients = 0 if verb == b"RSET" else recipients
+                    self._reply("250 OK")
+                elif verb == b"QUIT":
+                    self._reply("221 Bye")
+                    return
+                else:
+                    self._reply("502 Command not implemented")
+
+    return Handler
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host="127.0.0.1", port=8025):
+    """
+    Start the sink in a background thread.
+
+    Returns:
+        The running server (call shutdown() to stop it); its `stats`
+        attribute counts connections, messages, recipients and bytes
+    """
+    stats = SinkStats()
+    server = _Server((host, port), make_handler(stats))
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True, name="smtp-sink").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port)
+    print(f"🧪 SMTP sink on {args.host}:{args.port} (security: none)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stats = server.stats
+        print(f"\n    {stats.messages} messages to {stats.recipients} recipients, "
+              f"{stats.bytes / 1024:.1f} KB over {stats.connections} connections")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
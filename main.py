@@ -8,6 +8,12 @@ import time
 import os
 import sys
 import argparse
+import signal
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from email.parser import BytesHeaderParser
 from pathlib import Path
 
 # Rich library for beautiful terminal output
@@ -17,19 +23,38 @@ try:
     from rich.table import Table
     from rich.progress import Progress, SpinnerColumn, TextColumn
     from rich import print as rprint
+    from rich.markup import escape
     RICH_AVAILABLE = True
 except ImportError:
     RICH_AVAILABLE = False
     print("Note: Install 'rich' for a better experience: pip install rich")
 
-from src.config_loader import load_config, PROJECT_ROOT
-from src.reddit_fetcher import fetch_posts
-from src.llm_analyzer import generate_newsletter
-from src.email_sender import send_email
+from dataclasses import asdict
+
+from src.config_loader import get_config, newsletter_definitions, ConfigError, PROJECT_ROOT
+from src.reddit_fetcher import fetch_all, configure_endpoints, configure_rate_limits, configure_endpoint_health
+from src import http_cache, http_session
+from src.seen_index import SeenIndex, published_posts
+from src.llm_analyzer import (
+    generate_newsletter, estimate_prompt_tokens, configure_backend, configure_cache, configure_map_reduce,
+    configure_prompt
+)
+from src.ranker import rank_posts
+from src.dedup import collapse_duplicates
+from src import email_sender
+from src import comments
+from src.mail_spool import MailSpool
+from src.checkpoints import RunCheckpoints, content_hash, prune_runs
+from src.archive import IssueArchive
+from src import metrics
+from src.scheduler import run_forever, parse_cron
 
 # Initialize Rich console
 console = Console() if RICH_AVAILABLE else None
 
+# Newsletters are curated concurrently but delivered one at a time (shared spool and SMTP settings)
+_delivery_lock = threading.Lock()
+
 
 def print_header():
     """Display the application header."""
@@ -56,7 +81,8 @@ def print_menu():
         table.add_row("[2]", "👀 Preview Only (No Email)")
         table.add_row("[3]", "⚙️  View Current Settings")
         table.add_row("[4]", "📂 Open Output Folder")
-        table.add_row("[5]", "❌ Exit")
+        table.add_row("[5]", "🔎 Search Archive")
+        table.add_row("[6]", "❌ Exit")
         console.print(table)
         console.print()
     else:
@@ -64,143 +90,908 @@ def print_menu():
         print("[2] 👀 Preview Only (No Email)")
         print("[3] ⚙️  View Current Settings")
         print("[4] 📂 Open Output Folder")
-        print("[5] ❌ Exit")
+        print("[5] 🔎 Search Archive")
+        print("[6] ❌ Exit")
         print()
 
 
 def show_settings():
     """Display current configuration settings."""
-    config = load_config()
+    config = get_config()
     
     if RICH_AVAILABLE:
         # Subreddits table
         sub_table = Table(title="📡 Monitored Subreddits", show_header=False, border_style="blue")
         sub_table.add_column("Subreddit")
-        for sub in config.get("subreddits", []):
+        for sub in config.subreddits:
             sub_table.add_row(f"r/{sub}")
         console.print(sub_table)
         console.print()
         
         # Fetch settings
-        fetch = config.get("fetch", {})
+        fetch = config.fetch
         settings_table = Table(title="⚙️ Fetch Settings", border_style="green")
         settings_table.add_column("Setting", style="cyan")
         settings_table.add_column("Value", style="white")
-        settings_table.add_row("Posts per subreddit", str(fetch.get("posts_per_subreddit", 5)))
-        settings_table.add_row("Time period", fetch.get("time_period", "week"))
-        settings_table.add_row("Delay between requests", f"{fetch.get('delay_between_requests', 1.0)}s")
-        settings_table.add_row("Max retries", str(fetch.get("max_retries", 3)))
+        settings_table.add_row("Posts per subreddit", str(fetch.posts_per_subreddit))
+        settings_table.add_row("Time period", fetch.time_period)
+        settings_table.add_row("Delay between requests", f"{fetch.delay_between_requests}s")
+        settings_table.add_row("Max retries", str(fetch.max_retries))
+        settings_table.add_row("Parallel workers", str(fetch.max_workers))
+        for host, limit in fetch.rate_limits.items():
+            settings_table.add_row(
+                f"Rate limit ({host})",
+                f"{limit.requests_per_second}/s, burst {limit.burst}"
+            )
         console.print(settings_table)
         console.print()
         
+        if config.newsletters:
+            newsletter_table = Table(title="📰 Newsletters", border_style="magenta")
+            newsletter_table.add_column("Name", style="cyan")
+            newsletter_table.add_column("Subreddits")
+            newsletter_table.add_column("Recipients from")
+            for definition in newsletter_definitions(config):
+                newsletter_table.add_row(
+                    definition.name,
+                    ", ".join(f"r/{sub}" for sub in definition.subreddits),
+                    definition.recipients_env
+                )
+            console.print(newsletter_table)
+            console.print()
+        
         console.print("[dim]Edit config/settings.yaml to change these settings.[/dim]\n")
     else:
         print("\n--- Current Settings ---")
-        print(f"Subreddits: {config.get('subreddits', [])}")
-        print(f"Fetch settings: {config.get('fetch', {})}")
+        print(f"Subreddits: {config.subreddits}")
+        print(f"Fetch settings: {asdict(config.fetch)}")
+        for definition in newsletter_definitions(config) if config.newsletters else []:
+            print(f"Newsletter '{definition.name}': {definition.subreddits} → ${definition.recipients_env}")
         print("Edit config/settings.yaml to change settings.\n")
 
 
-def run_newsletter(send_email_flag=True):
+def run_newsletter(send_email_flag=True, use_llm_cache=True, newsletters=None, resume=None):
+    """
+    Run the pipeline once, recording timings and counters (see src/metrics.py).
+    
+    Takes the same arguments and returns the same result as _run_pipeline().
+    """
+    metrics_settings = get_config().metrics
+    metrics.reset()
+    ok = False
+    try:
+        with metrics.span("run"):
+            ok = _run_pipeline(send_email_flag, use_llm_cache, newsletters, resume)
+    finally:
+        metrics.annotate(success=ok)
+        if metrics_settings.enabled:
+            _write_metrics(metrics_settings)
+    return ok
+
+
+def _write_metrics(metrics_settings):
+    """Write the run report (and Prometheus textfile) and show the summary table."""
+    try:
+        report = metrics.write_report(PROJECT_ROOT / metrics_settings.report_file)
+        if metrics_settings.prometheus_textfile:
+            metrics.write_prometheus(PROJECT_ROOT / metrics_settings.prometheus_textfile)
+    except OSError as e:
+        print(f"⚠️  Could not write the metrics report: {e}")
+        return
+    if metrics_settings.show_summary:
+        _print_metrics_summary(report)
+    print(f"📊 Run report: {metrics_settings.report_file}")
+
+
+def _print_metrics_summary(report):
+    """Where the run's time went, slowest spans first, plus the counters."""
+    spans = sorted(report["spans"].items(), key=lambda item: item[1]["total"], reverse=True)
+    counters = [
+        (name + "".join(f" {k}={v}" for k, v in item["labels"].items()), item["value"])
+        for name, series in report["counters"].items()
+        for item in series
+    ]
+    if RICH_AVAILABLE:
+        table = Table(title=f"📊 Run took {report['duration_seconds']:.2f}s", border_style="cyan")
+        table.add_column("Span", style="cyan")
+        table.add_column("Count", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Avg", justify="right")
+        table.add_column("Max", justify="right")
+        for name, stats in spans:
+            table.add_row(
+                name + (f" [red]({stats['errors']} failed)[/red]" if stats["errors"] else ""),
+                str(stats["count"]),
+                f"{stats['total']:.3f}s",
+                f"{stats['total'] / stats['count']:.3f}s",
+                f"{stats['max']:.3f}s"
+            )
+        console.print(table)
+        if counters:
+            counter_table = Table(border_style="cyan")
+            counter_table.add_column("Counter", style="cyan")
+            counter_table.add_column("Value", justify="right")
+            for name, value in counters:
+                counter_table.add_row(name, f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}")
+            console.print(counter_table)
+    else:
+        print(f"\n📊 Run took {report['duration_seconds']:.2f}s")
+        for name, stats in spans:
+            print(f"    {name:<24} {stats['count']:>6}x  total {stats['total']:8.3f}s  max {stats['max']:7.3f}s")
+        for name, value in counters:
+            print(f"    {name:<40} {value:>12,.0f}")
+
+
+def _run_pipeline(send_email_flag=True, use_llm_cache=True, newsletters=None, resume=None):
     """
     Main newsletter generation logic.
     
+    Every subreddit is fetched once, even if several newsletters follow it;
+    the posts are then fanned out to each newsletter, which are curated
+    concurrently (see newsletter.max_concurrency) and delivered one by one.
+    
+    Each stage checkpoints its output in data/runs/<run-id>/ (see
+    src/checkpoints.py), so a failed run can be resumed from where it stopped.
+    
     Args:
         send_email_flag: If True, send the email. If False, just generate.
+        use_llm_cache: If False, always call the LLM even for identical input.
+        newsletters: Names of the newsletters to produce (None for all)
+        resume: ID of an earlier run to resume ("latest" for the most recent)
+    
+    Returns:
+        True if every newsletter was produced
     """
-    config = load_config()
-    subreddits = config.get("subreddits", [])
-    fetch_settings = config.get("fetch", {})
-    email_settings = config.get("email", {})
-    newsletter_settings = config.get("newsletter", {})
+    config = get_config()
+    fetch_settings = config.fetch
+    llm_settings = config.llm
+    checkpoint_settings = config.checkpoints
+    
+    try:
+        definitions = newsletter_definitions(config, newsletters)
+        checkpoints = None
+        if checkpoint_settings.enabled or resume:
+            checkpoints = RunCheckpoints(PROJECT_ROOT / checkpoint_settings.directory, run_id=resume)
+    except (ConfigError, ValueError) as e:
+        if RICH_AVAILABLE:
+            console.print(f"[bold red]❌ {e}[/bold red]")
+        else:
+            print(f"❌ {e}")
+        return False
+    
+    # The union of everyone's subreddits, in first-mentioned order
+    subreddits = list(dict.fromkeys(sub for d in definitions for sub in d.subreddits))
     
     if RICH_AVAILABLE:
-        console.print(f"\n[bold green]Starting newsletter generation for {len(subreddits)} subreddits...[/bold green]\n")
+        console.print(
+            f"\n[bold green]Starting generation of {len(definitions)} newsletter(s) "
+            f"from {len(subreddits)} subreddits...[/bold green]"
+        )
     else:
-        print(f"\n🚀 Starting newsletter generation for {len(subreddits)} subreddits...\n")
+        print(f"\n🚀 Starting generation of {len(definitions)} newsletter(s) from {len(subreddits)} subreddits...")
+    metrics.annotate(newsletters=[d.name for d in definitions], run_id=checkpoints.run_id if checkpoints else None)
+    if checkpoints:
+        if checkpoints.resumed:
+            print(f"💾 Resuming run {checkpoints.run_id}\n")
+        else:
+            prune_runs(checkpoints.root, checkpoint_settings.keep_runs)
+            print(f"💾 Run {checkpoints.run_id}\n")
     
-    # 1. Fetch posts from all subreddits
-    all_posts = []
+    _configure_network(config)
     
-    for sub in subreddits:
+    # 1. Fetch posts from all subreddits (or reuse this run's earlier fetch)
+    fetch_inputs = {
+        "subreddits": subreddits,
+        "posts_per_subreddit": fetch_settings.posts_per_subreddit,
+        "time_period": fetch_settings.time_period,
+        "page_size": fetch_settings.page_size,
+        "max_total_posts": fetch_settings.max_total_posts,
+        "max_text_chars": fetch_settings.max_text_chars,
+        "base_url": fetch_settings.base_url,
+    }
+    posts_by_subreddit = checkpoints.load("fetch", fetch_inputs) if checkpoints else None
+    if posts_by_subreddit is not None:
+        reused = sum(len(posts) for posts in posts_by_subreddit.values())
         if RICH_AVAILABLE:
-            console.print(f"  📥 Fetching from [cyan]r/{sub}[/cyan]...")
+            console.print(f"[dim]♻️  Reusing the {reused} posts fetched earlier in this run.[/dim]")
         else:
-            print(f"  📥 Fetching from r/{sub}...")
-        
-        posts = fetch_posts(
-            sub, 
-            limit=fetch_settings.get("posts_per_subreddit", 5),
-            time_period=fetch_settings.get("time_period", "week")
-        )
-        
-        # Tag posts with subreddit name
-        for post in posts:
-            post['title'] = f"[r/{sub}] {post['title']}"
-        
-        all_posts.extend(posts)
-        time.sleep(fetch_settings.get("delay_between_requests", 1.0))
+            print(f"♻️  Reusing the {reused} posts fetched earlier in this run.")
+    else:
+        with metrics.span("stage.fetch"):
+            posts_by_subreddit = _fetch_posts(config, subreddits)
+        if checkpoints:
+            checkpoints.save("fetch", fetch_inputs, posts_by_subreddit)
     
+    total_posts = sum(len(posts) for posts in posts_by_subreddit.values())
     if RICH_AVAILABLE:
-        console.print(f"\n[bold]📦 Collected {len(all_posts)} posts total.[/bold]\n")
+        console.print(f"\n[bold]📦 Collected {total_posts} posts total.[/bold]\n")
     else:
-        print(f"\n📦 Collected {len(all_posts)} posts total.\n")
+        print(f"\n📦 Collected {total_posts} posts total.\n")
     
-    if not all_posts:
+    if not total_posts:
         if RICH_AVAILABLE:
             console.print("[bold red]❌ No posts found. Check your internet connection or subreddit names.[/bold red]")
         else:
             print("❌ No posts found. Check your internet connection or subreddit names.")
         return False
     
-    # 2. Generate newsletter with AI
-    if RICH_AVAILABLE:
-        console.print("👨‍🍳 Sending to Gemini for curation...")
-    else:
-        print("👨‍🍳 Sending to Gemini for curation...")
+    configure_backend(
+        provider=llm_settings.provider,
+        model=llm_settings.model,
+        fallback_model=llm_settings.fallback_model,
+        base_url=llm_settings.base_url,
+        api_key_env=llm_settings.api_key_env,
+        timeout=llm_settings.timeout,
+        max_retries=llm_settings.retry.max_retries,
+        base_delay=llm_settings.retry.base_delay,
+        max_delay=llm_settings.retry.max_delay
+    )
+    configure_cache(
+        enabled=llm_settings.cache.enabled,
+        directory=llm_settings.cache.directory,
+        ttl_seconds=llm_settings.cache.ttl_seconds,
+        max_size_mb=llm_settings.cache.max_size_mb
+    )
+    configure_prompt(token_budget=llm_settings.prompt_token_budget)
+    comment_settings = config.comments
+    comments.configure(
+        top_comments=comment_settings.top_comments,
+        max_comment_chars=comment_settings.max_comment_chars,
+        max_workers=comment_settings.max_workers,
+        max_retries=comment_settings.max_retries,
+        cache_directory=comment_settings.cache_directory,
+        ttl_seconds=comment_settings.cache_ttl_seconds,
+        max_size_mb=comment_settings.cache_max_size_mb
+    )
+    map_reduce_settings = llm_settings.map_reduce
+    configure_map_reduce(
+        enabled=map_reduce_settings.enabled,
+        batch_tokens=map_reduce_settings.batch_tokens,
+        max_concurrency=map_reduce_settings.max_concurrency,
+        max_total_tokens=map_reduce_settings.max_total_tokens,
+        shortlist_per_batch=map_reduce_settings.shortlist_per_batch,
+        auto_threshold_tokens=map_reduce_settings.auto_threshold_tokens
+    )
     
-    result = generate_newsletter(all_posts)
+    def produce(definition):
+        # Each newsletter gets its own copies, so curation never touches shared posts
+        posts = [dict(post) for sub in definition.subreddits for post in posts_by_subreddit.get(sub, [])]
+        try:
+            return _produce_newsletter(
+                definition, posts, config, send_email_flag, use_llm_cache,
+                checkpoints=checkpoints, live=len(definitions) == 1
+            )
+        except Exception as e:
+            print(f"🔥 [{definition.name}] Failed: {e}")
+            return False
     
-    if not result:
+    # 2-5. Select, curate, save, send and record each newsletter
+    if len(definitions) == 1:
+        results = {definitions[0].name: produce(definitions[0])}
+    else:
+        workers = min(config.newsletter.max_concurrency, len(definitions))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="newsletter") as pool:
+            results = dict(zip((d.name for d in definitions), pool.map(produce, definitions)))
+        
         if RICH_AVAILABLE:
-            console.print("[bold red]❌ Failed to generate newsletter.[/bold red]")
+            table = Table(title="📰 Newsletters")
+            table.add_column("Newsletter")
+            table.add_column("Result")
+            for name, ok in results.items():
+                table.add_row(name, "[green]✅ done[/green]" if ok else "[red]❌ failed[/red]")
+            console.print(table)
         else:
-            print("❌ Failed to generate newsletter.")
-        return False
+            print("\n📰 Newsletters:")
+            for name, ok in results.items():
+                print(f"    {'✅' if ok else '❌'} {name}")
     
-    # 3. Save to file
-    output_dir = newsletter_settings.get("output_directory", "output/newsletters")
-    output_filename = newsletter_settings.get("output_filename", "weekly_digest.md")
+    if config.archive.enabled and config.archive.build_site and any(results.values()):
+        with metrics.span("stage.archive_site"):
+            build_archive_site(config.archive)
     
-    os.makedirs(output_dir, exist_ok=True)
-    filepath = os.path.join(output_dir, output_filename)
+    if checkpoints and not all(results.values()):
+        print(f"\n💾 Finished stages are saved. Retry with: python main.py --resume {checkpoints.run_id}")
+    return all(results.values())
+
+
+def _configure_network(config):
+    """
+    Set up the HTTP session, feed cache, per-host rate limits, Reddit
+    endpoints and endpoint health. Everything that talks to Reddit (the
+    fetch and the comment enrichment) relies on this, even when a resumed
+    run skips the fetch.
+    """
+    fetch_settings = config.fetch
+    http_session.configure(
+        pool_size=config.http.pool_size,
+        connect_timeout=config.http.connect_timeout,
+        read_timeout=config.http.read_timeout,
+        http2=config.http.http2
+    )
+    http_cache.configure(
+        enabled=config.cache.enabled,
+        directory=config.cache.directory,
+        max_size_mb=config.cache.max_size_mb,
+        ttl_seconds=config.cache.ttl_seconds
+    )
+    configure_rate_limits(
+        delay_between_requests=fetch_settings.delay_between_requests,
+        limits={host: asdict(limit) for host, limit in fetch_settings.rate_limits.items()}
+    )
+    configure_endpoints(fetch_settings.base_url)
+    health_settings = fetch_settings.endpoint_health
+    configure_endpoint_health(
+        state_file=PROJECT_ROOT / health_settings.state_file,
+        failure_threshold=health_settings.failure_threshold,
+        cooldown_seconds=health_settings.cooldown_seconds
+    )
+
+
+def _fetch_posts(config, subreddits):
+    """
+    Fetch posts from all subreddits (in parallel, rate limited per host).
     
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(result['newsletter'])
+    Returns:
+        Dictionary of subreddit -> posts, tagged with their subreddit
+    """
+    fetch_settings = config.fetch
+    posts_by_subreddit = fetch_all(
+        subreddits,
+        limit=fetch_settings.posts_per_subreddit,
+        time_period=fetch_settings.time_period,
+        max_retries=fetch_settings.max_retries,
+        max_workers=fetch_settings.max_workers,
+        page_size=fetch_settings.page_size,
+        max_total_posts=fetch_settings.max_total_posts,
+        max_text_chars=fetch_settings.max_text_chars
+    )
     
+    for sub, posts in posts_by_subreddit.items():
+        # Tag posts with subreddit name
+        for post in posts:
+            post['title'] = f"[r/{sub}] {post['title']}"
+            post['subreddit'] = sub
+    
+    conn = http_session.connection_stats()
     if RICH_AVAILABLE:
-        console.print(f"\n[bold green]✅ Newsletter saved to:[/bold green] {filepath}")
+        console.print(
+            f"[dim]🔌 {conn['requests']} requests over {conn['connections']} connections "
+            f"({conn['reuse_ratio']:.0%} reused)[/dim]"
+        )
     else:
-        print(f"\n✅ Newsletter saved to: {filepath}")
+        print(f"🔌 {conn['requests']} requests over {conn['connections']} connections ({conn['reuse_ratio']:.0%} reused)")
+    return posts_by_subreddit
+
+
+def _select_candidates(all_posts, config, seen_index, label, rich_label):
+    """
+    Drop already published posts, merge duplicates and rank locally.
+    
+    Returns:
+        The candidate posts, best first, or None if nothing new is left
+    """
+    dedup_settings = config.dedup
+    ranking_settings = config.ranking
     
-    # 4. Send email (if enabled)
-    if send_email_flag and email_settings.get("send_on_completion", True):
+    # Skip stories we already delivered in a previous issue
+    if seen_index:
+        seen_index.prune(config.seen_index.retention_weeks)
+        seen_index.record_fetched(all_posts)
+        all_posts, skipped = seen_index.filter_unpublished(all_posts)
+        
+        if skipped:
+            if RICH_AVAILABLE:
+                console.print(f"[dim]🗂️  {rich_label} Skipped {skipped} posts already published in earlier issues.[/dim]")
+            else:
+                print(f"🗂️  {label} Skipped {skipped} posts already published in earlier issues.")
+        
+        if not all_posts:
+            if RICH_AVAILABLE:
+                console.print(f"[bold yellow]⚠️  {rich_label} Every post was already published. Nothing new to send.[/bold yellow]")
+            else:
+                print(f"⚠️  {label} Every post was already published. Nothing new to send.")
+            return None
+    
+    # Collapse the same story crossposted to several subreddits
+    if dedup_settings.enabled:
+        all_posts, duplicates = collapse_duplicates(
+            all_posts,
+            max_hamming_distance=dedup_settings.max_hamming_distance
+        )
+        if duplicates:
+            if RICH_AVAILABLE:
+                console.print(f"[dim]🧬 {rich_label} Merged {duplicates} crossposted duplicates.[/dim]")
+            else:
+                print(f"🧬 {label} Merged {duplicates} crossposted duplicates.")
+    
+    # Keep only the most promising candidates so Gemini reads fewer tokens
+    candidates = all_posts
+    if ranking_settings.enabled:
+        candidates = rank_posts(
+            all_posts,
+            top_k=ranking_settings.top_k,
+            weights=ranking_settings.weights,
+            recency_half_life_hours=ranking_settings.recency_half_life_hours
+        )
+        tokens_before = estimate_prompt_tokens(all_posts)
+        tokens_after = estimate_prompt_tokens(candidates)
+        saved = tokens_before - tokens_after
+        if RICH_AVAILABLE:
+            console.print(
+                f"[dim]🏅 {rich_label} Ranked locally: kept {len(candidates)}/{len(all_posts)} posts, "
+                f"~{tokens_after:,} prompt tokens (saved ~{saved:,}).[/dim]\n"
+            )
+        else:
+            print(f"🏅 {label} Ranked locally: kept {len(candidates)}/{len(all_posts)} posts, "
+                  f"~{tokens_after:,} prompt tokens (saved ~{saved:,}).\n")
+    return candidates
+
+
+def _produce_newsletter(definition, all_posts, config, send_email_flag, use_llm_cache,
+                        checkpoints=None, live=True):
+    """
+    Select, curate, save, send and record one newsletter from its share of the fetched posts.
+    
+    Args:
+        definition: Resolved NewsletterDefinition (see newsletter_definitions())
+        all_posts: This newsletter's posts (its own copies)
+        config: Config instance for this run
+        send_email_flag: If True, send the email. If False, just generate.
+        use_llm_cache: If False, always call the LLM even for identical input.
+        checkpoints: RunCheckpoints to save stage outputs to and resume from (or None)
+        live: Show a live streaming progress display (only one can run at a time)
+    
+    Returns:
+        True if the newsletter was generated
+    """
+    name = definition.name
+    label = f"[{name}]"
+    rich_label = escape(label) if RICH_AVAILABLE else label
+    email_settings = config.email
+    llm_settings = config.llm
+    
+    if not all_posts:
+        if RICH_AVAILABLE:
+            console.print(f"[bold red]❌ {rich_label} No posts found in its subreddits.[/bold red]")
+        else:
+            print(f"❌ {label} No posts found in its subreddits.")
+        return False
+    
+    seen_index = SeenIndex(PROJECT_ROOT / definition.seen_index_path) if config.seen_index.enabled else None
+    try:
+        # Candidates depend only on the fetched posts here, so a resumed run
+        # replays the same selection even after the seen index has moved on
+        select_inputs = {
+            "posts": content_hash(all_posts),
+            "seen_index": config.seen_index.enabled,
+            "dedup": asdict(config.dedup),
+            "ranking": asdict(config.ranking),
+        }
+        candidates = checkpoints.load(f"select-{name}", select_inputs) if checkpoints else None
+        if candidates is not None:
+            print(f"♻️  {label} Reusing the {len(candidates)} candidates selected earlier in this run.")
+        else:
+            with metrics.span("stage.select", newsletter=name):
+                candidates = _select_candidates(all_posts, config, seen_index, label, rich_label)
+            if candidates is None:
+                return False
+            if checkpoints:
+                checkpoints.save(f"select-{name}", select_inputs, candidates)
+        
+        # Add what Reddit said about each candidate (or reuse this run's earlier fetch)
+        if config.comments.enabled:
+            enrich_inputs = {"candidates": content_hash(candidates), "comments": asdict(config.comments)}
+            top_comments = checkpoints.load(f"enrich-{name}", enrich_inputs) if checkpoints else None
+            if top_comments is not None and None not in top_comments:
+                print(f"♻️  {label} Reusing the top comments fetched earlier in this run.")
+            else:
+                # Threads that failed earlier in this run (None) are fetched again
+                if top_comments is None:
+                    top_comments = [None] * len(candidates)
+                missing = [i for i, post_comments in enumerate(top_comments) if post_comments is None]
+                if RICH_AVAILABLE:
+                    console.print(f"💬 {rich_label} Fetching top comments for {len(missing)} candidates...")
+                else:
+                    print(f"💬 {label} Fetching top comments for {len(missing)} candidates...")
+                with metrics.span("stage.enrich", newsletter=name):
+                    fetched = comments.fetch_top_comments([candidates[i] for i in missing])
+                for i, post_comments in zip(missing, fetched):
+                    top_comments[i] = post_comments
+                if checkpoints:
+                    checkpoints.save(f"enrich-{name}", enrich_inputs, top_comments)
+            for post, post_comments in zip(candidates, top_comments):
+                if post_comments:
+                    post['comments'] = post_comments
+        
+        # 2. Generate newsletter with AI (or reuse this run's earlier result)
+        curate_inputs = {
+            "candidates": content_hash(candidates),
+            "instructions": definition.instructions,
+            "provider": llm_settings.provider,
+            "model": llm_settings.model,
+            "base_url": llm_settings.base_url,
+            "prompt_token_budget": llm_settings.prompt_token_budget,
+            "map_reduce": asdict(llm_settings.map_reduce),
+        }
+        result = checkpoints.load(f"curate-{name}", curate_inputs) if checkpoints else None
+        
+        output_dir = config.newsletter.output_directory
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = os.path.join(output_dir, definition.output_filename)
+        
+        if result is not None:
+            print(f"♻️  {label} Reusing the newsletter the LLM wrote earlier in this run.")
+        else:
+            if RICH_AVAILABLE:
+                console.print(f"👨‍🍳 {rich_label} Sending to the LLM for curation...")
+            else:
+                print(f"👨‍🍳 {label} Sending to the LLM for curation...")
+            
+            with metrics.span("stage.curate", newsletter=name):
+                if llm_settings.stream:
+                    result = _generate_streaming(
+                        candidates, filepath + ".partial", use_llm_cache, definition.instructions, live=live
+                    )
+                else:
+                    result = generate_newsletter(
+                        candidates, use_cache=use_llm_cache, instructions=definition.instructions
+                    )
+            
+            if not result:
+                if RICH_AVAILABLE:
+                    console.print(f"[bold red]❌ {rich_label} Failed to generate newsletter.[/bold red]")
+                else:
+                    print(f"❌ {label} Failed to generate newsletter.")
+                return False
+            
+            if not result.get('cached'):
+                timing = result['timing']
+                if RICH_AVAILABLE:
+                    console.print(
+                        f"[dim]⏱️  {rich_label} Time to first token: {timing['time_to_first_token']:.2f}s, "
+                        f"total generation: {timing['total']:.2f}s[/dim]"
+                    )
+                else:
+                    print(f"⏱️  {label} Time to first token: {timing['time_to_first_token']:.2f}s, "
+                          f"total generation: {timing['total']:.2f}s")
+            if checkpoints:
+                checkpoints.save(f"curate-{name}", curate_inputs, result)
+        
+        # 3. Save to file (the final, cleaned-up version replaces the streamed draft)
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(result['newsletter'])
+        if os.path.exists(filepath + ".partial"):
+            os.remove(filepath + ".partial")
+        
         if RICH_AVAILABLE:
-            console.print("\n📧 Sending email...")
+            console.print(f"\n[bold green]✅ {rich_label} Newsletter saved to:[/bold green] {filepath}")
         else:
-            print("\n📧 Sending email...")
+            print(f"\n✅ {label} Newsletter saved to: {filepath}")
         
-        subject = email_settings.get("subject", "🚀 The Weekly Sync")
-        send_email(result['newsletter'], subject=subject)
-    elif not send_email_flag:
+        # 4. Send email (if enabled), one newsletter at a time
+        if send_email_flag and email_settings.send_on_completion:
+            with _delivery_lock:
+                if RICH_AVAILABLE:
+                    console.print(f"\n📧 {rich_label} Sending email...")
+                else:
+                    print(f"\n📧 {label} Sending email...")
+                
+                delivered = _send_newsletter(result['newsletter'], email_settings, definition, checkpoints)
+        elif not send_email_flag:
+            delivered = False
+            if RICH_AVAILABLE:
+                console.print(f"\n[dim]📧 {rich_label} Email skipped (preview mode).[/dim]")
+            else:
+                print(f"\n📧 {label} Email skipped (preview mode).")
+        else:
+            delivered = True  # Email disabled in settings: the saved file is the issue
+        
+        # 5. Remember what this issue covered (previews don't count)
+        if seen_index and delivered:
+            seen_index.mark_published(published_posts(candidates, result['newsletter']))
+        
+        # 6. Keep a dated, searchable copy (the output file is overwritten next run)
+        if config.archive.enabled:
+            with metrics.span("stage.archive", newsletter=name):
+                _archive_issue(result['newsletter'], definition, config.archive, delivered, label)
+        
+        return True
+    finally:
+        if seen_index:
+            seen_index.close()
+
+
+def _archive_issue(html_content, definition, archive_settings, delivered, label):
+    """Add the issue to the archive and its search index (a failure only warns)."""
+    try:
+        archive = IssueArchive(PROJECT_ROOT / archive_settings.directory)
+        try:
+            issue = archive.add_issue(
+                definition.name, html_content, subject=definition.subject, delivered=delivered
+            )
+        finally:
+            archive.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️  {label} Could not archive the issue: {e}")
+        return
+    if issue["added"]:
+        print(f"🗄️  {label} Archived as {issue['slug']} ({issue['stories']} stories indexed)")
+    else:
+        print(f"🗄️  {label} Already in the archive as {issue['slug']}")
+
+
+def build_archive_site(archive_settings=None):
+    """Bring the static HTML archive up to date (only changed pages are rewritten)."""
+    archive_settings = archive_settings or get_config().archive
+    site_directory = PROJECT_ROOT / archive_settings.site_directory
+    try:
+        archive = IssueArchive(PROJECT_ROOT / archive_settings.directory)
+        try:
+            pages = archive.build_site(site_directory)
+        finally:
+            archive.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️  Could not update the archive site: {e}")
+        return False
+    print(f"🌐 Archive site: {pages['rendered']} page(s) updated, {pages['unchanged']} unchanged "
+          f"→ {site_directory / 'index.html'}")
+    return True
+
+
+def search_archive(query, newsletters=None, limit=20):
+    """Print the archived stories matching `query` (SQLite FTS5 syntax), best first."""
+    query = query.strip()
+    if not query:
+        print("⚠️  Nothing to search for: the query is empty.")
+        return False
+    
+    archive_settings = get_config().archive
+    try:
+        archive = IssueArchive(PROJECT_ROOT / archive_settings.directory)
+        try:
+            hits = archive.search(query, newsletters=newsletters, limit=limit)
+        finally:
+            archive.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️  Could not search the archive: {e}")
+        return False
+    
+    if not hits:
         if RICH_AVAILABLE:
-            console.print("\n[dim]📧 Email skipped (preview mode).[/dim]")
+            console.print(f"[yellow]🔎 No archived stories match {escape(query)!r}.[/yellow]")
         else:
-            print("\n📧 Email skipped (preview mode).")
+            print(f"🔎 No archived stories match {query!r}.")
+        return False
     
+    if RICH_AVAILABLE:
+        table = Table(title=f"🔎 {len(hits)} stories matching {escape(query)!r}", border_style="blue", show_lines=True)
+        table.add_column("Issue", style="dim", no_wrap=True)
+        table.add_column("Story")
+        for hit in hits:
+            story = f"[bold]{escape(hit['headline'])}[/bold]\n{escape(hit['snippet'])}"
+            if hit["links"]:
+                story += f"\n[link={hit['links'][0]}]{escape(hit['links'][0])}[/link]"
+            table.add_row(hit["slug"], story)
+        console.print(table)
+    else:
+        print(f"🔎 {len(hits)} stories matching {query!r}:\n")
+        for hit in hits:
+            print(f"    {hit['slug']}  {hit['headline']}")
+            print(f"        {hit['snippet']}")
+            if hit["links"]:
+                print(f"        {hit['links'][0]}")
     return True
 
 
+def _configure_email(email_settings):
+    """Apply SMTP settings and open the mail spool (None when disabled)."""
+    email_sender.configure(**asdict(email_settings.smtp))
+    spool_settings = email_settings.spool
+    if not spool_settings.enabled:
+        return None
+    return MailSpool(
+        PROJECT_ROOT / spool_settings.directory,
+        max_attempts=spool_settings.max_attempts,
+        base_delay=spool_settings.base_delay,
+        max_delay=spool_settings.max_delay
+    )
+
+
+def _send_newsletter(html_content, email_settings, definition, checkpoints=None):
+    """
+    Queue the newsletter in the mail spool and try to deliver it right away.
+    Without a spool, send it directly.
+    
+    Args:
+        html_content: The generated newsletter HTML
+        email_settings: EmailSettings (SMTP and spool)
+        definition: Resolved NewsletterDefinition (subject and recipients)
+        checkpoints: RunCheckpoints for the render and deliver stages (or None)
+    
+    Returns:
+        True if the issue is out: every recipient has it (or permanently
+        refused it), or, with the spool, it reached some readers and is
+        queued for the rest (False if it was abandoned)
+    """
+    spool = _configure_email(email_settings)
+    subject = definition.subject
+    recipients = email_sender.recipients_from_env(definition.recipients_env)
+    
+    creds = email_sender.credentials()
+    if creds is None:
+        return False
+    if not recipients:
+        print(f"    ❌ Error: Missing {definition.recipients_env} in .env file.")
+        return False
+    sender_email, password = creds
+    
+    # Render once (or reuse this run's rendered message)
+    render_inputs = {
+        "html": content_hash(html_content),
+        "subject": subject,
+        "sender": sender_email,
+        "newsletter": definition.name,
+    }
+    rendered = checkpoints.load(f"render-{definition.name}", render_inputs) if checkpoints else None
+    if rendered is None:
+        with metrics.span("stage.render", newsletter=definition.name):
+            msg = email_sender.build_message(html_content, subject, sender_email, newsletter=definition.name)
+            rendered = email_sender.render_message(msg)
+        if checkpoints:
+            checkpoints.save(f"render-{definition.name}", render_inputs, rendered)
+    message_id = BytesHeaderParser().parsebytes(rendered)['Message-ID']
+    
+    deliver_inputs = {"message": content_hash(rendered), "recipients": recipients}
+    if checkpoints and checkpoints.load(f"deliver-{definition.name}", deliver_inputs) is not None:
+        print("    ♻️  Already delivered earlier in this run; not sending again.")
+        return True
+    
+    with metrics.span("stage.deliver", newsletter=definition.name):
+        if spool is None:
+            results = email_sender.send_rendered(rendered, sender_email, password, recipients)
+            # Nothing retries a direct send: the issue is only out once every
+            # recipient has it or permanently refused it
+            complete = all(error is None or email_sender.is_permanent_failure(error) for error in results.values())
+            delivered = complete
+        else:
+            queued = spool.enqueue(rendered, message_id, sender_email, recipients, subject)
+            if not queued:
+                print("    ♻️  This exact issue is already in the mail spool; not queuing it again.")
+            else:
+                print(f"    📮 Queued for {len(recipients)} recipient(s) in the mail spool.")
+            
+            # A resumed run retries right away instead of waiting for the backoff
+            _print_spool_summary(spool.flush(password, force=bool(checkpoints and checkpoints.resumed)))
+            # Finished, or still queued with readers already reached (the spool
+            # retries the rest); an abandoned entry reached no one reliably
+            state, meta = spool.status(message_id)
+            complete = state == "sent"
+            delivered = complete or (state == "queued" and bool(meta["delivered"]))
+    
+    if checkpoints and complete:
+        checkpoints.save(f"deliver-{definition.name}", deliver_inputs, {"message_id": message_id})
+    return delivered
+
+
+def _print_spool_summary(summary):
+    if summary["delivered"] or summary["failed"]:
+        print(f"    📤 Delivered to {summary['delivered']} recipient(s), {summary['failed']} failed.")
+    if summary["abandoned"]:
+        print(f"    ❌ {summary['abandoned']} message(s) ran out of attempts (see data/spool/failed).")
+    if summary["pending"]:
+        print(f"    ⏳ {summary['pending']} message(s) still queued. "
+              f"Retry with: python main.py --flush-spool")
+    elif summary["completed"]:
+        print("    ✅ Email sent successfully!")
+
+
+def flush_spool():
+    """Deliver everything waiting in the mail spool, ignoring retry times."""
+    spool = _configure_email(get_config().email)
+    if spool is None:
+        print("📮 Mail spool is disabled in settings.")
+        return True
+    
+    queued = spool.queued()
+    print(f"📮 {len(queued)} message(s) in the mail spool.")
+    if not queued:
+        return True
+    
+    creds = email_sender.credentials()
+    if creds is None:
+        return False
+    summary = spool.flush(creds[1], force=True)
+    _print_spool_summary(summary)
+    return summary["pending"] == 0 and summary["abandoned"] == 0
+
+
+def daemon_mode():
+    """
+    Stay running and generate the newsletter on the configured schedules.
+    
+    HTTP, LLM and (with keep_alive_seconds) SMTP connections stay warm
+    between runs. SIGTERM or Ctrl+C stops after the current run; a second
+    signal exits immediately.
+    """
+    stop = threading.Event()
+    
+    def request_stop(signum, frame):
+        if stop.is_set():
+            print("\n🛑 Second signal received, exiting now.")
+            sys.exit(130)
+        print(f"\n🛑 {signal.Signals(signum).name} received, stopping after the current run...")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    def jobs():
+        schedules = get_config().daemon.schedules
+        return [
+            (s.name, parse_cron(s.cron),
+             lambda s=s: run_newsletter(send_email_flag=s.send_email, newsletters=s.newsletters))
+            for s in schedules
+        ]
+    
+    last_flush = [time.monotonic()]
+    
+    def housekeeping():
+        email_sender.close_idle_connection()
+        minutes = get_config().daemon.flush_spool_minutes
+        if not minutes or time.monotonic() - last_flush[0] < minutes * 60:
+            return
+        last_flush[0] = time.monotonic()
+        spool = _configure_email(get_config().email)
+        if spool is None or not spool.queued():
+            return
+        creds = email_sender.credentials()
+        if creds is not None:
+            _print_spool_summary(spool.flush(creds[1]))
+    
+    if RICH_AVAILABLE:
+        console.print("[bold green]🕰️  Daemon mode: waiting for scheduled runs (Ctrl+C to stop)[/bold green]")
+    else:
+        print("🕰️  Daemon mode: waiting for scheduled runs (Ctrl+C to stop)")
+    
+    try:
+        run_forever(jobs, stop, on_idle=housekeeping, poll_seconds=get_config().daemon.poll_seconds)
+    finally:
+        email_sender.close_connection()
+        http_session.close()
+    print("👋 Daemon stopped.")
+
+
+def _generate_streaming(posts, filepath, use_llm_cache, instructions=None, live=True):
+    """
+    Generate the newsletter while streaming it into `filepath`, showing
+    live progress in the console (if `live`). A failed run leaves the
+    partial draft there for inspection.
+    """
+    received = {"chars": 0}
+    
+    with open(filepath, "w", encoding="utf-8") as f:
+        if RICH_AVAILABLE and live:
+            with Progress(SpinnerColumn(), TextColumn("{task.description}"), console=console) as progress:
+                task = progress.add_task("✍️  Waiting for the first token...", total=None)
+                
+                def on_chunk(text):
+                    f.write(text)
+                    f.flush()
+                    received["chars"] += len(text)
+                    progress.update(task, description=f"✍️  Streaming newsletter... {received['chars']:,} chars")
+                
+                return generate_newsletter(
+                    posts, use_cache=use_llm_cache, on_chunk=on_chunk, instructions=instructions
+                )
+        
+        def on_chunk(text):
+            f.write(text)
+            f.flush()
+            received["chars"] += len(text)
+        
+        return generate_newsletter(posts, use_cache=use_llm_cache, on_chunk=on_chunk, instructions=instructions)
+
+
 def open_output_folder():
     """Open the output folder in the system file explorer."""
     output_dir = PROJECT_ROOT / "output" / "newsletters"
@@ -227,7 +1018,7 @@ def interactive_mode():
         print_menu()
         
         try:
-            choice = input("Enter your choice (1-5): ").strip()
+            choice = input("Enter your choice (1-6): ").strip()
         except KeyboardInterrupt:
             if RICH_AVAILABLE:
                 console.print("\n[yellow]👋 Goodbye![/yellow]")
@@ -244,6 +1035,10 @@ def interactive_mode():
         elif choice == "4":
             open_output_folder()
         elif choice == "5":
+            query = input("Search for: ").strip()
+            if query:
+                search_archive(query)
+        elif choice == "6":
             if RICH_AVAILABLE:
                 console.print("[yellow]👋 Goodbye![/yellow]")
             else:
@@ -251,9 +1046,9 @@ def interactive_mode():
             break
         else:
             if RICH_AVAILABLE:
-                console.print("[red]Invalid choice. Please enter 1-5.[/red]")
+                console.print("[red]Invalid choice. Please enter 1-6.[/red]")
             else:
-                print("Invalid choice. Please enter 1-5.")
+                print("Invalid choice. Please enter 1-6.")
         
         print()  # Add spacing between actions
 
@@ -273,13 +1068,86 @@ def main():
         action="store_true", 
         help="Generate newsletter but don't send email"
     )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always call the LLM, even if an identical request was answered before"
+    )
+    parser.add_argument(
+        "--flush-spool",
+        action="store_true",
+        help="Only deliver newsletters waiting in the mail spool, then exit"
+    )
+    parser.add_argument(
+        "--newsletter",
+        action="append",
+        metavar="NAME",
+        help="Only produce (or --search) this newsletter (repeat for several; default: all in settings.yaml)"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Resume a failed run from its checkpoints in data/runs ('latest' for the most recent)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also profile the run (cProfile + tracemalloc), written to data/metrics (with --auto or --resume)"
+    )
+    parser.add_argument(
+        "--search",
+        metavar="QUERY",
+        help="Search the stories of past issues, e.g. \"open weights\" or \"llama OR mistral\""
+    )
+    parser.add_argument(
+        "--build-archive",
+        action="store_true",
+        help="Bring the static HTML archive (output/archive) up to date, then exit"
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and generate on the schedules in settings.yaml (daemon: section)"
+    )
     
     args = parser.parse_args()
+    other_mode = args.flush_spool or args.search or args.build_archive or args.daemon
+    if args.profile and (other_mode or not (args.auto or args.resume)):
+        parser.error("--profile only works with --auto or --resume")
+    
+    # Validate settings up front; later edits are hot-reloaded (bad ones are ignored)
+    try:
+        get_config()
+    except ConfigError as e:
+        if RICH_AVAILABLE:
+            console.print(f"[bold red]❌ Invalid configuration:[/bold red] {e}")
+        else:
+            print(f"❌ Invalid configuration: {e}")
+        sys.exit(2)
     
-    if args.auto:
+    if args.flush_spool:
+        sys.exit(0 if flush_spool() else 1)
+    elif args.search:
+        sys.exit(0 if search_archive(args.search, newsletters=args.newsletter) else 1)
+    elif args.build_archive:
+        sys.exit(0 if build_archive_site() else 1)
+    elif args.daemon:
+        daemon_mode()
+    elif args.auto or args.resume:
         # Non-interactive mode for GitHub Actions / cron jobs
         print("🤖 Running in automatic mode...")
-        success = run_newsletter(send_email_flag=not args.no_email)
+        profiling = (
+            metrics.profile(PROJECT_ROOT / get_config().metrics.profile_directory)
+            if args.profile else nullcontext()
+        )
+        with profiling:
+            success = run_newsletter(
+                send_email_flag=not args.no_email,
+                use_llm_cache=not args.no_llm_cache,
+                newsletters=args.newsletter,
+                resume=args.resume
+            )
+        email_sender.close_connection()
         sys.exit(0 if success else 1)
     else:
         # Interactive CLI mode
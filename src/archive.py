@@ -0,0 +1,388 @@
+"""
+Issue Archive
+=============
+Every generated issue is kept, dated, and indexed for full-text search:
+
+    data/archive/issues/<newsletter>/<YYYY-MM-DD>-<hash>.html   the issue as generated
+    data/archive/archive.sqlite3                               issue list + FTS5 story index
+
+Each story (an <h3> headline with its analysis and links) is one row of
+an SQLite FTS5 index, so `python main.py --search "open weights"` finds
+the stories, not just the issues. Indexing is incremental: a run adds
+only its own issue, and adding the same issue twice (a preview followed
+by the real send, a resumed run) is a no-op.
+
+build_site() renders a static HTML archive (an index, one page per
+month and one per issue). It remembers a hash of what each page was
+rendered from and only rewrites pages whose inputs changed, so a new
+issue costs a handful of pages however long the archive gets.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from html import escape
+from html.parser import HTMLParser
+from pathlib import Path
+
+# Bump to re-render every page of the static archive after a layout change
+SITE_VERSION = 1
+
+# Issues listed on the archive's front page
+RECENT_ISSUES = 20
+
+# Relative weight of headline, analysis and links when ranking search hits
+_BM25_WEIGHTS = (10.0, 1.0, 0.5)
+
+
+class _StoryExtractor(HTMLParser):
+    """Splits newsletter HTML into stories: <h3> headline, text after it, its links."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.stories = []
+        self._in = None
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("style", "script"):
+            self._skip += 1
+        elif tag in ("h1", "h2") and not self.title:
+            self._in = "title"
+        elif tag == "h3":
+            self.stories.append({"headline": "", "analysis": "", "links": []})
+            self._in = "headline"
+        elif tag == "a" and self.stories:
+            href = dict(attrs).get("href")
+            if href and not href.startswith("#"):
+                self.stories[-1]["links"].append(href)
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script"):
+            self._skip = max(0, self._skip - 1)
+        elif tag in ("h1", "h2", "h3"):
+            self._in = None
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in == "title":
+            self.title += data
+        elif self._in == "headline":
+            self.stories[-1]["headline"] += data
+        elif self.stories:
+            self.stories[-1]["analysis"] += " " + data
+
+
+def extract_stories(html):
+    """
+    Headline, analysis and links of every story in a newsletter.
+
+    Returns:
+        Tuple of (issue title, list of dicts with 'headline', 'analysis' and
+        'links'). An issue without <h3> stories is returned as one story.
+    """
+    parser = _StoryExtractor()
+    parser.feed(html)
+    parser.close()
+    stories = parser.stories
+    if not stories:
+        text = re.sub(r"<[^>]+>", " ", html)
+        stories = [{"headline": "", "analysis": text, "links": re.findall(r'href="([^"#][^"]*)"', html)}]
+    for story in stories:
+        story["headline"] = " ".join(story["headline"].split())
+        story["analysis"] = " ".join(story["analysis"].replace("[Read Article]", "")
+                                     .replace("[Discuss on Reddit]", "").replace("|", "").split())
+        story["links"] = list(dict.fromkeys(story["links"]))
+    return " ".join(parser.title.split()), stories
+
+
+def _fts_query(text):
+    """Quote every term, for queries that aren't valid FTS5 syntax."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class IssueArchive:
+    """Dated copies of every issue, with an FTS5 index of their stories."""
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Archive directory (e.g. data/archive)
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.root / "archive.sqlite3"), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS issues (
+                    id INTEGER PRIMARY KEY,
+                    newsletter TEXT NOT NULL,
+                    slug TEXT NOT NULL UNIQUE,
+                    issued_at REAL NOT NULL,
+                    title TEXT,
+                    subject TEXT,
+                    file TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    story_count INTEGER NOT NULL,
+                    delivered INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (newsletter, content_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_issues_issued_at ON issues (issued_at)"
+            )
+            self._conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS stories USING fts5(
+                    headline, analysis, links,
+                    issue_id UNINDEXED, position UNINDEXED,
+                    tokenize = 'porter unicode61'
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS site_pages (path TEXT PRIMARY KEY, input_hash TEXT NOT NULL)"
+            )
+
+    def add_issue(self, newsletter, html, subject=None, delivered=False, issued_at=None):
+        """
+        Store an issue and index its stories (once per distinct content).
+
+        Args:
+            newsletter: Name of the newsletter it belongs to
+            html: The issue's HTML, as generated
+            subject: Email subject line
+            delivered: Whether it was sent (a later delivered copy upgrades a preview)
+            issued_at: Timestamp (default: now)
+
+        Returns:
+            Dictionary with 'slug', 'stories' and 'added' (False if it was
+            already archived)
+        """
+        content_hash = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT slug, story_count FROM issues WHERE newsletter = ? AND content_hash = ?",
+                (newsletter, content_hash),
+            ).fetchone()
+            if row is not None:
+                if delivered:
+                    self._conn.execute(
+                        "UPDATE issues SET delivered = 1 WHERE slug = ?", (row["slug"],)
+                    )
+                return {"slug": row["slug"], "stories": row["story_count"], "added": False}
+
+            issued_at = issued_at or time.time()
+            slug = f"{newsletter}/{datetime.fromtimestamp(issued_at):%Y-%m-%d}-{content_hash[:8]}"
+            path = self.root / "issues" / f"{slug}.html"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(html, encoding="utf-8")
+
+            title, stories = extract_stories(html)
+            cursor = self._conn.execute(
+                """
+                INSERT INTO issues (newsletter, slug, issued_at, title, subject, file,
+                                    content_hash, story_count, delivered)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (newsletter, slug, issued_at, title, subject, str(path.relative_to(self.root)),
+                 content_hash, len(stories), int(delivered)),
+            )
+            self._conn.executemany(
+                "INSERT INTO stories (headline, analysis, links, issue_id, position) VALUES (?, ?, ?, ?, ?)",
+                [(s["headline"], s["analysis"], " ".join(s["links"]), cursor.lastrowid, i)
+                 for i, s in enumerate(stories)],
+            )
+        return {"slug": slug, "stories": len(stories), "added": True}
+
+    def search(self, query, newsletters=None, limit=20):
+        """
+        Stories matching `query`, best first.
+
+        Args:
+            query: FTS5 query ("open weights", "llama OR mistral", "gpu*"...);
+                anything that isn't valid FTS5 syntax is searched as plain words
+            newsletters: Only search these newsletters (None for all)
+            limit: Maximum number of hits
+
+        Returns:
+            List of dicts with 'newsletter', 'slug', 'issued_at', 'subject',
+            'headline', 'snippet' and 'links'
+
+        Raises:
+            ValueError if the query is blank
+        """
+        if not query.strip():
+            raise ValueError("Search query is empty")
+        newsletters = list(newsletters or [])
+        only = f"AND issues.newsletter IN ({', '.join('?' * len(newsletters))})" if newsletters else ""
+        weights = ", ".join(map(str, _BM25_WEIGHTS))
+        sql = f"""
+            SELECT issues.newsletter, issues.slug, issues.issued_at, issues.subject,
+                   stories.headline, stories.links,
+                   snippet(stories, 1, '«', '»', '…', 16) AS snippet
+            FROM stories JOIN issues ON issues.id = stories.issue_id
+            WHERE stories MATCH ? {only}
+            ORDER BY bm25(stories, {weights}), issues.issued_at DESC
+            LIMIT ?
+        """
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, (query, *newsletters, limit)).fetchall()
+            except sqlite3.OperationalError:
+                rows = self._conn.execute(sql, (_fts_query(query), *newsletters, limit)).fetchall()
+        return [{**dict(row), "links": row["links"].split()} for row in rows]
+
+    def issues(self):
+        """Every archived issue (without its HTML), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, newsletter, slug, issued_at, title, subject, file, content_hash, story_count, delivered "
+                "FROM issues ORDER BY issued_at, id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def read_issue(self, issue):
+        """The HTML of an issue returned by issues()."""
+        return (self.root / issue["file"]).read_text(encoding="utf-8")
+
+    def build_site(self, directory):
+        """
+        Bring the static HTML archive in `directory` up to date.
+
+        Only pages whose inputs changed since they were last written (or
+        that are missing) are rendered: a new issue re-renders its own
+        page, its predecessor's (for the "newer" link), its month and the
+        index.
+
+        Returns:
+            Dictionary with 'rendered' and 'unchanged' page counts
+        """
+        directory = Path(directory)
+        issues = self.issues()
+        with self._lock:
+            known = {row["path"]: row["input_hash"]
+                     for row in self._conn.execute("SELECT path, input_hash FROM site_pages")}
+
+        pages = {}  # path -> (inputs, render function)
+        by_newsletter = {}
+        for issue in issues:
+            by_newsletter.setdefault(issue["newsletter"], []).append(issue)
+        for series in by_newsletter.values():
+            for i, issue in enumerate(series):
+                older = series[i - 1]["slug"] if i else None
+                newer = series[i + 1]["slug"] if i + 1 < len(series) else None
+                inputs = (issue["content_hash"], issue["subject"], issue["title"], older, newer)
+                pages[f"{issue['slug']}.html"] = (
+                    inputs, lambda issue=issue, older=older, newer=newer: self._issue_page(issue, older, newer)
+                )
+
+        months = {}
+        for issue in issues:
+            months.setdefault(f"{datetime.fromtimestamp(issue['issued_at']):%Y-%m}", []).append(issue)
+        for month, listed in months.items():
+            inputs = [(i["slug"], i["subject"], i["title"], i["story_count"]) for i in listed]
+            pages[f"{month}.html"] = (inputs, lambda month=month, listed=listed: _month_page(month, listed))
+
+        recent = issues[-RECENT_ISSUES:][::-1]
+        inputs = ([(i["slug"], i["subject"], i["title"], i["story_count"]) for i in recent],
+                  [(m, len(listed)) for m, listed in months.items()])
+        pages["index.html"] = (inputs, lambda: _index_page(recent, months))
+
+        rendered = unchanged = 0
+        updates = []
+        for path, (inputs, render) in pages.items():
+            input_hash = hashlib.sha256(repr((SITE_VERSION, inputs)).encode("utf-8")).hexdigest()
+            target = directory / path
+            if known.get(path) == input_hash and target.exists():
+                unchanged += 1
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(render(), encoding="utf-8")
+            updates.append((path, input_hash))
+            rendered += 1
+
+        if updates:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO site_pages (path, input_hash) VALUES (?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET input_hash = excluded.input_hash",
+                    updates,
+                )
+        return {"rendered": rendered, "unchanged": unchanged}
+
+    def _issue_page(self, issue, older, newer):
+        up = "../" * issue["slug"].count("/")
+        nav = [f'<a href="{up}index.html">Archive</a>']
+        if older:
+            nav.append(f'<a href="{up}{escape(older)}.html">← Older</a>')
+        if newer:
+            nav.append(f'<a href="{up}{escape(newer)}.html">Newer →</a>')
+        heading = escape(issue["subject"] or issue["title"] or issue["newsletter"])
+        date = f"{datetime.fromtimestamp(issue['issued_at']):%d %B %Y}"
+        body = (
+            f'<nav>{" · ".join(nav)}</nav>\n'
+            f'<p class="meta">{escape(issue["newsletter"])} · {date}</p>\n'
+            f"<article>\n{self.read_issue(issue)}\n</article>\n"
+        )
+        return _page(f"{heading} · {date}", body)
+
+    def close(self):
+        self._conn.close()
+
+
+_STYLE = """
+body { font-family: Georgia, serif; background: #fff1e5; color: #33302e; max-width: 760px; margin: 0 auto; padding: 24px; }
+a { color: #990f3d; }
+nav { font-family: sans-serif; font-size: 14px; margin-bottom: 16px; }
+.meta { font-family: sans-serif; color: #66605c; font-size: 14px; }
+ul.issues { list-style: none; padding: 0; }
+ul.issues li { margin: 10px 0; }
+"""
+
+
+def _page(title, body):
+    return (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{escape(title)}</title>\n<style>{_STYLE}</style>\n</head>\n"
+        f"<body>\n{body}</body>\n</html>\n"
+    )
+
+
+def _issue_list(issues):
+    items = []
+    for issue in issues:
+        date = f"{datetime.fromtimestamp(issue['issued_at']):%Y-%m-%d}"
+        label = escape(issue["subject"] or issue["title"] or issue["slug"])
+        items.append(
+            f'<li><a href="{escape(issue["slug"])}.html">{label}</a> '
+            f'<span class="meta">{escape(issue["newsletter"])} · {date} · {issue["story_count"]} stories</span></li>'
+        )
+    return '<ul class="issues">\n' + "\n".join(items) + "\n</ul>\n"
+
+
+def _month_page(month, issues):
+    title = f"{datetime.strptime(month, '%Y-%m'):%B %Y}"
+    body = f'<nav><a href="index.html">Archive</a></nav>\n<h1>{title}</h1>\n' + _issue_list(issues[::-1])
+    return _page(f"Newsletter archive · {title}", body)
+
+
+def _index_page(recent, months):
+    month_links = " · ".join(
+        f'<a href="{month}.html">{datetime.strptime(month, "%Y-%m"):%b %Y}</a> ({len(listed)})'
+        for month, listed in sorted(months.items(), reverse=True)
+    )
+    body = (
+        "<h1>Newsletter archive</h1>\n<h2>Latest issues</h2>\n" + _issue_list(recent)
+        + f"<h2>By month</h2>\n<p>{month_links}</p>\n"
+    )
+    return _page("Newsletter archive", body)
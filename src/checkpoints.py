@@ -0,0 +1,158 @@
+"""
+Run Checkpoints
+===============
+Each run gets a directory where every pipeline stage saves its output,
+together with a hash of the inputs it was computed from:
+
+    data/runs/<run-id>/manifest.json           stage -> input hash, file, output hash
+    data/runs/<run-id>/fetch.json              posts by subreddit
+    data/runs/<run-id>/select-<name>.json      ranked candidates for a newsletter
+    data/runs/<run-id>/enrich-<name>.json      their top comments (if comments are enabled)
+    data/runs/<run-id>/curate-<name>.json      the LLM's newsletter
+    data/runs/<run-id>/render-<name>.eml       the rendered email
+    data/runs/<run-id>/deliver-<name>.json     delivery outcome
+
+`python main.py --resume <run-id>` runs the pipeline again in the same
+directory. Stages whose inputs hash the same as last time load their
+saved output instead of running, so a run that died while sending only
+retries the send, without fetching or calling the LLM again.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+def content_hash(value):
+    """SHA-256 of bytes, or of a JSON-serializable value in canonical form."""
+    if not isinstance(value, bytes):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(value).hexdigest()
+
+
+def _write_atomic(path, data):
+    """Write bytes so a crash never leaves a half-written file behind."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class RunCheckpoints:
+    """Stage outputs of one run, keyed by stage name and input hash."""
+
+    def __init__(self, root, run_id=None):
+        """
+        Args:
+            root: Directory holding every run (e.g. data/runs)
+            run_id: An earlier run to resume ("latest" for the most recent),
+                or None to start a new one
+
+        Raises:
+            ValueError if the run to resume does not exist
+        """
+        self.root = Path(root)
+        self.resumed = run_id is not None
+        if run_id == "latest":
+            runs = list_runs(self.root)
+            if not runs:
+                raise ValueError(f"no earlier runs in {self.root}")
+            run_id = runs[-1]
+        elif run_id is None:
+            run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(3)}"
+        elif not (self.root / run_id / "manifest.json").is_file():
+            raise ValueError(f"no run {run_id!r} in {self.root}")
+
+        self.run_id = run_id
+        self.directory = self.root / run_id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        manifest_path = self.directory / "manifest.json"
+        if manifest_path.exists():
+            self._manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        else:
+            self._manifest = {"run_id": run_id, "created_at": datetime.now().isoformat(), "stages": {}}
+            self._write_manifest()
+
+    def _write_manifest(self):
+        data = json.dumps(self._manifest, indent=2, ensure_ascii=False).encode("utf-8")
+        _write_atomic(self.directory / "manifest.json", data)
+
+    def load(self, stage, inputs):
+        """
+        Saved output of `stage`, if it last ran with the same inputs.
+
+        Args:
+            stage: Stage name, e.g. "fetch" or "curate-ai"
+            inputs: JSON-serializable value (or bytes) the output depends on
+
+        Returns:
+            The saved value (bytes for .eml stages), or None if the stage
+            has to run
+        """
+        with self._lock:
+            entry = self._manifest["stages"].get(stage)
+        if entry is None or entry["input_hash"] != content_hash(inputs):
+            return None
+        try:
+            data = (self.directory / entry["file"]).read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != entry["output_hash"]:
+            print(f"    ⚠️  Checkpoint '{stage}' is damaged; running the stage again.")
+            return None
+        return data if entry["file"].endswith(".eml") else json.loads(data)
+
+    def save(self, stage, inputs, output):
+        """
+        Save a stage's output (bytes are stored as .eml, anything else as JSON).
+
+        Returns:
+            Hash of the stored output
+        """
+        if isinstance(output, bytes):
+            filename, data = f"{stage}.eml", output
+        else:
+            filename = f"{stage}.json"
+            data = json.dumps(output, indent=2, ensure_ascii=False, default=str).encode("utf-8")
+        _write_atomic(self.directory / filename, data)
+
+        output_hash = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._manifest["stages"][stage] = {
+                "input_hash": content_hash(inputs),
+                "file": filename,
+                "output_hash": output_hash,
+                "saved_at": datetime.now().isoformat(),
+            }
+            self._write_manifest()
+        return output_hash
+
+
+def list_runs(root):
+    """IDs of the checkpointed runs under `root`, oldest first."""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / "manifest.json").is_file())
+
+
+def prune_runs(root, keep):
+    """
+    Delete all but the `keep` most recent runs.
+
+    Returns:
+        Number of runs removed
+    """
+    runs = list_runs(root)
+    stale = runs[:-keep] if keep else runs
+    for run_id in stale:
+        shutil.rmtree(Path(root) / run_id, ignore_errors=True)
+    return len(stale)
@@ -0,0 +1,123 @@
+"""
+Comment Enrichment
+==================
+Adds the top comments of each candidate's Reddit thread to the prompt, so
+the LLM can write about how a story was received, not only what it says.
+
+Threads are fetched by a bounded worker pool through the fetcher's shared
+connection pool and per-host rate limiter, so with enough workers the
+stage takes about as long as the slowest few threads, not the sum of all
+of them (as long as the host's rate limit allows that many requests).
+
+The condensed comments are cached on disk per permalink, so a preview
+followed by the real send fetches every thread once.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import metrics
+from src.config_loader import PROJECT_ROOT
+from src.disk_cache import DiskCache
+from src.reddit_fetcher import fetch_comments
+
+_settings = {
+    "top_comments": 5,
+    "max_comment_chars": 300,
+    "max_workers": 8,
+    "max_retries": 3,
+    "ttl_seconds": 6 * 3600,
+}
+_cache = None
+
+
+def configure(top_comments=5, max_comment_chars=300, max_workers=8, max_retries=3,
+              cache_directory=".cache/comments", ttl_seconds=6 * 3600, max_size_mb=20):
+    """
+    Set up comment enrichment.
+
+    Args:
+        top_comments: Comments kept per thread
+        max_comment_chars: Longest comment kept (longer ones are cut)
+        max_workers: Threads fetched at the same time
+        max_retries: Attempts per thread when rate limited or timing out
+        cache_directory: Cache directory (relative paths are resolved from
+            the project root; None disables the cache)
+        ttl_seconds: How long a thread's cached comments are reused (0 disables the cache)
+        max_size_mb: Size bound; least recently used threads are evicted beyond it
+    """
+    global _cache
+    _settings.update(
+        top_comments=top_comments,
+        max_comment_chars=max_comment_chars,
+        max_workers=max_workers,
+        max_retries=max_retries,
+        ttl_seconds=ttl_seconds,
+    )
+    if cache_directory is None or not ttl_seconds:
+        _cache = None
+        return
+    _cache = DiskCache(PROJECT_ROOT / cache_directory, max_bytes=int(max_size_mb * 1024 * 1024))
+
+
+def _cache_key(reddit_link):
+    return f"{reddit_link}#top={_settings['top_comments']}&chars={_settings['max_comment_chars']}"
+
+
+def _thread_comments(reddit_link):
+    """
+    Top comments of one thread, from the cache or from Reddit.
+
+    Returns:
+        Tuple of (list of comments or None if unavailable, source), where
+        source is 'cache', 'network' or 'failed'
+    """
+    key = _cache_key(reddit_link)
+    if _cache is not None:
+        entry = _cache.get(key)
+        if entry is not None and DiskCache.is_fresh(entry, _settings["ttl_seconds"]):
+            return json.loads(entry["body"]), "cache"
+
+    with metrics.span("comments.fetch"):
+        comments = fetch_comments(
+            reddit_link,
+            limit=_settings["top_comments"],
+            max_retries=_settings["max_retries"],
+            max_chars=_settings["max_comment_chars"],
+        )
+    if comments is None:
+        return None, "failed"
+    if _cache is not None:
+        _cache.set(key, json.dumps(comments).encode("utf-8"))
+    return comments, "network"
+
+
+def fetch_top_comments(posts):
+    """
+    Fetch the top comments of every post's thread concurrently.
+
+    Args:
+        posts: Candidate posts (each needs a 'reddit_link')
+
+    Returns:
+        List with one entry per post, in the same order: its comments
+        (possibly empty), or None if the thread could not be fetched
+    """
+    if not posts:
+        return []
+    started = time.perf_counter()
+    workers = max(1, min(_settings["max_workers"], len(posts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="comments") as pool:
+        results = list(pool.map(lambda post: _thread_comments(post.get("reddit_link", "")), posts))
+
+    sources = [source for _, source in results]
+    for source in ("cache", "network", "failed"):
+        if sources.count(source):
+            metrics.count("comments.threads", sources.count(source), result=source)
+    enriched = sum(1 for comments, _ in results if comments)
+    print(f"    💬 Top comments for {enriched}/{len(posts)} posts "
+          f"({sources.count('network')} fetched, {sources.count('cache')} cached, "
+          f"{sources.count('failed')} failed) in {time.perf_counter() - started:.1f}s "
+          f"with {workers} workers")
+    return [comments for comments, _ in results]
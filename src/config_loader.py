@@ -1,82 +1,548 @@
 """
 Configuration loader for the Reddit Newsletter.
 Loads settings from config/settings.yaml and provides defaults.
+
+Settings are parsed once into typed, read-only dataclasses (validated
+against the schema below) and memoized. get_config() only re-reads the
+file when its mtime/size changes and only re-parses it when the content
+hash does, so a long-running process picks up edits cheaply. If an edit
+is invalid, the last good configuration stays in effect.
 """
 
+import hashlib
 import os
+import re
+import threading
 import yaml
+from dataclasses import MISSING, asdict, dataclass, field, fields, is_dataclass, replace
 from pathlib import Path
+from typing import Dict, List, Optional, Union, get_args, get_origin, get_type_hints
+
+from src.scheduler import parse_cron
 
 # Find the project root (where main.py lives)
 PROJECT_ROOT = Path(__file__).parent.parent
 
-def load_config():
+CONFIG_PATH = PROJECT_ROOT / "config" / "settings.yaml"
+
+# Environment variable that points get_config() at another settings file
+CONFIG_ENV_VAR = "NEWSLETTER_CONFIG"
+
+TIME_PERIODS = ("hour", "day", "week", "month", "year", "all")
+
+
+class ConfigError(ValueError):
+    """settings.yaml could not be parsed or does not match the schema."""
+
+
+def _setting(default=MISSING, *, factory=MISSING, choices=None, minimum=None, check=None):
     """
-    Load configuration from settings.yaml.
-    Returns a dictionary with all settings, using defaults if file is missing.
+    A dataclass field with optional validation rules. `check` is a callable
+    that raises ValueError for an invalid value.
+    """
+    return field(default=default, default_factory=factory,
+                 metadata={"choices": choices, "minimum": minimum, "check": check})
+
+
+# --- Schema (the defaults here are used for anything settings.yaml leaves out) ---
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests_per_second: float = _setting(1.0, minimum=0.001)
+    burst: int = _setting(2, minimum=1)
+
+
+@dataclass(frozen=True)
+class EndpointHealthSettings:
+    state_file: str = ".cache/endpoint_health.json"
+    failure_threshold: int = _setting(3, minimum=1)
+    cooldown_seconds: float = _setting(21600, minimum=0)
+
+
+@dataclass(frozen=True)
+class FetchSettings:
+    posts_per_subreddit: int = _setting(5, minimum=1)
+    time_period: str = _setting("week", choices=TIME_PERIODS)
+    delay_between_requests: float = _setting(1.0, minimum=0)
+    max_retries: int = _setting(3, minimum=1)
+    max_workers: int = _setting(4, minimum=1)
+    page_size: int = _setting(100, minimum=1)
+    max_total_posts: Optional[int] = _setting(None, minimum=1)
+    max_text_chars: int = _setting(2000, minimum=0)
+    base_url: Optional[str] = None
+    rate_limits: Dict[str, RateLimit] = _setting(factory=lambda: {
+        "www.reddit.com": RateLimit(1.0, 2),
+        "old.reddit.com": RateLimit(1.0, 2),
+    })
+    endpoint_health: EndpointHealthSettings = _setting(factory=EndpointHealthSettings)
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    pool_size: int = _setting(10, minimum=1)
+    connect_timeout: float = _setting(5.0, minimum=0.1)
+    read_timeout: float = _setting(15.0, minimum=0.1)
+    http2: bool = False
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    enabled: bool = True
+    directory: str = ".cache/http"
+    max_size_mb: float = _setting(50, minimum=0)
+    ttl_seconds: Dict[str, int] = _setting(factory=lambda: {
+        "hour": 300, "day": 3600, "week": 21600, "month": 86400, "year": 86400, "all": 86400,
+    })
+
+
+@dataclass(frozen=True)
+class NewsletterSettings:
+    stories_to_include: str = "5-7"
+    output_directory: str = "output/newsletters"
+    output_filename: str = "weekly_digest.md"
+    max_concurrency: int = _setting(3, minimum=1)
+
+
+def _check_newsletter_name(name):
+    if not re.fullmatch(r"[A-Za-z0-9_.-]+", name):
+        raise ValueError(f"{name!r} may only contain letters, digits, '.', '_' and '-'")
+
+
+def _check_unique_names(definitions):
+    names = [d.name for d in definitions]
+    for name in names:
+        if names.count(name) > 1:
+            raise ValueError(f"newsletter name {name!r} is used more than once")
+
+
+@dataclass(frozen=True)
+class NewsletterDefinition:
+    """One digest. Settings left out fall back to the top-level ones."""
+    name: str = _setting("weekly", check=_check_newsletter_name)
+    subreddits: Optional[List[str]] = None
+    instructions: Optional[str] = None
+    subject: Optional[str] = None
+    recipients_env: Optional[str] = None
+    output_filename: Optional[str] = None
+    seen_index_path: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class LLMRetrySettings:
+    max_retries: int = _setting(3, minimum=0)
+    base_delay: float = _setting(2.0, minimum=0)
+    max_delay: float = _setting(60.0, minimum=0)
+
+
+@dataclass(frozen=True)
+class LLMCacheSettings:
+    enabled: bool = True
+    directory: str = ".cache/llm"
+    ttl_seconds: float = _setting(86400, minimum=0)
+    max_size_mb: float = _setting(20, minimum=0)
+
+
+@dataclass(frozen=True)
+class MapReduceSettings:
+    enabled: Union[bool, str] = _setting("auto", choices=(True, False, "auto"))
+    auto_threshold_tokens: Optional[int] = _setting(60000, minimum=100)
+    batch_tokens: int = _setting(8000, minimum=100)
+    max_concurrency: int = _setting(4, minimum=1)
+    max_total_tokens: int = _setting(200000, minimum=100)
+    shortlist_per_batch: int = _setting(5, minimum=1)
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    provider: str = _setting("gemini", choices=("gemini", "openai"))
+    model: str = "gemini-2.0-flash-exp"
+    fallback_model: Optional[str] = None
+    base_url: Optional[str] = None
+    api_key_env: Optional[str] = None
+    timeout: float = _setting(120, minimum=1)
+    retry: LLMRetrySettings = _setting(factory=LLMRetrySettings)
+    stream: bool = True
+    prompt_token_budget: Optional[int] = _setting(30000, minimum=0)
+    cache: LLMCacheSettings = _setting(factory=LLMCacheSettings)
+    map_reduce: MapReduceSettings = _setting(factory=MapReduceSettings)
+
+
+def _check_llm(llm):
+    # A Gemini model name means nothing to an OpenAI-compatible server, and
+    # failing over to it would hide the primary model's real error
+    if llm.provider != "gemini" and llm.fallback_model and llm.fallback_model.startswith("gemini"):
+        raise ValueError(f"fallback_model {llm.fallback_model!r} is a Gemini model but provider is "
+                         f"{llm.provider!r}; use a model the server has, or null")
+    threshold = llm.map_reduce.auto_threshold_tokens
+    if threshold and llm.prompt_token_budget and threshold < llm.prompt_token_budget:
+        raise ValueError(f"map_reduce.auto_threshold_tokens ({threshold}) is below prompt_token_budget "
+                         f"({llm.prompt_token_budget}); prompts that fit the budget would go to map-reduce")
+
+
+@dataclass(frozen=True)
+class SmtpSettings:
+    host: str = "smtp.gmail.com"
+    port: int = _setting(465, minimum=1)
+    security: str = _setting("ssl", choices=("ssl", "starttls", "none"))
+    timeout: float = _setting(30, minimum=1)
+    batch_size: int = _setting(50, minimum=1)
+    batch_delay: float = _setting(1.0, minimum=0)
+    max_messages_per_connection: int = _setting(100, minimum=1)
+    keep_alive_seconds: float = _setting(0, minimum=0)
+
+
+@dataclass(frozen=True)
+class SpoolSettings:
+    enabled: bool = True
+    directory: str = "data/spool"
+    max_attempts: int = _setting(5, minimum=1)
+    base_delay: float = _setting(300, minimum=0)
+    max_delay: float = _setting(21600, minimum=0)
+
+
+@dataclass(frozen=True)
+class EmailSettings:
+    subject: str = "🚀 The Weekly Sync"
+    send_on_completion: bool = True
+    smtp: SmtpSettings = _setting(factory=SmtpSettings)
+    spool: SpoolSettings = _setting(factory=SpoolSettings)
+
+
+@dataclass(frozen=True)
+class DedupSettings:
+    enabled: bool = True
+    max_hamming_distance: int = _setting(3, minimum=0)
+
+
+@dataclass(frozen=True)
+class RankingSettings:
+    enabled: bool = True
+    top_k: Optional[int] = _setting(20, minimum=0)
+    recency_half_life_hours: float = _setting(72, minimum=0.01)
+    weights: Dict[str, float] = _setting(factory=lambda: {
+        "score": 1.0, "recency": 0.5, "reputation": 0.75, "novelty": 0.5,
+    })
+
+
+@dataclass(frozen=True)
+class CommentSettings:
+    enabled: bool = False
+    top_comments: int = _setting(5, minimum=1)
+    max_comment_chars: int = _setting(300, minimum=20)
+    max_workers: int = _setting(8, minimum=1)
+    max_retries: int = _setting(3, minimum=1)
+    cache_directory: str = ".cache/comments"
+    cache_ttl_seconds: float = _setting(21600, minimum=0)
+    cache_max_size_mb: float = _setting(20, minimum=1)
+
+
+@dataclass(frozen=True)
+class SeenIndexSettings:
+    enabled: bool = True
+    path: str = "data/seen_posts.sqlite3"
+    retention_weeks: float = _setting(8, minimum=0)
+
+
+@dataclass(frozen=True)
+class ArchiveSettings:
+    enabled: bool = True
+    directory: str = "data/archive"
+    build_site: bool = True
+    site_directory: str = "output/archive"
+
+
+@dataclass(frozen=True)
+class CheckpointSettings:
+    enabled: bool = True
+    directory: str = "data/runs"
+    keep_runs: int = _setting(20, minimum=1)
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    enabled: bool = True
+    report_file: str = "data/metrics/last_run.json"
+    prometheus_textfile: Optional[str] = None
+    show_summary: bool = True
+    profile_directory: str = "data/metrics"
+
+
+@dataclass(frozen=True)
+class ScheduleSettings:
+    name: str = "weekly"
+    cron: str = _setting("0 8 * * mon", check=parse_cron)
+    send_email: bool = True
+    newsletters: Optional[List[str]] = None
+
+
+@dataclass(frozen=True)
+class DaemonSettings:
+    schedules: List[ScheduleSettings] = _setting(factory=lambda: [ScheduleSettings()])
+    poll_seconds: float = _setting(30, minimum=1)
+    flush_spool_minutes: float = _setting(30, minimum=0)
+
+
+@dataclass(frozen=True)
+class Config:
+    subreddits: List[str] = _setting(factory=lambda: [
+        "LocalLLaMA", "AI_Agents", "PromptEngineering", "MachineLearning", "technews",
+    ])
+    fetch: FetchSettings = _setting(factory=FetchSettings)
+    http: HttpSettings = _setting(factory=HttpSettings)
+    cache: CacheSettings = _setting(factory=CacheSettings)
+    newsletter: NewsletterSettings = _setting(factory=NewsletterSettings)
+    newsletters: List[NewsletterDefinition] = _setting(factory=list, check=_check_unique_names)
+    llm: LLMSettings = _setting(factory=LLMSettings, check=_check_llm)
+    email: EmailSettings = _setting(factory=EmailSettings)
+    dedup: DedupSettings = _setting(factory=DedupSettings)
+    ranking: RankingSettings = _setting(factory=RankingSettings)
+    comments: CommentSettings = _setting(factory=CommentSettings)
+    seen_index: SeenIndexSettings = _setting(factory=SeenIndexSettings)
+    archive: ArchiveSettings = _setting(factory=ArchiveSettings)
+    checkpoints: CheckpointSettings = _setting(factory=CheckpointSettings)
+    metrics: MetricsSettings = _setting(factory=MetricsSettings)
+    daemon: DaemonSettings = _setting(factory=DaemonSettings)
+
+
+# --- Validation ---
+
+def _type_name(hint):
+    if is_dataclass(hint):
+        return "section"
+    return getattr(hint, "__name__", str(hint).replace("typing.", ""))
+
+
+def _convert(value, hint, path, default=None):
+    """Check `value` against a type hint and convert it (e.g. int -> float)."""
+    origin = get_origin(hint)
+
+    if is_dataclass(hint):
+        if not isinstance(value, dict):
+            raise ConfigError(f"{path}: expected a section of settings, got {value!r}")
+        return _build(hint, value, path)
+
+    if origin is Union:
+        options = get_args(hint)
+        if value is None and type(None) in options:
+            return None
+        for option in options:
+            if option is type(None):
+                continue
+            try:
+                return _convert(value, option, path, default)
+            except ConfigError:
+                continue
+        names = " or ".join(_type_name(o) for o in options if o is not type(None))
+        raise ConfigError(f"{path}: expected {names}, got {value!r}")
+
+    if origin is list:
+        if not isinstance(value, list):
+            raise ConfigError(f"{path}: expected a list, got {value!r}")
+        (item_hint,) = get_args(hint)
+        return [_convert(item, item_hint, f"{path}[{i}]") for i, item in enumerate(value)]
+
+    if origin is dict:
+        if not isinstance(value, dict):
+            raise ConfigError(f"{path}: expected a mapping, got {value!r}")
+        _, value_hint = get_args(hint)
+        merged = dict(default or {})  # Keys not mentioned keep their defaults
+        for key, item in value.items():
+            merged[str(key)] = _convert(item, value_hint, f"{path}.{key}")
+        return merged
+
+    if hint is bool:
+        if not isinstance(value, bool):
+            raise ConfigError(f"{path}: expected true or false, got {value!r}")
+        return value
+    if hint is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ConfigError(f"{path}: expected a whole number, got {value!r}")
+        return value
+    if hint is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ConfigError(f"{path}: expected a number, got {value!r}")
+        return float(value)
+    if hint is str:
+        if not isinstance(value, str):
+            raise ConfigError(f"{path}: expected text, got {value!r}")
+        return value
+    return value
+
+
+def _build(cls, data, path=""):
+    """Instantiate a settings dataclass from a (partial) mapping."""
+    hints = get_type_hints(cls)
+    by_name = {f.name: f for f in fields(cls)}
+    unknown = [key for key in data if key not in by_name]
+    if unknown:
+        prefix = f"{path}." if path else ""
+        raise ConfigError(f"{prefix}{unknown[0]}: unknown setting "
+                          f"(expected one of: {', '.join(by_name)})")
+
+    defaults = cls()
+    values = {}
+    for name, f in by_name.items():
+        if name not in data:
+            continue
+        key_path = f"{path}.{name}" if path else name
+        value = _convert(data[name], hints[name], key_path, getattr(defaults, name))
+
+        choices = f.metadata.get("choices")
+        if choices is not None and value not in choices:
+            allowed = ", ".join(str(c).lower() if isinstance(c, bool) else str(c) for c in choices)
+            raise ConfigError(f"{key_path}: {value!r} is not one of: {allowed}")
+        minimum = f.metadata.get("minimum")
+        if minimum is not None and value is not None and value < minimum:
+            raise ConfigError(f"{key_path}: must be at least {minimum}, got {value!r}")
+        check = f.metadata.get("check")
+        if check is not None and value is not None:
+            try:
+                check(value)
+            except ValueError as e:
+                raise ConfigError(f"{key_path}: {e}") from None
+        values[name] = value
+    return cls(**values)
+
+
+def parse_config(text, source="settings.yaml"):
+    """
+    Parse and validate YAML settings.
+
+    Raises:
+        ConfigError naming the offending setting
     """
-    config_path = PROJECT_ROOT / "config" / "settings.yaml"
-    
-    # Default configuration (used if file doesn't exist or is incomplete)
-    defaults = {
-        "subreddits": ["LocalLLaMA", "AI_Agents", "PromptEngineering", "MachineLearning", "technews"],
-        "fetch": {
-            "posts_per_subreddit": 5,
-            "time_period": "week",
-            "delay_between_requests": 1.0,
-            "max_retries": 3
-        },
-        "newsletter": {
-            "stories_to_include": "5-7",
-            "output_directory": "output/newsletters",
-            "output_filename": "weekly_digest.md"
-        },
-        "email": {
-            "subject": "🚀 The Weekly Sync",
-            "send_on_completion": True
-        }
-    }
-    
-    if not config_path.exists():
-        print(f"⚠️  Config file not found at {config_path}, using defaults.")
-        return defaults
-    
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            user_config = yaml.safe_load(f)
-        
-        # Merge user config with defaults (user settings override defaults)
-        config = _deep_merge(defaults, user_config or {})
-        return config
-        
-    except Exception as e:
-        print(f"⚠️  Error loading config: {e}. Using defaults.")
-        return defaults
-
-
-def _deep_merge(base: dict, override: dict) -> dict:
+        data = yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ConfigError(f"{source}: invalid YAML: {e}") from e
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ConfigError(f"{source}: expected a mapping of settings at the top level")
+    try:
+        return _build(Config, data)
+    except ConfigError as e:
+        raise ConfigError(f"{source}: {e}") from None
+
+
+# --- Memoized loading ---
+
+_lock = threading.Lock()
+_loaded = {"stat": None, "hash": None, "config": None}
+
+
+def get_config(path=None):
     """
-    Deep merge two dictionaries. Values in 'override' take precedence.
+    The current configuration, parsed at most once per file change.
+
+    Args:
+        path: Settings file (default: $NEWSLETTER_CONFIG, else config/settings.yaml)
+
+    Returns:
+        Config instance (defaults if the file does not exist)
+
+    Raises:
+        ConfigError if the file is invalid and no earlier version was loaded
     """
-    result = base.copy()
-    for key, value in override.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-            result[key] = _deep_merge(result[key], value)
-        else:
-            result[key] = value
-    return result
+    path = Path(path or os.environ.get(CONFIG_ENV_VAR) or CONFIG_PATH)
+    with _lock:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            if _loaded["stat"] != "missing":
+                print(f"⚠️  Config file not found at {path}, using defaults.")
+                _loaded.update(stat="missing", hash=None, config=Config())
+            return _loaded["config"]
+
+        stat_key = (str(path), st.st_mtime_ns, st.st_size)
+        if stat_key == _loaded["stat"]:
+            return _loaded["config"]
+
+        raw = path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest != _loaded["hash"] or _loaded["config"] is None:
+            try:
+                config = parse_config(raw.decode("utf-8"), source=str(path))
+            except (ConfigError, UnicodeDecodeError) as e:
+                if _loaded["config"] is None or _loaded["stat"] == "missing":
+                    raise ConfigError(str(e)) from None
+                print(f"⚠️  {e}")
+                print("   Keeping the previous settings until the file is fixed.")
+                _loaded["stat"] = stat_key  # Don't re-report until it changes again
+                return _loaded["config"]
+            _loaded["config"] = config
+            _loaded["hash"] = digest
+        _loaded["stat"] = stat_key
+        return _loaded["config"]
+
+
+def load_config():
+    """
+    Load configuration from settings.yaml.
+    Returns a dictionary with all settings (see get_config() for typed access).
+    """
+    return asdict(get_config())
 
 
 def get_subreddits():
     """Convenience function to get just the subreddit list."""
-    return load_config().get("subreddits", [])
+    return get_config().subreddits
 
 
 def get_fetch_settings():
-    """Convenience function to get fetch-related settings."""
-    return load_config().get("fetch", {})
+    """Convenience function to get fetch-related settings, as a dictionary."""
+    return asdict(get_config().fetch)
 
 
 def get_email_settings():
-    """Convenience function to get email-related settings."""
-    return load_config().get("email", {})
+    """Convenience function to get email-related settings, as a dictionary."""
+    return asdict(get_config().email)
+
+
+def newsletter_definitions(config=None, names=None):
+    """
+    The newsletters to produce, with every fallback filled in.
+
+    Without a `newsletters:` section there is a single newsletter built from
+    the top-level settings (subreddits, email.subject, RECIPIENT_EMAIL,
+    newsletter.output_filename and seen_index.path).
+
+    Args:
+        config: Config instance (defaults to get_config())
+        names: Only these newsletters (None for all)
+
+    Returns:
+        List of NewsletterDefinition with no None fields except `instructions`
+
+    Raises:
+        ConfigError if `names` mentions an unknown newsletter
+    """
+    config = config or get_config()
+    definitions = config.newsletters
+    if not definitions:
+        definitions = [NewsletterDefinition(
+            name="weekly",
+            output_filename=config.newsletter.output_filename,
+            seen_index_path=config.seen_index.path,
+        )]
+
+    if names:
+        known = {d.name for d in definitions}
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ConfigError(f"unknown newsletter {unknown[0]!r} "
+                              f"(configured: {', '.join(sorted(known))})")
+        definitions = [d for d in definitions if d.name in names]
+
+    seen = Path(config.seen_index.path)
+    return [
+        replace(
+            d,
+            subreddits=d.subreddits or config.subreddits,
+            subject=d.subject or config.email.subject,
+            recipients_env=d.recipients_env or "RECIPIENT_EMAIL",
+            output_filename=d.output_filename or f"{d.name}.md",
+            seen_index_path=d.seen_index_path or str(seen.with_name(f"{seen.stem}-{d.name}{seen.suffix}")),
+        )
+        for d in definitions
+    ]
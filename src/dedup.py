@@ -0,0 +1,148 @@
+"""
+Cross-Subreddit Deduplication
+=============================
+Clusters near-duplicate posts (the same story crossposted to several
+subreddits) and collapses each cluster into a single item that lists all
+of its discussion threads.
+
+Two posts are duplicates if they link to the same external URL, or if the
+64-bit SimHashes of their title + text differ in at most a few bits.
+SimHashes are bucketed by bands (locality-sensitive hashing), so only
+posts that share a band are ever compared and the whole pass stays
+linear in the number of posts.
+"""
+
+import hashlib
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+from src.ranker import tokenize
+
+SIMHASH_BITS = 64
+
+# Posts with fewer content words than this are only matched by URL
+MIN_TOKENS_FOR_SIMHASH = 4
+
+_TRACKING_PARAMS = ("utm_", "ref", "fbclid", "gclid")
+
+
+def normalize_url(url):
+    """Canonical form of an external URL (no scheme/www/tracking/fragment differences)."""
+    parsed = urlparse(url or "")
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [
+        (k, v) for k, v in parse_qsl(parsed.query)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ]
+    path = parsed.path.rstrip("/")
+    return urlunparse(("", host, path, "", urlencode(sorted(query)), ""))
+
+
+def _is_external(post):
+    url = post.get("url") or ""
+    host = (urlparse(url).hostname or "").lower()
+    return bool(url) and url != post.get("reddit_link") and not host.endswith("reddit.com")
+
+
+def simhash(tokens):
+    """64-bit SimHash of a token list (unigrams plus bigrams as features)."""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    counts = [0] * SIMHASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            counts[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if counts[bit] > 0)
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def cluster_posts(posts, max_hamming_distance=3):
+    """
+    Group near-duplicate posts.
+
+    Returns:
+        List of clusters (lists of indexes into `posts`), in order of first appearance
+    """
+    uf = _UnionFind(len(posts))
+
+    # 1. Exact external URL
+    by_url = {}
+    for i, post in enumerate(posts):
+        if _is_external(post):
+            key = normalize_url(post["url"])
+            if key in by_url:
+                uf.union(by_url[key], i)
+            else:
+                by_url[key] = i
+
+    # 2. SimHash over title + text, bucketed by band. With d+1 bands, two
+    #    hashes within Hamming distance d must agree on at least one band.
+    bands = max_hamming_distance + 1
+    band_bits = SIMHASH_BITS // bands
+    band_mask = (1 << band_bits) - 1
+
+    hashes = {}
+    buckets = {}
+    for i, post in enumerate(posts):
+        tokens = tokenize(f"{post.get('title', '')} {post.get('text', '')}")
+        if len(tokens) < MIN_TOKENS_FOR_SIMHASH:
+            continue
+        h = hashes[i] = simhash(tokens)
+        for band in range(bands):
+            key = (band, (h >> (band * band_bits)) & band_mask)
+            for j in buckets.get(key, ()):
+                if bin(h ^ hashes[j]).count("1") <= max_hamming_distance:
+                    uf.union(i, j)
+            buckets.setdefault(key, []).append(i)
+
+    clusters = {}
+    for i in range(len(posts)):
+        clusters.setdefault(uf.find(i), []).append(i)
+    return list(clusters.values())
+
+
+def collapse_duplicates(posts, max_hamming_distance=3):
+    """
+    Collapse each cluster of near-duplicates into one post.
+
+    The highest-scoring post of a cluster represents it. Its 'discussions'
+    key lists every thread in the cluster as {'subreddit', 'reddit_link'},
+    representative first.
+
+    Returns:
+        Tuple of (collapsed posts, number of duplicates removed)
+    """
+    collapsed = []
+    for cluster in cluster_posts(posts, max_hamming_distance):
+        members = [posts[i] for i in cluster]
+        representative = max(members, key=lambda p: p.get("score") or 0)
+        ordered = [representative] + [p for p in members if p is not representative]
+
+        item = dict(representative)
+        item["discussions"] = [
+            {"subreddit": p.get("subreddit", ""), "reddit_link": p.get("reddit_link", "")}
+            for p in ordered
+        ]
+        if not _is_external(item):
+            external = next((p for p in ordered if _is_external(p)), None)
+            if external:
+                item["url"] = external["url"]
+        collapsed.append(item)
+
+    return collapsed, len(posts) - len(collapsed)
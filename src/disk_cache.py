@@ -0,0 +1,130 @@
+"""
+Disk Cache
+==========
+A small, size-bounded on-disk key/value store with LRU eviction.
+Each entry is a body file plus a JSON metadata file, so cached data
+survives between runs of the pipeline.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class DiskCache:
+    """
+    Stores bytes under string keys in `directory`.
+
+    Entries remember when they were stored; callers decide what "fresh"
+    means via `is_fresh()`. Every read refreshes the entry's mtime, and
+    the least recently used entries are evicted once the total size
+    exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.bin", self.directory / f"{digest}.json"
+
+    def get(self, key):
+        """
+        Look up `key`.
+
+        Returns:
+            Dictionary with 'body' (bytes) and 'meta' (dict), or None if missing
+        """
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                body = body_path.read_bytes()
+            except (OSError, ValueError):
+                return None
+            # Mark as recently used
+            now = time.time()
+            try:
+                os.utime(body_path, (now, now))
+            except OSError:
+                pass
+        return {"body": body, "meta": meta}
+
+    def set(self, key, body, meta=None):
+        """Store `body` (bytes) with optional metadata under `key`."""
+        body_path, meta_path = self._paths(key)
+        meta = dict(meta or {})
+        meta.setdefault("key", key)
+        meta["stored_at"] = time.time()
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            total = self._current_size()
+            if body_path.exists():
+                total -= body_path.stat().st_size
+            tmp_path = body_path.with_suffix(".tmp")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, body_path)
+            meta_path.write_text(json.dumps(meta), encoding="utf-8")
+            self._total_bytes = total + len(body)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, key, **meta_updates):
+        """Reset an entry's stored_at (and update metadata) without rewriting the body."""
+        _, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return
+            meta.update(meta_updates)
+            meta["stored_at"] = time.time()
+            meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            if self.directory.exists():
+                for path in self.directory.iterdir():
+                    if path.suffix in (".bin", ".json", ".tmp"):
+                        path.unlink(missing_ok=True)
+            self._total_bytes = 0
+
+    @staticmethod
+    def is_fresh(entry, ttl_seconds):
+        """True if `entry` was stored less than `ttl_seconds` ago."""
+        return time.time() - entry["meta"].get("stored_at", 0) < ttl_seconds
+
+    def _current_size(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(
+                p.stat().st_size for p in self.directory.glob("*.bin")
+            )
+        return self._total_bytes
+
+    def _evict(self):
+        """Drop least recently used entries until we are at 90% of max_bytes."""
+        entries = []
+        for body_path in self.directory.glob("*.bin"):
+            try:
+                stat = body_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, body_path))
+        entries.sort()
+
+        target = self.max_bytes * 0.9
+        total = sum(size for _, size, _ in entries)
+        for _, size, body_path in entries:
+            if total <= target:
+                break
+            body_path.unlink(missing_ok=True)
+            body_path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+        self._total_bytes = total
@@ -1,16 +1,31 @@
 """
 Email Sender
 ============
-Sends the generated newsletter via Gmail SMTP.
+Sends the generated newsletter via SMTP (Gmail by default).
 Uses environment variables for secure credential handling.
+
+The body comes from config/email_template.html with its CSS inlined and
+minified, plus a text/plain alternative (see src/email_template.py).
+The message is rendered once and delivered over a single authenticated
+connection, one envelope per recipient (so recipients never see each
+other's addresses), in throttled batches to stay within provider limits.
 """
 
+import hashlib
+import re
 import smtplib
 import os
 import ssl
+import threading
+import time
+from email import policy
 from email.message import EmailMessage
+from email.utils import formatdate
 from dotenv import load_dotenv
 
+from src import metrics
+from src.email_template import get_template, html_to_text
+
 load_dotenv()
 
 # Placeholder images for email header/footer
@@ -18,113 +33,342 @@ load_dotenv()
 HEADER_IMG = "https://placehold.co/600x100/1a1a1a/ffffff/png?text=The+Weekly+Sync&font=lora"
 FOOTER_IMG = "https://placehold.co/600x50/f4f4f4/888888/png?text=Generated+by+Your+AI+Agent"
 
+# SMTP delivery settings; set up by configure()
+_smtp = {
+    "host": "smtp.gmail.com",
+    "port": 465,
+    "security": "ssl",
+    "timeout": 30,
+    "batch_size": 50,
+    "batch_delay": 1.0,
+    "max_messages_per_connection": 100,
+    "keep_alive_seconds": 0,
+}
+
+# Connection left open between deliveries when keep_alive_seconds > 0
+_warm = {"smtp": None, "key": None, "sent": 0, "last_used": 0.0}
+_warm_lock = threading.Lock()
+
+
+def configure(host="smtp.gmail.com", port=465, security="ssl", timeout=30, batch_size=50,
+              batch_delay=1.0, max_messages_per_connection=100, keep_alive_seconds=0):
+    """
+    Set up SMTP delivery.
+
+    Args:
+        host: SMTP server (e.g. "localhost" for a local sink such as
+            `python -m aiosmtpd -n -l localhost:8025`)
+        port: SMTP port
+        security: "ssl" (implicit TLS), "starttls", or "none" (local sinks only)
+        timeout: Socket timeout in seconds
+        batch_size: Recipients sent before pausing
+        batch_delay: Seconds to pause between batches
+        max_messages_per_connection: Reconnect after this many messages
+            (providers drop long-lived sessions)
+        keep_alive_seconds: Keep the connection open this long after a
+            delivery so the next one can reuse it (0 closes it right away)
+    """
+    if security not in ("ssl", "starttls", "none"):
+        raise ValueError(f"Unknown SMTP security mode: {security!r}")
+    _smtp.update(
+        host=host,
+        port=port,
+        security=security,
+        timeout=timeout,
+        batch_size=max(1, batch_size),
+        batch_delay=batch_delay,
+        max_messages_per_connection=max(1, max_messages_per_connection),
+        keep_alive_seconds=keep_alive_seconds,
+    )
+
+
+def recipients_from_env(variable="RECIPIENT_EMAIL"):
+    """Recipients from an environment variable (comma-separated)."""
+    recipient_env = os.environ.get(variable, "")
+    return [email.strip() for email in recipient_env.split(",") if email.strip()]
+
+
+def credentials():
+    """
+    Sender address and password from the environment.
+
+    Returns:
+        Tuple of (sender, password), or None (after printing why) if missing.
+        The password may be empty when security is "none" (local sinks).
+    """
+    sender_email = os.environ.get("EMAIL_ADDRESS")
+    password = os.environ.get("EMAIL_APP_PASSWORD")
+    if not sender_email or (not password and _smtp["security"] != "none"):
+        print("    ❌ Error: Missing EMAIL_ADDRESS or EMAIL_APP_PASSWORD in .env file.")
+        print("    → See README.md for setup instructions.")
+        return None
+    return sender_email, password
+
+
+def build_message(html_content, subject, sender, newsletter=None):
+    """
+    Builds the newsletter email, without a To header.
+
+    The Message-ID is derived from the content, so building the same issue
+    twice yields the same ID (which the mail spool uses to avoid resending).
+    Different newsletters get different IDs even if their content matches.
+
+    Args:
+        html_content: The HTML body content (generated by LLM)
+        subject: Email subject line
+        sender: From address
+        newsletter: Name of the newsletter this issue belongs to
+
+    Returns:
+        EmailMessage ready to be rendered with render_message()
+    """
+    scope = f"{newsletter}\0" if newsletter else ""
+    digest = hashlib.sha256(f"{scope}{sender}\0{subject}\0{html_content}".encode("utf-8")).hexdigest()
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['Date'] = formatdate(localtime=True)
+    msg['Message-ID'] = f"<{digest[:32]}.{newsletter or 'newsletter'}@{sender.rpartition('@')[2] or 'localhost'}>"
+
+    # Wrap AI content in the FT-style template, with a plain-text alternative
+    template = get_template(header_img=HEADER_IMG, footer_img=FOOTER_IMG)
+    full_html = template.render(html_content)
+    plain_text = f"THE WEEKLY SYNC\n\n{html_to_text(html_content)}\n--\nAutomated Briefing\n"
+    msg.set_content(plain_text)
+    msg.add_alternative(full_html, subtype='html')
+
+    before = len(template.render_unprocessed(html_content).encode("utf-8"))
+    after = len(full_html.encode("utf-8"))
+    print(f"    🗜️  Email HTML: {before / 1024:.1f} KB → {after / 1024:.1f} KB "
+          f"(CSS inlined, minified) + {len(plain_text.encode('utf-8')) / 1024:.1f} KB text/plain")
+    return msg
+
+
+def render_message(msg):
+    """Serializes a message once, with CRLF line endings, for reuse across recipients."""
+    return msg.as_bytes(policy=policy.SMTP)
+
+
+def _for_recipient(rendered, recipient):
+    """The rendered message with this recipient's own To header."""
+    return f"To: {recipient}\r\n".encode("utf-8") + rendered
+
+
+def _connect(sender_email, password):
+    """Opens (and, with a password, authenticates) an SMTP connection."""
+    host, port, timeout = _smtp["host"], _smtp["port"], _smtp["timeout"]
+    with metrics.span("smtp.connect", host=host):
+        if _smtp["security"] == "ssl":
+            smtp = smtplib.SMTP_SSL(host, port, timeout=timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(host, port, timeout=timeout)
+            if _smtp["security"] == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+        if password:
+            smtp.login(sender_email, password)
+    return smtp
+
+
+def _close(smtp):
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def _take_warm_connection(key):
+    """The kept-alive connection for `key` if it is still usable, else None."""
+    with _warm_lock:
+        smtp, sent = _warm["smtp"], _warm["sent"]
+        fresh = time.monotonic() - _warm["last_used"] < _smtp["keep_alive_seconds"]
+        matches = _warm["key"] == key
+        _warm.update(smtp=None, key=None, sent=0)
+    if smtp is None:
+        return None, 0
+    if matches and fresh:
+        try:
+            if smtp.noop()[0] == 250:
+                return smtp, sent
+        except (smtplib.SMTPException, OSError):
+            pass
+    _close(smtp)
+    return None, 0
+
+
+def close_idle_connection():
+    """Close the kept-alive connection once it has been idle for keep_alive_seconds."""
+    with _warm_lock:
+        smtp = _warm["smtp"]
+        if smtp is None or time.monotonic() - _warm["last_used"] < _smtp["keep_alive_seconds"]:
+            return
+        _warm.update(smtp=None, key=None, sent=0)
+    _close(smtp)
+
+
+def close_connection():
+    """Close the kept-alive connection, if any."""
+    with _warm_lock:
+        smtp = _warm["smtp"]
+        _warm.update(smtp=None, key=None, sent=0)
+    if smtp is not None:
+        _close(smtp)
+
+
+def is_permanent_failure(error):
+    """True if a deliver() error is a permanent (5xx) rejection not worth retrying."""
+    return bool(error and re.match(r"(Recipient refused|Rejected) \(5\d\d\)", error))
+
+
+def deliver(rendered, sender_email, password, recipients, results=None, on_result=None):
+    """
+    Delivers a rendered message to each recipient in its own envelope,
+    reusing one connection and throttling between batches.
+
+    Args:
+        rendered: Message bytes from render_message()
+        sender_email: Envelope sender (also used to log in)
+        password: SMTP password (None or empty to skip login, e.g. local sinks)
+        recipients: List of addresses
+        results: Optional dictionary to fill in as messages go out, so
+            progress survives an exception part-way through
+        on_result: Optional callback(recipient, error) called once per
+            recipient as soon as its outcome is known (error is None if
+            accepted), e.g. to persist progress
+
+    Returns:
+        Dictionary of recipient -> None if accepted, or an error message
+
+    Raises:
+        smtplib.SMTPAuthenticationError if the server rejects the credentials
+    """
+    results = {} if results is None else results
+    key = (_smtp["host"], _smtp["port"], _smtp["security"], sender_email)
+    smtp, sent_on_connection = _take_warm_connection(key)
+
+    try:
+        for i, recipient in enumerate(recipients):
+            if i and i % _smtp["batch_size"] == 0 and _smtp["batch_delay"]:
+                time.sleep(_smtp["batch_delay"])
+
+            for attempt in range(2):
+                try:
+                    if smtp is None or sent_on_connection >= _smtp["max_messages_per_connection"]:
+                        if smtp is not None:
+                            _close(smtp)
+                        smtp = _connect(sender_email, password)
+                        sent_on_connection = 0
+                    with metrics.span("smtp.send"):
+                        smtp.sendmail(sender_email, [recipient], _for_recipient(rendered, recipient))
+                    sent_on_connection += 1
+                    results[recipient] = None
+                    metrics.count("smtp.messages", result="sent")
+                    metrics.count("smtp.bytes_sent", len(rendered))
+                    break
+                except smtplib.SMTPRecipientsRefused as e:
+                    code, reason = e.recipients.get(recipient, (None, b""))
+                    results[recipient] = f"Recipient refused ({code}): {reason.decode(errors='replace')}"
+                    metrics.count("smtp.messages", result="refused")
+                    break
+                except smtplib.SMTPResponseException as e:
+                    if isinstance(e, smtplib.SMTPAuthenticationError):
+                        raise
+                    results[recipient] = f"Rejected ({e.smtp_code}): {e.smtp_error.decode(errors='replace')}"
+                    metrics.count("smtp.messages", result="rejected")
+                    break
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    # The server dropped the session: reconnect once and retry this recipient
+                    smtp = None
+                    results[recipient] = f"Connection failed: {e}"
+                    metrics.count("smtp.connection_errors")
+
+            if on_result:
+                on_result(recipient, results[recipient])
+            if smtp is None:
+                # Could not (re)connect: the server is unreachable for everyone else too
+                for rest in recipients[i + 1:]:
+                    results[rest] = results[recipient]
+                    if on_result:
+                        on_result(rest, results[rest])
+                break
+    finally:
+        if smtp is not None:
+            if _smtp["keep_alive_seconds"]:
+                with _warm_lock:
+                    _warm.update(smtp=smtp, key=key, sent=sent_on_connection,
+                                 last_used=time.monotonic())
+            else:
+                _close(smtp)
+
+    return results
 
-def send_email(html_content, subject="🚀 The Weekly Sync"):
+
+def send_email(html_content, subject="🚀 The Weekly Sync", recipients=None):
     """
     Sends an HTML email with the newsletter content.
-    Supports multiple recipients - separate emails with commas.
+    Supports multiple recipients - each gets their own copy.
     
     Args:
         html_content: The HTML body content (generated by LLM)
         subject: Email subject line
+        recipients: List of addresses (defaults to RECIPIENT_EMAIL, comma-separated)
         
     Returns:
-        True if sent successfully, False otherwise
+        Dictionary of recipient -> None if delivered, or an error message
+        (empty if there was nobody to send to)
     """
-    # Get credentials from environment
-    sender_email = os.environ.get("EMAIL_ADDRESS")
-    password = os.environ.get("EMAIL_APP_PASSWORD")
-    recipient_env = os.environ.get("RECIPIENT_EMAIL", "")
-    
-    # Support multiple recipients (comma-separated)
-    recipients = [email.strip() for email in recipient_env.split(",") if email.strip()]
+    if recipients is None:
+        recipients = recipients_from_env()
 
-    # Validate credentials
-    if not sender_email or not password:
-        print("    ❌ Error: Missing EMAIL_ADDRESS or EMAIL_APP_PASSWORD in .env file.")
-        print("    → See README.md for setup instructions.")
-        return False
+    # Get and validate credentials from environment
+    creds = credentials()
+    if creds is None:
+        return {recipient: "Missing credentials" for recipient in recipients}
+    sender_email, password = creds
     
     if not recipients:
         print("    ❌ Error: Missing RECIPIENT_EMAIL in .env file.")
-        return False
+        return {}
 
-    # Build the email
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = ", ".join(recipients)  # Multiple recipients supported
+    # Render once, send many
+    rendered = render_message(build_message(html_content, subject, sender_email))
+    return send_rendered(rendered, sender_email, password, recipients)
 
-    # Wrap AI content in a beautiful template
-    full_html = _build_email_template(html_content)
-    msg.add_alternative(full_html, subtype='html')
 
-    # Send via Gmail SMTP
+def send_rendered(rendered, sender_email, password, recipients):
+    """
+    Delivers an already rendered message, reporting progress and failures.
+
+    Args:
+        rendered: Message bytes from render_message()
+        sender_email: Envelope sender (also used to log in)
+        password: SMTP password
+        recipients: List of addresses
+
+    Returns:
+        Dictionary of recipient -> None if delivered, or an error message
+    """
     try:
         recipient_display = ", ".join(recipients) if len(recipients) <= 3 else f"{len(recipients)} recipients"
-        print(f"    📤 Sending to {recipient_display}...")
-        context = ssl.create_default_context()
-        
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context) as smtp:
-            smtp.login(sender_email, password)
-            smtp.send_message(msg)
-        
-        print("    ✅ Email sent successfully!")
-        return True
+        print(f"    📤 Sending to {recipient_display} via {_smtp['host']}:{_smtp['port']}...")
+        results = deliver(rendered, sender_email, password, recipients)
         
     except smtplib.SMTPAuthenticationError:
         print("    ❌ Authentication failed. Check your email/app password.")
         print("    → Make sure you're using an App Password, not your regular password.")
         print("    → See: https://support.google.com/accounts/answer/185833")
-        return False
-        
-    except smtplib.SMTPRecipientsRefused:
-        print(f"    ❌ Recipient refused: {receiver_email}")
-        return False
+        return {recipient: "Authentication failed" for recipient in recipients}
         
     except Exception as e:
         print(f"    🔥 Email failed: {e}")
-        return False
-
+        return {recipient: str(e) for recipient in recipients}
 
-def _build_email_template(content):
-    """
-    Wraps the AI-generated content in a beautiful FT-style email template.
-    """
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <style>
-        body {{ font-family: 'Georgia', serif; background-color: #f4f4f4; margin: 0; padding: 0; }}
-        .container {{ max-width: 600px; margin: 20px auto; background: #ffffff; padding: 0; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
-        .header {{ width: 100%; text-align: center; background-color: #1a1a1a; }}
-        .header img {{ max-width: 100%; height: auto; display: block; }}
-        .content {{ padding: 30px; color: #333333; line-height: 1.6; }}
-        .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #888; background-color: #f4f4f4; }}
-        
-        /* Typography */
-        h2 {{ color: #990000; border-bottom: 2px solid #ddd; padding-bottom: 10px; margin-top: 30px; font-size: 22px; }}
-        h3 {{ color: #1a1a1a; margin-bottom: 5px; font-size: 18px; margin-top: 25px; }}
-        a {{ color: #990000; text-decoration: none; font-weight: bold; }}
-        a:hover {{ text-decoration: underline; }}
-    </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <img src="{HEADER_IMG}" alt="The Weekly Sync">
-            </div>
-
-            <div class="content">
-                {content}
-            </div>
-
-            <div class="footer">
-                <img src="{FOOTER_IMG}" alt="Footer"><br><br>
-                Automated Briefing | Generated by Gemini 2.0
-            </div>
-        </div>
-    </body>
-    </html>
-    """
\ No newline at end of file
+    failed = {r: error for r, error in results.items() if error}
+    if not failed:
+        print(f"    ✅ Email sent successfully to {len(results)} recipient(s)!")
+    else:
+        print(f"    ⚠️  Delivered to {len(results) - len(failed)} of {len(results)} recipients.")
+        for recipient, error in list(failed.items())[:5]:
+            print(f"    ❌ {recipient}: {error}")
+        if len(failed) > 5:
+            print(f"    ... and {len(failed) - 5} more")
+    return results
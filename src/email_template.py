@@ -0,0 +1,351 @@
+"""
+Email Template
+==============
+Turns the LLM's HTML into the final email body.
+
+The template (config/email_template.html) is loaded and pre-processed
+once: its <style> rules are parsed and inlined into the template's own
+markup, and the result is minified. Each newsletter's content then only
+needs its own pass, which applies the same rules as inline styles (many
+mail clients drop <style> blocks) and minifies it.
+
+Only simple selectors are inlined: tags, .classes, #ids and descendant
+combinations of those. Rules that cannot be inlined (a:hover, @media)
+stay in a small <style> block for the clients that support it.
+"""
+
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from src.config_loader import PROJECT_ROOT
+
+TEMPLATE_PATH = PROJECT_ROOT / "config" / "email_template.html"
+
+CONTENT_PLACEHOLDER = "{{ content }}"
+
+VOID_TAGS = frozenset("area base br col embed hr img input link meta source track wbr".split())
+BLOCK_TAGS = (
+    "html|head|body|title|meta|style|div|p|h[1-6]|table|thead|tbody|tr|td|th|ul|ol|li|br|hr|"
+    "blockquote|section|header|footer"
+)
+_AROUND_BLOCK_TAGS_RE = re.compile(rf"\s*(</?(?:{BLOCK_TAGS})\b[^>]*>)\s*", re.IGNORECASE)
+_SIMPLE_SELECTOR_RE = re.compile(r"^(?:[a-z][a-z0-9]*)?(?:[.#][\w-]+)*$", re.IGNORECASE)
+_COMPOUND_RE = re.compile(r"([.#]?)([\w-]+)")
+
+# Loaded templates by path, with the file mtime they were built from
+_templates = {}
+
+
+def _parse_compound(text):
+    """'div.note#top' -> (tag or None, set of classes, id or None)."""
+    tag, classes, element_id = None, set(), None
+    for prefix, name in _COMPOUND_RE.findall(text):
+        if prefix == ".":
+            classes.add(name)
+        elif prefix == "#":
+            element_id = name
+        else:
+            tag = name.lower()
+    return tag, frozenset(classes), element_id
+
+
+def parse_css(css):
+    """
+    Split a stylesheet into inlinable rules and leftover CSS.
+
+    Returns:
+        Tuple of (rules, leftover CSS). Each rule is a tuple of
+        (specificity, source order, compounds, declarations dict).
+    """
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    rules, leftover = [], []
+    order = 0
+
+    # @media and friends are kept whole
+    for block in re.findall(r"@[^{]+\{(?:[^{}]*\{[^{}]*\})*[^{}]*\}", css):
+        leftover.append(re.sub(r"\s+", " ", block).strip())
+    css = re.sub(r"@[^{]+\{(?:[^{}]*\{[^{}]*\})*[^{}]*\}", "", css)
+
+    for selectors, body in re.findall(r"([^{}]+)\{([^{}]*)\}", css):
+        declarations = {}
+        for declaration in body.split(";"):
+            prop, _, value = declaration.partition(":")
+            if prop.strip() and value.strip():
+                declarations[prop.strip().lower()] = value.strip()
+        for selector in selectors.split(","):
+            selector = " ".join(selector.split())
+            parts = selector.split(" ")
+            if not selector or not all(_SIMPLE_SELECTOR_RE.match(p) for p in parts):
+                leftover.append(f"{selector}{{{_style_attr(declarations)}}}")
+                continue
+            compounds = [_parse_compound(p) for p in parts]
+            specificity = (
+                sum(1 for _, _, i in compounds if i),
+                sum(len(c) for _, c, _ in compounds),
+                sum(1 for t, _, _ in compounds if t),
+            )
+            rules.append((specificity, order, compounds, declarations))
+            order += 1
+    return rules, "".join(leftover)
+
+
+def _matches(compound, element):
+    tag, classes, element_id = compound
+    el_tag, el_classes, el_id = element
+    return ((tag is None or tag == el_tag)
+            and classes <= el_classes
+            and (element_id is None or element_id == el_id))
+
+
+def _selector_matches(compounds, element, ancestors):
+    if not _matches(compounds[-1], element):
+        return False
+    i = len(ancestors) - 1
+    for compound in reversed(compounds[:-1]):
+        while i >= 0 and not _matches(compound, ancestors[i]):
+            i -= 1
+        if i < 0:
+            return False
+        i -= 1
+    return True
+
+
+def _parse_style_attr(style):
+    declarations = {}
+    for declaration in (style or "").split(";"):
+        prop, _, value = declaration.partition(":")
+        if prop.strip() and value.strip():
+            declarations[prop.strip().lower()] = value.strip()
+    return declarations
+
+
+def _escape_attr(value):
+    return escape(value, quote=False).replace('"', "&quot;")
+
+
+def _style_attr(declarations):
+    return ";".join(f"{prop}:{value}" for prop, value in declarations.items())
+
+
+class _Inliner(HTMLParser):
+    """Re-emits HTML with matching CSS rules inlined, comments dropped and whitespace collapsed."""
+
+    def __init__(self, rules, ancestors=()):
+        super().__init__(convert_charrefs=False)
+        self.rules = rules
+        self.stack = list(ancestors)
+        self.out = []
+        self.content_ancestors = None
+        self._in_style = False
+        self._in_pre = 0
+
+    def _element(self, tag, attrs):
+        attrs = dict(attrs)
+        return tag, frozenset((attrs.get("class") or "").split()), attrs.get("id")
+
+    def _emit_tag(self, tag, attrs, close=""):
+        element = self._element(tag, attrs)
+        matched = sorted(
+            (r for r in self.rules if _selector_matches(r[2], element, self.stack)),
+            key=lambda r: (r[0], r[1]),
+        )
+        declarations = {}
+        for rule in matched:
+            declarations.update(rule[3])
+        attrs = [(name, value) for name, value in attrs]
+        inline = next((value for name, value in attrs if name == "style"), None)
+        declarations.update(_parse_style_attr(inline))
+
+        parts = [tag]
+        for name, value in attrs:
+            if name == "style":
+                continue
+            parts.append(name if value is None else f'{name}="{_escape_attr(value)}"')
+        if declarations:
+            parts.append(f'style="{_escape_attr(_style_attr(declarations))}"')
+        self.out.append(f"<{' '.join(parts)}{close}>")
+        return element
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "style":
+            self._in_style = True
+            return
+        element = self._emit_tag(tag, attrs)
+        if tag == "pre":
+            self._in_pre += 1
+        if tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self._emit_tag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "style" and self._in_style:
+            self._in_style = False
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag == "pre" and self._in_pre:
+            self._in_pre -= 1
+        # Pop up to the matching element (tolerates unclosed tags)
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                break
+        self.out.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if self._in_style:
+            return
+        if CONTENT_PLACEHOLDER in data and self.content_ancestors is None:
+            self.content_ancestors = list(self.stack)
+        self.out.append(data if self._in_pre else re.sub(r"\s+", " ", data))
+
+    def handle_entityref(self, name):
+        if not self._in_style:
+            self.out.append(f"&{name};")
+
+    def handle_charref(self, name):
+        if not self._in_style:
+            self.out.append(f"&#{name};")
+
+    def handle_comment(self, data):
+        pass
+
+    def handle_decl(self, decl):
+        self.out.append(f"<!{decl}>")
+
+    def result(self):
+        self.close()
+        return _AROUND_BLOCK_TAGS_RE.sub(r"\1", "".join(self.out)).strip()
+
+
+def inline_css(html, rules, ancestors=()):
+    """
+    Apply CSS rules as inline styles and minify.
+
+    Args:
+        html: HTML document or fragment
+        rules: Rules from parse_css()
+        ancestors: Elements the fragment will be nested in (for descendant selectors)
+
+    Returns:
+        The rewritten HTML
+    """
+    inliner = _Inliner(rules, ancestors)
+    inliner.feed(html)
+    return inliner.result()
+
+
+class EmailTemplate:
+    """A pre-processed email template; call render() per newsletter."""
+
+    def __init__(self, source, **variables):
+        for name, value in variables.items():
+            source = source.replace(f"{{{{ {name} }}}}", escape(value))
+
+        css = "".join(re.findall(r"<style[^>]*>(.*?)</style>", source, flags=re.DOTALL | re.IGNORECASE))
+        self.rules, leftover = parse_css(css)
+
+        inliner = _Inliner(self.rules)
+        inliner.feed(source)
+        skeleton = inliner.result()
+        if leftover:
+            skeleton = skeleton.replace("</head>", f"<style>{leftover}</style></head>", 1)
+        self.content_ancestors = inliner.content_ancestors or []
+        self.prefix, _, self.suffix = skeleton.partition(CONTENT_PLACEHOLDER)
+        self.prefix = self.prefix.rstrip()
+        self.suffix = self.suffix.lstrip()
+        self._raw_source = source
+
+    def render(self, content):
+        """Full email HTML for `content`, with styles inlined and minified."""
+        return self.prefix + inline_css(content, self.rules, self.content_ancestors) + self.suffix
+
+    def render_unprocessed(self, content):
+        """The template filled in as-is (no inlining or minifying), for size comparisons."""
+        return self._raw_source.replace(CONTENT_PLACEHOLDER, content)
+
+
+def get_template(path=TEMPLATE_PATH, **variables):
+    """
+    The template at `path`, loaded once and reloaded only if the file changes.
+    """
+    mtime = path.stat().st_mtime
+    key = (str(path), tuple(sorted(variables.items())))
+    cached = _templates.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = _templates[key] = (mtime, EmailTemplate(path.read_text(encoding="utf-8"), **variables))
+    return cached[1]
+
+
+class _TextConverter(HTMLParser):
+    """HTML -> readable plain text (headlines, paragraphs, 'text <link>')."""
+
+    BLOCKS = {"p", "div", "h1", "h2", "h3", "h4", "li", "tr", "br"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = [""]
+        self._skip = 0
+        self._href = None
+        self._link_text = ""
+        self._heading = None
+
+    def _newline(self):
+        if self.lines[-1].strip():
+            self.lines.append("")
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("style", "script", "head"):
+            self._skip += 1
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+            self._link_text = ""
+        elif tag in ("h1", "h2", "h3", "h4"):
+            self._newline()
+            self.lines.append("")
+            self._heading = tag
+        elif tag == "li":
+            self._newline()
+            self.lines[-1] = "- "
+        elif tag in self.BLOCKS:
+            self._newline()
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script", "head"):
+            self._skip = max(0, self._skip - 1)
+        elif tag == "a":
+            href, text = self._href, self._link_text.strip()
+            if href and not href.startswith("#") and href != text:
+                self.lines[-1] += f" <{href}>"
+            self._href = None
+        elif tag == self._heading:
+            title = self.lines[-1].strip()
+            if tag in ("h1", "h2"):
+                self.lines[-1] = title.upper()
+                self.lines.append("=" * len(title))
+            self.lines.append("")
+            self._heading = None
+        elif tag in self.BLOCKS:
+            self._newline()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        text = re.sub(r"\s+", " ", data)
+        if not self.lines[-1].strip():
+            text = text.lstrip()
+        self.lines[-1] += text
+        if self._href is not None:
+            self._link_text += text
+
+
+def html_to_text(html):
+    """Plain-text rendering of an HTML fragment, for the text/plain alternative."""
+    converter = _TextConverter()
+    converter.feed(html)
+    converter.close()
+    text = "\n".join(line.rstrip() for line in converter.lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip() + "\n"
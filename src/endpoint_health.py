@@ -0,0 +1,113 @@
+"""
+Endpoint Health Tracker
+=======================
+Remembers which Reddit endpoints have been working (persisted across
+runs) so the fetcher can go straight to the one most likely to succeed.
+
+Each endpoint also has a circuit breaker: after `failure_threshold`
+consecutive failures it is skipped until `cooldown_seconds` have passed,
+then a single probe request decides whether it is healthy again.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+# Weight of the latest outcome in the moving success rate
+EWMA_ALPHA = 0.3
+
+
+class EndpointHealth:
+    """Per-endpoint success statistics with a circuit breaker."""
+
+    def __init__(self, state_file=None, failure_threshold=3, cooldown_seconds=3600):
+        self.state_file = Path(state_file) if state_file else None
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._stats = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.state_file is None or not self.state_file.exists():
+            return
+        try:
+            self._stats = json.loads(self.state_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"    ⚠️  Ignoring unreadable endpoint health file: {e}")
+            self._stats = {}
+
+    def save(self):
+        """Persist statistics so the next run starts from what we learned."""
+        if self.state_file is None:
+            return
+        with self._lock:
+            data = json.dumps(self._stats, indent=2)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.state_file.write_text(data, encoding="utf-8")
+
+    def _entry(self, name):
+        return self._stats.setdefault(name, {
+            "success_rate": 0.5,
+            "successes": 0,
+            "failures": 0,
+            "consecutive_failures": 0,
+            "opened_at": None,
+        })
+
+    def order(self, names):
+        """
+        Return the endpoints worth trying, best first.
+
+        Endpoints with an open circuit are left out; once their cooldown
+        has expired one caller at a time is let through as a probe. If
+        every circuit is open, all endpoints are returned as a last resort.
+        """
+        now = time.time()
+        with self._lock:
+            available = []
+            for index, name in enumerate(names):
+                entry = self._entry(name)
+                if entry["opened_at"] is not None:
+                    if now - entry["opened_at"] < self.cooldown_seconds or name in self._probing:
+                        continue
+                    self._probing.add(name)  # Half-open: this caller is the probe
+                available.append((-entry["success_rate"], index, name))
+
+            if not available:
+                available = [(-self._entry(n)["success_rate"], i, n) for i, n in enumerate(names)]
+
+        return [name for _, _, name in sorted(available)]
+
+    def release(self, name):
+        """Give back a probe slot handed out by order() that went unused."""
+        with self._lock:
+            self._probing.discard(name)
+
+    def record_success(self, name):
+        with self._lock:
+            entry = self._entry(name)
+            entry["successes"] += 1
+            entry["consecutive_failures"] = 0
+            entry["opened_at"] = None
+            entry["success_rate"] = (1 - EWMA_ALPHA) * entry["success_rate"] + EWMA_ALPHA
+            self._probing.discard(name)
+
+    def record_failure(self, name):
+        with self._lock:
+            entry = self._entry(name)
+            entry["failures"] += 1
+            entry["consecutive_failures"] += 1
+            entry["success_rate"] = (1 - EWMA_ALPHA) * entry["success_rate"]
+            if name in self._probing or entry["consecutive_failures"] >= self.failure_threshold:
+                if entry["opened_at"] is None or name in self._probing:
+                    print(f"    🔌 Circuit opened for {name} endpoint")
+                entry["opened_at"] = time.time()
+            self._probing.discard(name)
+
+    def snapshot(self):
+        """Copy of the current statistics, keyed by endpoint name."""
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._stats.items()}
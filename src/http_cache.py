@@ -0,0 +1,114 @@
+"""
+HTTP Feed Cache
+===============
+Conditional-GET cache for Reddit feeds, keyed by URL.
+
+Fresh entries are served straight from disk. Stale entries are
+revalidated with If-None-Match / If-Modified-Since, so an unchanged
+feed costs a 304 instead of a full download.
+"""
+
+import json
+
+from src.config_loader import PROJECT_ROOT
+from src.disk_cache import DiskCache
+
+# How long a cached feed counts as fresh, by Reddit's `t=` time period
+DEFAULT_TTLS = {
+    "hour": 300,
+    "day": 3600,
+    "week": 6 * 3600,
+    "month": 24 * 3600,
+    "year": 24 * 3600,
+    "all": 24 * 3600,
+}
+
+_cache = None
+_ttls = dict(DEFAULT_TTLS)
+
+
+class CachedResponse:
+    """Minimal stand-in for a requests.Response served from the cache."""
+
+    def __init__(self, url, content, headers, status_code=200):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.status_code = status_code
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def configure(enabled=True, directory=".cache/http", max_size_mb=50, ttl_seconds=None):
+    """
+    Set up the feed cache.
+
+    Args:
+        enabled: Turn caching on or off
+        directory: Cache directory (relative paths are resolved from the project root)
+        max_size_mb: Size bound; least recently used feeds are evicted beyond it
+        ttl_seconds: Optional {time_period: seconds} overrides for freshness
+    """
+    global _cache, _ttls
+    _ttls = {**DEFAULT_TTLS, **(ttl_seconds or {})}
+    if not enabled:
+        _cache = None
+        return
+    path = PROJECT_ROOT / directory
+    _cache = DiskCache(path, max_bytes=int(max_size_mb * 1024 * 1024))
+
+
+def ttl_for(time_period):
+    """Freshness window in seconds for a feed covering `time_period`."""
+    return _ttls.get(time_period, DEFAULT_TTLS["week"])
+
+
+def cached_get(url, headers, ttl, fetch):
+    """
+    GET `url` through the cache.
+
+    Args:
+        url: URL to fetch (also the cache key)
+        headers: Request headers
+        ttl: Seconds a stored response stays fresh
+        fetch: Callable(url, headers) performing the real network request
+
+    Returns:
+        A response object; `from_cache` is True when no body was downloaded
+    """
+    if _cache is None:
+        return fetch(url, headers)
+
+    entry = _cache.get(url)
+    if entry is not None and DiskCache.is_fresh(entry, ttl):
+        return CachedResponse(url, entry["body"], entry["meta"].get("headers", {}))
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        validators = entry["meta"].get("headers", {})
+        if validators.get("ETag"):
+            request_headers["If-None-Match"] = validators["ETag"]
+        if validators.get("Last-Modified"):
+            request_headers["If-Modified-Since"] = validators["Last-Modified"]
+
+    response = fetch(url, request_headers)
+
+    if response.status_code == 304 and entry is not None:
+        _cache.touch(url)
+        return CachedResponse(url, entry["body"], entry["meta"].get("headers", {}))
+
+    if response.status_code == 200:
+        kept = {
+            name: response.headers[name]
+            for name in ("ETag", "Last-Modified", "Content-Type")
+            if response.headers.get(name)
+        }
+        _cache.set(url, response.content, {"headers": kept})
+
+    return response
@@ -0,0 +1,194 @@
+"""
+HTTP Session Pool
+=================
+One shared, keep-alive HTTP client for every fetcher code path.
+Reusing connections saves a TCP+TLS handshake per request to the
+handful of Reddit hosts we talk to.
+
+Uses HTTP/2 through `httpx` when it is installed (pip install httpx[http2])
+and enabled in settings.yaml, otherwise a pooled `requests.Session`.
+"""
+
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Exceptions that mean "the request timed out", whichever client is active
+if HTTP2_AVAILABLE:
+    TIMEOUT_ERRORS = (requests.exceptions.Timeout, httpx.TimeoutException)
+else:
+    TIMEOUT_ERRORS = (requests.exceptions.Timeout,)
+
+_settings = {
+    "pool_size": 10,
+    "connect_timeout": 5.0,
+    "read_timeout": 15.0,
+    "http2": False,
+}
+_client = None
+_lock = threading.Lock()
+_stats = {"requests": 0, "connections": 0, "streams": weakref.WeakSet()}
+
+
+def _count_connection():
+    with _lock:
+        _stats["connections"] += 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count_connection()
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count_connection()
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count every new TCP connection they open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def configure(pool_size=10, connect_timeout=5.0, read_timeout=15.0, http2=False):
+    """
+    Configure the shared HTTP client and reset the connection statistics.
+    If the settings changed, the current client is closed so the next
+    request picks them up; otherwise its warm connections are kept.
+
+    Args:
+        pool_size: Keep-alive connections kept per host
+        connect_timeout: Seconds to wait for a connection to be established
+        read_timeout: Seconds to wait for the server to send data
+        http2: Use HTTP/2 (requires httpx[http2])
+    """
+    global _client
+    settings = {
+        "pool_size": pool_size,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout,
+        "http2": http2,
+    }
+    with _lock:
+        if _client is not None and settings != _settings:
+            _client.close()
+            _client = None
+        _settings.update(settings)
+        _stats.update(requests=0, connections=0, streams=weakref.WeakSet())
+
+
+def _build_client():
+    if _settings["http2"] and HTTP2_AVAILABLE:
+        return httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=_settings["pool_size"] * 4,
+                max_keepalive_connections=_settings["pool_size"],
+            ),
+            timeout=httpx.Timeout(
+                _settings["read_timeout"], connect=_settings["connect_timeout"]
+            ),
+        )
+    if _settings["http2"]:
+        print("    ⚠️  HTTP/2 requested but httpx[http2] is not installed. Using HTTP/1.1.")
+
+    session = requests.Session()
+    adapter = _PooledAdapter(
+        pool_connections=_settings["pool_size"],
+        pool_maxsize=_settings["pool_size"],
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_client():
+    """Return the shared client, creating it on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = _build_client()
+        return _client
+
+
+def get(url, headers=None):
+    """
+    GET `url` through the shared connection pool.
+
+    Returns a response object with `status_code`, `headers`, `text`,
+    `content`, `url` and `json()` (requests or httpx, depending on backend).
+    """
+    client = get_client()
+    if isinstance(client, requests.Session):
+        response = client.get(
+            url,
+            headers=headers,
+            timeout=(_settings["connect_timeout"], _settings["read_timeout"]),
+        )
+    else:
+        response = client.get(url, headers=headers)
+
+    with _lock:
+        _stats["requests"] += 1
+        stream = response.extensions.get("network_stream") if hasattr(response, "extensions") else None
+        if stream is not None and stream not in _stats["streams"]:
+            _stats["streams"].add(stream)
+            _stats["connections"] += 1
+    return response
+
+
+def connection_stats():
+    """
+    Report how well connections are being reused.
+
+    Returns:
+        Dictionary with 'requests', 'connections' (new connections opened)
+        and 'reuse_ratio' (share of requests served on an existing connection)
+    """
+    with _lock:
+        requests_made = _stats["requests"]
+        connections = _stats["connections"]
+
+    reused = max(requests_made - connections, 0)
+    return {
+        "requests": requests_made,
+        "connections": connections,
+        "reuse_ratio": reused / requests_made if requests_made else 0.0,
+    }
+
+
+def close():
+    """Close the shared client and its pooled connections."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -1,48 +1,386 @@
 """
 LLM Newsletter Analyzer
 =======================
-Uses Google's Gemini API to curate and format the newsletter content.
+Uses an LLM (Google's Gemini API by default, or any OpenAI-compatible
+server; see src/llm_backends.py) to curate and format the newsletter content.
 """
 
-import os
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from src.config_loader import PROJECT_ROOT
+from src import metrics
+from src.disk_cache import DiskCache
+from src.llm_backends import LLMConfigError, LLMQuotaError, ResilientLLM, create_backend
+from src.ranker import REPUTABLE_SOURCES
+
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+
+MODEL_NAME = "gemini-2.0-flash-exp"
+
+# Backend with retry/fallback policy; set up by configure_backend()
+_llm = None
+_backend_key = None
+
+# On-disk cache of generated newsletters; set up by configure_cache()
+_response_cache = None
+_cache_ttl = 24 * 3600
+
+# Map-reduce curation settings; set up by configure_map_reduce()
+_map_reduce = {
+    "enabled": "auto",
+    "auto_threshold_tokens": 60000,
+    "batch_tokens": 8000,
+    "max_concurrency": 4,
+    "max_total_tokens": 200000,
+    "shortlist_per_batch": 5,
+}
+
+# Rough characters-per-token ratio for English prose (good enough for budgeting)
+CHARS_PER_TOKEN = 4
+
+# Token ceiling for a single curation prompt; set up by configure_prompt()
+_prompt_token_budget = 30000
+
+# Snippets that would be cut shorter than this are dropped instead
+MIN_SNIPPET_TOKENS = 32
+
+
+def configure_cache(enabled=True, directory=".cache/llm", ttl_seconds=86400, max_size_mb=20):
+    """
+    Set up the LLM response cache.
+
+    Args:
+        enabled: Turn caching on or off
+        directory: Cache directory (relative paths are resolved from the project root)
+        ttl_seconds: How long a cached newsletter can be reused
+        max_size_mb: Size bound; least recently used responses are evicted beyond it
+    """
+    global _response_cache, _cache_ttl
+    _cache_ttl = ttl_seconds
+    _response_cache = DiskCache(PROJECT_ROOT / directory, int(max_size_mb * 1024 * 1024)) if enabled else None
+
+
+def configure_backend(provider="gemini", model=MODEL_NAME, fallback_model=None, base_url=None,
+                      api_key_env=None, timeout=120, max_retries=3, base_delay=2.0, max_delay=60.0):
+    """
+    Choose the LLM backend and its retry policy.
+
+    Args:
+        provider: "gemini" or "openai" (any OpenAI-compatible server)
+        model: Primary model name
+        fallback_model: Model used once the primary one keeps failing (None to disable)
+        base_url: Server URL for the openai provider (e.g. the local stub server)
+        api_key_env: Environment variable holding the API key
+        timeout: Request timeout in seconds (openai provider)
+        max_retries: Retries per model on quota or transient errors
+        base_delay: First backoff delay in seconds (doubled on every retry, with jitter)
+        max_delay: Backoff ceiling in seconds
+    """
+    global _llm, _backend_key
+    # Keep the existing client (and its connections) if nothing about it changed
+    key = (provider, base_url, api_key_env, timeout)
+    if _llm is not None and key == _backend_key:
+        backend = _llm.backend
+    else:
+        backend = create_backend(provider, base_url=base_url, api_key_env=api_key_env, timeout=timeout)
+        _backend_key = key
+    _llm = ResilientLLM(backend, model, fallback_model=fallback_model, max_retries=max_retries,
+                        base_delay=base_delay, max_delay=max_delay)
+
+
+def _get_llm():
+    if _llm is None:
+        configure_backend()
+    return _llm
+
+
+def configure_prompt(token_budget=30000):
+    """
+    Set the token budget for a single curation prompt.
+
+    Args:
+        token_budget: Approximate prompt token ceiling (0 or None for no limit);
+            low-ranked text snippets are trimmed to fit. Prompts too large
+            to trim sensibly go to map-reduce (see configure_map_reduce).
+    """
+    global _prompt_token_budget
+    _prompt_token_budget = token_budget or None
 
 
-def generate_newsletter(posts):
+def configure_map_reduce(enabled="auto", batch_tokens=8000, max_concurrency=4,
+                         max_total_tokens=200000, shortlist_per_batch=5, auto_threshold_tokens=60000):
     """
-    Sends posts to Gemini for curation and returns HTML newsletter content.
+    Set up map-reduce curation for large candidate sets.
+
+    Args:
+        enabled: True, False, or "auto" (only when the untrimmed prompt exceeds
+            `auto_threshold_tokens`; smaller overruns of the prompt token
+            budget are trimmed instead)
+        batch_tokens: Prompt tokens per map batch
+        max_concurrency: Map calls running at the same time
+        max_total_tokens: Ceiling on tokens sent in the map step; the
+            lowest-ranked posts beyond it are dropped
+        shortlist_per_batch: Posts each map call keeps for the reduce step
+        auto_threshold_tokens: Untrimmed prompt size that switches "auto"
+            mode to map-reduce (None to use the prompt token budget)
+    """
+    _map_reduce.update(
+        enabled=enabled,
+        auto_threshold_tokens=auto_threshold_tokens,
+        batch_tokens=batch_tokens,
+        max_concurrency=max_concurrency,
+        max_total_tokens=max_total_tokens,
+        shortlist_per_batch=shortlist_per_batch,
+    )
+
+
+def estimate_tokens(text):
+    """Approximate number of prompt tokens in `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_prompt_tokens(posts):
+    """Approximate prompt tokens needed to send `posts` to the model."""
+    return estimate_tokens(_format_posts_for_ai(posts))
+
+
+def generate_newsletter(posts, use_cache=True, on_chunk=None, instructions=None):
+    """
+    Sends posts to the configured LLM for curation and returns HTML newsletter content.
+    
+    Quota and transient errors are retried with backoff, then the fallback
+    model is tried (see configure_backend()). Identical requests (same
+    posts, instructions and model) are answered from the on-disk response
+    cache without contacting the LLM. Candidate
+    sets too large for one prompt are curated with map-reduce (see
+    configure_map_reduce()).
     
     Args:
         posts: List of post dictionaries from reddit_fetcher
+        use_cache: Set to False to bypass the response cache
+        on_chunk: Optional callable receiving the HTML piece by piece as the
+            model streams it (markdown fences already removed)
+        instructions: Optional editorial brief for this newsletter, added to
+            the system instruction
         
     Returns:
-        Dictionary with 'newsletter' key containing HTML, or None on failure
+        Dictionary with 'newsletter' key containing HTML and 'timing' with
+        'time_to_first_token' and 'total' seconds, or None on failure
     """
-    # Validate API key early
-    if not GEMINI_API_KEY:
-        print("❌ Error: GEMINI_API_KEY not found in environment variables.")
-        print("   Please add it to your .env file or set it as an environment variable.")
-        return None
+    # Format posts for the AI, within the prompt token budget
+    system_instruction = _build_system_instruction(instructions)
+    use_map_reduce = _should_map_reduce(estimate_prompt_tokens(posts))
+    formatted_content, prompt_stats = build_prompt(posts, _prompt_token_budget)
     
-    # Import Google AI library (done here to avoid import errors if not installed)
+    llm = _get_llm()
+    # The same model name on another server (e.g. the local stub) is a different model
+    cache_key = _cache_key(
+        formatted_content, system_instruction,
+        llm.model + (":map-reduce" if use_map_reduce else ""),
+        backend=f"{llm.backend.name}:{getattr(llm.backend, 'base_url', '')}"
+    )
+    if use_cache and _response_cache is not None:
+        entry = _response_cache.get(cache_key)
+        if entry is not None and DiskCache.is_fresh(entry, _cache_ttl):
+            metrics.count("llm.cache", result="hit")
+            print("    ♻️  Using cached LLM response (identical input).")
+            html_content = entry["body"].decode("utf-8")
+            if on_chunk:
+                on_chunk(html_content)
+            return {
+                'newsletter': html_content,
+                'cached': True,
+                'timing': {'time_to_first_token': 0.0, 'total': 0.0}
+            }
+
     try:
-        from google.genai import Client, types
-    except ImportError:
-        print("❌ Error: google-genai package not installed.")
-        print("   Run: pip install google-genai")
+        if use_map_reduce:
+            shortlist = _map_shortlist(posts, llm.generate)
+            formatted_content, prompt_stats = build_prompt(shortlist, _prompt_token_budget)
+            print(f"    🧩 Writing the digest from {len(shortlist)} shortlisted posts...")
+        
+        _print_prompt_stats(prompt_stats)
+        metrics.count("llm.cache", result="miss")
+        metrics.count("llm.prompt_tokens", prompt_stats["tokens"])
+        
+        started = time.perf_counter()
+        first_token_at = None
+        
+        if on_chunk:
+            # Stream the final call, cleaning up markdown fences as text arrives
+            stripper = _FenceStripper()
+            parts = []
+            for text in llm.generate_stream(system_instruction, formatted_content):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                piece = stripper.feed(text)
+                if piece:
+                    parts.append(piece)
+                    on_chunk(piece)
+            tail = stripper.flush()
+            if tail:
+                parts.append(tail)
+                on_chunk(tail)
+            html_content = "".join(parts).strip()
+        else:
+            html_content = llm.generate(system_instruction, formatted_content)
+            # Clean up any markdown artifacts
+            html_content = html_content.replace("```html", "").replace("```", "").strip()
+        
+        finished = time.perf_counter()
+        timing = {
+            'time_to_first_token': (first_token_at or finished) - started,
+            'total': finished - started
+        }
+        metrics.record("llm.first_token", timing['time_to_first_token'], started)
+        metrics.count("llm.output_chars", len(html_content))
+        
+        if _response_cache is not None:
+            _response_cache.set(cache_key, html_content.encode("utf-8"), {"model": llm.model})
+        
+        print(f"    ✅ Newsletter generated successfully! "
+              f"(first token {timing['time_to_first_token']:.1f}s, total {timing['total']:.1f}s)")
+        return {'newsletter': html_content, 'cached': False, 'timing': timing, 'prompt': prompt_stats}
+
+    except LLMConfigError as e:
+        print(f"❌ Error: {e}")
         return None
-    
-    # Format posts for the AI
-    formatted_content = _format_posts_for_ai(posts)
-    
-    # System instruction - defines the AI's personality and output format
-    system_instruction = """
+    except LLMQuotaError:
+        print("❌ API quota exceeded after retries. Please check your LLM billing/limits.")
+        return None
+    except Exception as e:
+        print(f"❌ Error generating newsletter: {e}")
+        return None
+
+
+class _FenceStripper:
+    """
+    Removes ```html / ``` markdown fences from streamed text. A chunk that
+    ends in what could be the start of a fence is held back until the next
+    chunk shows whether it really is one.
+    """
+
+    FENCE = "```html"
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, chunk):
+        buffer = (self._buffer + chunk).replace(self.FENCE, "")
+        hold = 0
+        for n in range(min(len(self.FENCE) - 1, len(buffer)), 0, -1):
+            if self.FENCE.startswith(buffer[-n:]):
+                hold = n
+                break
+        ready = buffer[:len(buffer) - hold]
+        self._buffer = buffer[len(buffer) - hold:]
+        return ready.replace("```", "")
+
+    def flush(self):
+        rest = self._buffer.replace(self.FENCE, "").replace("```", "")
+        self._buffer = ""
+        return rest
+
+
+def _print_prompt_stats(stats):
+    budget = f" of {stats['budget']:,} budget" if stats["budget"] else ""
+    cuts = ""
+    if stats["snippets_trimmed"] or stats["snippets_dropped"]:
+        cuts = f", {stats['snippets_trimmed']} snippets trimmed, {stats['snippets_dropped']} dropped"
+    if stats.get("comments_dropped"):
+        cuts += f", comments dropped for {stats['comments_dropped']} posts"
+    print(f"    📝 Prompt: ~{stats['tokens']:,} tokens{budget}{cuts}")
+
+
+def _should_map_reduce(prompt_tokens):
+    mode = _map_reduce["enabled"]
+    if mode == "auto":
+        threshold = _map_reduce["auto_threshold_tokens"] or _prompt_token_budget or _map_reduce["batch_tokens"]
+        return prompt_tokens > threshold
+    return bool(mode)
+
+
+def _split_batches(posts):
+    """
+    Pack posts (in ranked order) into batches of at most `batch_tokens`.
+    Posts beyond the `max_total_tokens` ceiling are dropped.
+    """
+    batches, current, current_tokens, total = [], [], 0, 0
+    for post in posts:
+        tokens = estimate_tokens(_format_post(1, post))
+        if total + tokens > _map_reduce["max_total_tokens"]:
+            break
+        if current and current_tokens + tokens > _map_reduce["batch_tokens"]:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(post)
+        current_tokens += tokens
+        total += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _map_shortlist(posts, generate):
+    """
+    Map step: shortlist each batch with concurrent LLM calls.
+
+    Args:
+        posts: Candidate posts, best first
+        generate: Callable(system_instruction, content) -> response text
+
+    Returns:
+        The shortlisted posts from every batch, in batch order
+    """
+    batches = _split_batches(posts)
+    metrics.count("llm.map_batches", len(batches))
+    keep = _map_reduce["shortlist_per_batch"]
+    instruction = _build_shortlist_instruction(keep)
+    print(f"    🧩 Map-reduce: {len(batches)} batches, up to "
+          f"{_map_reduce['max_concurrency']} at a time...")
+
+    def shortlist(batch):
+        try:
+            reply = generate(instruction, _format_posts_for_ai(batch))
+            picks = []
+            for number in re.findall(r"\d+", reply):
+                index = int(number) - 1
+                if 0 <= index < len(batch) and index not in picks:
+                    picks.append(index)
+            if picks:
+                return [batch[i] for i in picks[:keep]]
+        except Exception as e:
+            print(f"    ⚠️  Shortlist batch failed ({e}); keeping its top-ranked posts.")
+        return batch[:keep]
+
+    workers = max(1, min(_map_reduce["max_concurrency"], len(batches)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-map") as pool:
+        results = list(pool.map(shortlist, batches))
+    return [post for batch in results for post in batch]
+
+
+def _build_shortlist_instruction(keep):
+    """System instruction for the map step."""
+    return f"""
+    You are the shortlisting editor for a "Best of the Week" tech digest.
+    From the numbered items below, pick the {keep} most newsworthy, novel or insightful ones.
+    Prefer links to highly reputable news sources and genuinely new ideas on AI.
+    Reply ONLY with the chosen ITEM numbers, best first, as a JSON list (e.g. [3, 1, 7]).
+    """
+
+
+def _build_system_instruction(instructions=None):
+    """System instruction - defines the AI's personality and output format."""
+    reputable_names = ", ".join(REPUTABLE_SOURCES.values())
+    brief = f"\n    EDITORIAL BRIEF FOR THIS ISSUE:\n    {instructions.strip()}\n" if instructions else ""
+    return f"""
     You are Robert Armstrong from the Financial Times. You are writing a "Best of the Week" tech digest. 
-    If a post has a link to a highly reputable news source (NYT, FT, Guardian, WSJ, TheVerge...) prioritize those.
+    If a post has a link to a highly reputable news source ({reputable_names}...) prioritize those.
     If a post has novel ideas on AI or similar, prioritize those.
     
     TONE: Sophisticated, analytical, slightly cynical, and deeply knowledgeable.
@@ -67,48 +405,122 @@ def generate_newsletter(posts):
     GUIDELINES:
     - Filter ruthlessly: Pick top 5-7 stories only.
     - If the "SOURCE URL" is the same as the "REDDIT THREAD" (a text-only post), DO NOT include the [Read Article] link. Just show [Discuss on Reddit].
-    """
+    - An item marked "ALSO DISCUSSED IN" was posted in several subreddits: treat it as one story and use its main REDDIT THREAD link.
+    - "TOP COMMENTS" show how Reddit received a story: use them for the community's reaction, never as facts.
+    {brief}"""
 
-    try:
-        print("    🧠 Connecting to Gemini...")
-        client = Client(api_key=GEMINI_API_KEY)
-        
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp", 
-            contents=[formatted_content],
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction
-            )
-        )
-        
-        # Clean up any markdown artifacts
-        html_content = response.text
-        html_content = html_content.replace("```html", "").replace("```", "").strip()
-        
-        print("    ✅ Newsletter generated successfully!")
-        return {'newsletter': html_content}
 
-    except Exception as e:
-        error_msg = str(e)
-        if "API_KEY" in error_msg.upper() or "401" in error_msg:
-            print("❌ Invalid API key. Please check your GEMINI_API_KEY.")
-        elif "429" in error_msg or "quota" in error_msg.lower():
-            print("❌ API quota exceeded. Please check your Gemini billing.")
-        else:
-            print(f"❌ Error generating newsletter: {e}")
-        return None
+def _cache_key(formatted_content, system_instruction, model, backend=""):
+    """Content hash identifying one generation request (`backend` names the server it goes to)."""
+    digest = hashlib.sha256()
+    for part in (backend, model, system_instruction, formatted_content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def build_prompt(posts, token_budget=None):
+    """
+    Builds the curation prompt, fitting it into `token_budget`.
+    
+    Titles and links of every post are always kept. Text snippets are
+    added in ranked order (posts are expected best first) until the
+    budget runs out: the snippet that crosses the line is trimmed, and
+    the lowest-ranked posts lose theirs entirely. Top comments (see
+    src/comments.py) come out of the same budget, but are never trimmed:
+    a post's comment digest is either included whole or dropped.
+    
+    Args:
+        posts: List of post dictionaries, best first
+        token_budget: Approximate token ceiling (None for no limit)
+    
+    Returns:
+        Tuple of (prompt text, stats dict with 'tokens', 'budget',
+        'snippets_trimmed', 'snippets_dropped' and 'comments_dropped')
+    """
+    headers = [_format_post_header(i, post) for i, post in enumerate(posts, 1)]
+    separator = "-" * 30 + "\n"
+    
+    remaining = None
+    if token_budget:
+        fixed = sum(estimate_tokens(header) for header in headers)
+        remaining = token_budget - fixed - len(posts) * estimate_tokens(separator)
+    
+    parts = []
+    trimmed = dropped = comments_dropped = 0
+    for header, post in zip(headers, posts):
+        parts.append(header)
+        snippet = post.get('text')
+        if snippet:
+            line = f"TEXT SNIPPET: {snippet}\n"
+            cost = estimate_tokens(line)
+            if remaining is None or cost <= remaining:
+                parts.append(line)
+                if remaining is not None:
+                    remaining -= cost
+            elif remaining >= MIN_SNIPPET_TOKENS:
+                keep_chars = (remaining - 1) * CHARS_PER_TOKEN - len("TEXT SNIPPET: …\n")
+                parts.append(f"TEXT SNIPPET: {snippet[:keep_chars].rstrip()}…\n")
+                remaining = 0
+                trimmed += 1
+            else:
+                dropped += 1
+        comments = _format_comments(post)
+        if comments:
+            cost = estimate_tokens(comments)
+            if remaining is None or cost <= remaining:
+                parts.append(comments)
+                if remaining is not None:
+                    remaining -= cost
+            else:
+                comments_dropped += 1
+        parts.append(separator)
+    
+    prompt = "".join(parts)
+    stats = {
+        "tokens": estimate_tokens(prompt),
+        "budget": token_budget,
+        "snippets_trimmed": trimmed,
+        "snippets_dropped": dropped,
+        "comments_dropped": comments_dropped,
+    }
+    return prompt, stats
 
 
 def _format_posts_for_ai(posts):
     """
-    Formats posts into a structured string for the AI to process.
-    """
-    formatted = ""
-    for i, post in enumerate(posts, 1):
-        formatted += f"ITEM #{i}: {post['title']}\n"
-        formatted += f"SOURCE URL (Article/Link): {post['url']}\n"
-        formatted += f"REDDIT THREAD (Comments): {post['reddit_link']}\n"
-        if post.get('text'):
-            formatted += f"TEXT SNIPPET: {post['text']}\n"
-        formatted += "-" * 30 + "\n"
-    return formatted
\ No newline at end of file
+    Formats posts into a structured string for the AI to process (no budget).
+    """
+    return "".join(_format_post(i, post) for i, post in enumerate(posts, 1))
+
+
+def _format_post(i, post):
+    """Formats a single post as ITEM #i."""
+    formatted = _format_post_header(i, post)
+    if post.get('text'):
+        formatted += f"TEXT SNIPPET: {post['text']}\n"
+    formatted += _format_comments(post)
+    return formatted + "-" * 30 + "\n"
+
+
+def _format_comments(post):
+    """Condensed top comments of the post's thread (empty if it has none)."""
+    comments = post.get('comments')
+    if not comments:
+        return ""
+    lines = "".join(f"  - ({c['score']} points) {c['body']}\n" for c in comments)
+    return f"TOP COMMENTS:\n{lines}"
+
+
+def _format_post_header(i, post):
+    """Title and link lines for one post (never trimmed)."""
+    lines = [
+        f"ITEM #{i}: {post['title']}\n",
+        f"SOURCE URL (Article/Link): {post['url']}\n",
+        f"REDDIT THREAD (Comments): {post['reddit_link']}\n",
+    ]
+    other_threads = post.get('discussions', [])[1:]
+    if other_threads:
+        also = ", ".join(f"r/{d['subreddit']} {d['reddit_link']}" for d in other_threads)
+        lines.append(f"ALSO DISCUSSED IN: {also}\n")
+    return "".join(lines)
@@ -0,0 +1,318 @@
+"""
+LLM Backends
+============
+A small interface over the text-generation APIs the newsletter can use:
+
+- GeminiBackend: Google's Gemini API (google-genai)
+- OpenAICompatibleBackend: any server speaking the OpenAI chat-completions
+  protocol (a local model server, a proxy, or src/llm_stub_server.py)
+
+ResilientLLM wraps a backend with retries on quota/transient errors
+(jittered exponential backoff that honours Retry-After) and falls back to
+a secondary model when the primary one stays unavailable.
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+import random
+import re
+import threading
+import time
+
+import requests
+
+from src import metrics
+
+
+class LLMError(Exception):
+    """A generation request failed. `retryable` errors may succeed if tried again."""
+
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMQuotaError(LLMError):
+    """Rate limit or quota exceeded (HTTP 429 / RESOURCE_EXHAUSTED)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, retryable=True, retry_after=retry_after)
+
+
+class LLMConfigError(LLMError):
+    """Missing API key, missing package or rejected credentials. Never retried."""
+
+
+class LLMBackend(ABC):
+    """Interface every backend implements."""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, system_instruction, content, model):
+        """Return the full response text."""
+
+    def generate_stream(self, system_instruction, content, model):
+        """Yield the response text piece by piece."""
+        yield self.generate(system_instruction, content, model)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-genai SDK (imported on first use)."""
+
+    name = "gemini"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._client = None
+        self._types = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                if not self.api_key:
+                    raise LLMConfigError(
+                        "GEMINI_API_KEY not found in environment variables. "
+                        "Please add it to your .env file or set it as an environment variable."
+                    )
+                # Import Google AI library (done here to avoid import errors if not installed)
+                try:
+                    from google.genai import Client, types
+                except ImportError:
+                    raise LLMConfigError("google-genai package not installed. Run: pip install google-genai")
+                print("    🧠 Connecting to Gemini...")
+                self._client = Client(api_key=self.api_key)
+                self._types = types
+            return self._client, self._types
+
+    def _config(self, types, system_instruction):
+        return types.GenerateContentConfig(system_instruction=system_instruction)
+
+    def generate(self, system_instruction, content, model):
+        client, types = self._get_client()
+        try:
+            response = client.models.generate_content(
+                model=model,
+                contents=[content],
+                config=self._config(types, system_instruction),
+            )
+        except Exception as e:
+            raise _classify_gemini_error(e) from e
+        return response.text or ""
+
+    def generate_stream(self, system_instruction, content, model):
+        client, types = self._get_client()
+        try:
+            stream = client.models.generate_content_stream(
+                model=model,
+                contents=[content],
+                config=self._config(types, system_instruction),
+            )
+            for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise _classify_gemini_error(e) from e
+
+
+def _classify_gemini_error(error):
+    """Map an SDK exception onto our error types."""
+    message = str(error)
+    if "429" in message or "quota" in message.lower() or "RESOURCE_EXHAUSTED" in message:
+        delay = re.search(r"retry(?:Delay| in)['\"]?[:\s]*['\"]?(\d+(?:\.\d+)?)s", message)
+        return LLMQuotaError(message, retry_after=float(delay.group(1)) if delay else None)
+    if "API_KEY" in message.upper() or "401" in message or "403" in message:
+        return LLMConfigError(f"Invalid API key: {message}")
+    if any(code in message for code in ("500", "502", "503", "504", "UNAVAILABLE", "DEADLINE")):
+        return LLMError(message, retryable=True)
+    return LLMError(message)
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Any HTTP server implementing POST {base_url}/chat/completions."""
+
+    name = "openai"
+
+    def __init__(self, base_url="http://127.0.0.1:8808/v1", api_key=None, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _post(self, system_instruction, content, model, stream):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = {
+            "model": model,
+            "stream": stream,
+            "messages": [
+                {"role": "system", "content": system_instruction},
+                {"role": "user", "content": content},
+            ],
+        }
+        try:
+            response = self._session.post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=payload,
+                timeout=self.timeout,
+                stream=stream,
+            )
+        except requests.exceptions.RequestException as e:
+            raise LLMError(f"Connection to {self.base_url} failed: {e}", retryable=True) from e
+
+        if response.status_code == 429:
+            raise LLMQuotaError("Rate limited (429)", retry_after=_retry_after_seconds(response))
+        if response.status_code in (401, 403):
+            raise LLMConfigError(f"Rejected credentials ({response.status_code})")
+        if response.status_code >= 500:
+            raise LLMError(f"Server error ({response.status_code})", retryable=True,
+                           retry_after=_retry_after_seconds(response))
+        if response.status_code != 200:
+            raise LLMError(f"Request failed ({response.status_code}): {response.text[:200]}")
+        return response
+
+    def generate(self, system_instruction, content, model):
+        response = self._post(system_instruction, content, model, stream=False)
+        try:
+            return response.json()["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError(f"Malformed response: {e}") from e
+
+    def generate_stream(self, system_instruction, content, model):
+        response = self._post(system_instruction, content, model, stream=True)
+        with response:
+            # Read to the end of the body (past [DONE]) so the connection can be reused
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    continue
+                try:
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if delta.get("content"):
+                    yield delta["content"]
+
+
+def _retry_after_seconds(response):
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ResilientLLM:
+    """
+    Retry and fallback policy around a backend.
+
+    Retryable errors are retried up to `max_retries` times with jittered
+    exponential backoff (at least Retry-After, when the server sends one).
+    If the primary model is still failing, the fallback model gets the
+    same treatment.
+    """
+
+    def __init__(self, backend, model, fallback_model=None, max_retries=3,
+                 base_delay=2.0, max_delay=60.0):
+        self.backend = backend
+        self.model = model
+        self.fallback_model = fallback_model
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _models(self):
+        return [self.model] + ([self.fallback_model] if self.fallback_model else [])
+
+    def _backoff(self, attempt, error):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if error.retry_after:
+            delay = max(delay, error.retry_after)
+        return delay
+
+    def generate(self, system_instruction, content):
+        """Full response text, retrying and falling back as needed."""
+        last_error = None
+        for model in self._models():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with metrics.span("llm.call", model=model):
+                        return self.backend.generate(system_instruction, content, model)
+                except LLMError as e:
+                    last_error = e
+                    metrics.count("llm.errors", model=model, error=type(e).__name__)
+                    if not e.retryable:
+                        raise
+                    if attempt < self.max_retries:
+                        self._wait(model, attempt, e)
+            if model != self._models()[-1]:
+                metrics.count("llm.fallbacks", model=model)
+                print(f"    🔁 {model} unavailable, falling back to {self.fallback_model}...")
+        raise last_error
+
+    def generate_stream(self, system_instruction, content):
+        """
+        Yield response text as it arrives. Failures before the first piece
+        are retried (and fall back) like generate(); a failure mid-stream
+        is raised, since the caller has already consumed part of the text.
+        """
+        last_error = None
+        for model in self._models():
+            for attempt in range(self.max_retries + 1):
+                started = False
+                call_started = time.perf_counter()
+                try:
+                    for piece in self.backend.generate_stream(system_instruction, content, model):
+                        started = True
+                        yield piece
+                    metrics.record("llm.call", time.perf_counter() - call_started, call_started, model=model)
+                    return
+                except LLMError as e:
+                    last_error = e
+                    metrics.record("llm.call", time.perf_counter() - call_started, call_started,
+                                   model=model, error=type(e).__name__)
+                    metrics.count("llm.errors", model=model, error=type(e).__name__)
+                    if started or not e.retryable:
+                        raise
+                    if attempt < self.max_retries:
+                        self._wait(model, attempt, e)
+            if model != self._models()[-1]:
+                metrics.count("llm.fallbacks", model=model)
+                print(f"    🔁 {model} unavailable, falling back to {self.fallback_model}...")
+        raise last_error
+
+    def _wait(self, model, attempt, error):
+        delay = self._backoff(attempt, error)
+        kind = "Quota exceeded" if isinstance(error, LLMQuotaError) else "Transient error"
+        metrics.count("llm.retries", model=model)
+        metrics.record("llm.backoff", delay, model=model)
+        print(f"    ⏳ {kind} on {model}. Retrying in {delay:.1f}s "
+              f"({attempt + 1}/{self.max_retries})...")
+        time.sleep(delay)
+
+
+def create_backend(provider="gemini", base_url=None, api_key_env=None, timeout=120):
+    """
+    Build a backend by name.
+
+    Args:
+        provider: "gemini" or "openai" (any OpenAI-compatible server)
+        base_url: Server URL for the openai provider
+        api_key_env: Environment variable holding the API key
+        timeout: Request timeout in seconds (openai provider)
+    """
+    if provider == "gemini":
+        return GeminiBackend(api_key=os.environ.get(api_key_env or "GEMINI_API_KEY"))
+    if provider == "openai":
+        return OpenAICompatibleBackend(
+            base_url=base_url or "http://127.0.0.1:8808/v1",
+            api_key=os.environ.get(api_key_env or "OPENAI_API_KEY"),
+            timeout=timeout,
+        )
+    raise ValueError(f"Unknown LLM provider: {provider!r} (expected 'gemini' or 'openai')")
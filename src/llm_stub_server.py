@@ -0,0 +1,213 @@
+"""
+LLM Stub Server
+===============
+A local OpenAI-compatible chat-completions server that answers with canned
+newsletter HTML, for exercising the pipeline offline (no API key, no quota).
+
+Latency and failures are configurable, so retry, fallback and streaming
+behaviour can be load-tested:
+
+    python -m src.llm_stub_server --port 8808 --latency 1.5 --error-rate 0.1 --rate-limit-rate 0.2
+
+Then point the newsletter at it in config/settings.yaml:
+
+    llm:
+      provider: openai
+      base_url: http://127.0.0.1:8808/v1
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ITEM_RE = re.compile(
+    r"ITEM #(\d+): (.*)\nSOURCE URL \(Article/Link\): (.*)\nREDDIT THREAD \(Comments\): (.*)\n"
+)
+
+STORY_TEMPLATE = """<div style="margin-bottom: 25px;">
+    <h3 style="color: #1a1a1a; margin-bottom: 5px;">{title}</h3>
+    <p style="color: #333; line-height: 1.6;">A canned analysis from the stub server. {filler}</p>
+    <p style="font-size: 14px; margin-top: 5px;">
+        <a href="{url}" style="color: #990000; font-weight: bold; text-decoration: none;">[Read Article]</a>
+        <span style="color: #ccc;">|</span>
+        <a href="{reddit_link}" style="color: #666; text-decoration: none;">[Discuss on Reddit]</a>
+    </p>
+</div>
+"""
+
+FILLER = "The market, as ever, has priced in everything except what actually happens next. "
+
+
+def canned_reply(system_instruction, content, stories=5):
+    """
+    Build a plausible reply for a request: an ITEM number list for
+    shortlisting calls, otherwise newsletter HTML for the first few items.
+    """
+    items = _ITEM_RE.findall(content)
+    if "ITEM numbers" in system_instruction:
+        return json.dumps([int(number) for number, *_ in items[:stories]])
+
+    html = ["<h2>This Week in Tech</h2>\n"]
+    for _, title, url, reddit_link in items[:stories]:
+        html.append(STORY_TEMPLATE.format(
+            title=title.strip(), url=url.strip(), reddit_link=reddit_link.strip(), filler=FILLER * 2
+        ))
+    if len(html) == 1:
+        html.append("<p>Nothing of note this week.</p>\n")
+    return "".join(html)
+
+
+class StubSettings:
+    """Behaviour knobs shared by all request handlers."""
+
+    def __init__(self, latency=0.5, chunk_delay=0.01, chunk_chars=40, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, stories=5, seed=None):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stories = stories
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def roll(self):
+        """Decide the fate of one request: 'error', 'rate_limit' or 'ok'."""
+        with self._lock:
+            self.requests += 1
+            r = self._random.random()
+        if r < self.error_rate:
+            return "error"
+        if r < self.error_rate + self.rate_limit_rate:
+            return "rate_limit"
+        return "ok"
+
+
+def make_handler(settings):
+    """Request handler class bound to `settings`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "invalid JSON"}})
+                return
+
+            time.sleep(settings.latency)
+            fate = settings.roll()
+            if fate == "error":
+                self._send_json(500, {"error": {"message": "injected server error"}})
+                return
+            if fate == "rate_limit":
+                self._send_json(429, {"error": {"message": "injected rate limit"}},
+                                {"Retry-After": str(settings.retry_after)})
+                return
+
+            messages = request.get("messages", [])
+            system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+            user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+            reply = canned_reply(system, user, settings.stories)
+            model = request.get("model", "stub")
+
+            if request.get("stream"):
+                self._stream(reply, model)
+            else:
+                self._send_json(200, {
+                    "object": "chat.completion",
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                })
+
+        def _stream(self, reply, model):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            step = max(1, settings.chunk_chars)
+            for start in range(0, len(reply), step):
+                event = {"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": reply[start:start + step]}}]}
+                self._write_chunk(f"data: {json.dumps(event)}\n\n")
+                time.sleep(settings.chunk_delay)
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8808, **settings):
+    """
+    Start the stub server in a background thread.
+
+    Returns:
+        The running ThreadingHTTPServer (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(StubSettings(**settings)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="llm-stub").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first byte")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="Seconds between streamed chunks")
+    parser.add_argument("--chunk-chars", type=int, default=40, help="Characters per streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--stories", type=int, default=5, help="Stories per canned newsletter")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible failures")
+    args = parser.parse_args()
+
+    server = serve(
+        args.host, args.port,
+        latency=args.latency, chunk_delay=args.chunk_delay, chunk_chars=args.chunk_chars,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, stories=args.stories, seed=args.seed,
+    )
+    print(f"🧪 LLM stub server on http://{args.host}:{args.port}/v1 "
+          f"(latency {args.latency}s, errors {args.error_rate:.0%}, 429s {args.rate_limit_rate:.0%})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Mail Spool
+==========
+A durable outbox for rendered newsletters. Generation only has to get the
+message into the spool; delivery happens from there and can be retried
+on its own (`python main.py --flush-spool`) after an SMTP outage, without
+fetching or calling the LLM again.
+
+Layout (one entry per Message-ID):
+
+    data/spool/queue/<key>.eml    rendered message, waiting for delivery
+    data/spool/queue/<key>.json   recipients, delivery progress, next retry
+    data/spool/sent/<key>.json    finished entries (kept so a re-run of the
+                                  same issue is not sent twice)
+    data/spool/failed/<key>.*     entries that ran out of attempts
+
+Each recipient's outcome is written to the entry's record as soon as the
+server answers, so a retried entry (even after a crash part-way through
+the list) is only sent to the recipients still missing it.
+"""
+
+import hashlib
+import json
+import os
+import random
+import smtplib
+import time
+from pathlib import Path
+
+from src import email_sender
+
+
+def _write_atomic(path, data):
+    """Write bytes so a crash never leaves a half-written file behind."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class MailSpool:
+    """On-disk outbox with retries, backoff and per-Message-ID dedup."""
+
+    def __init__(self, directory, max_attempts=5, base_delay=300, max_delay=6 * 3600):
+        self.directory = Path(directory)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_dir = self.directory / "queue"
+        self.sent_dir = self.directory / "sent"
+        self.failed_dir = self.directory / "failed"
+        for d in (self.queue_dir, self.sent_dir, self.failed_dir):
+            d.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _key(message_id):
+        return hashlib.sha256(message_id.encode("utf-8")).hexdigest()[:24]
+
+    def _save(self, key, meta):
+        _write_atomic(self.queue_dir / f"{key}.json", json.dumps(meta, indent=2).encode("utf-8"))
+
+    def enqueue(self, rendered, message_id, sender, recipients, subject=""):
+        """
+        Add a rendered message to the spool.
+
+        Args:
+            rendered: Message bytes from email_sender.render_message()
+            message_id: The message's Message-ID (the dedup key)
+            sender: Envelope sender
+            recipients: List of addresses
+            subject: For status output only
+
+        Returns:
+            True if queued, False if this Message-ID is already queued or sent
+        """
+        key = self._key(message_id)
+        if any((d / f"{key}.json").exists() for d in (self.queue_dir, self.sent_dir)):
+            return False
+
+        now = time.time()
+        _write_atomic(self.queue_dir / f"{key}.eml", rendered)
+        self._save(key, {
+            "message_id": message_id,
+            "subject": subject,
+            "sender": sender,
+            "recipients": list(recipients),
+            "delivered": [],
+            "rejected": [],
+            "errors": {},
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        })
+        return True
+
+    def queued(self):
+        """Metadata of every entry still waiting for delivery, oldest first."""
+        entries = []
+        for path in self.queue_dir.glob("*.json"):
+            try:
+                meta = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            meta["key"] = path.stem
+            entries.append(meta)
+        return sorted(entries, key=lambda m: m["created_at"])
+
+    def status(self, message_id):
+        """
+        Where a message stands in the spool.
+
+        Returns:
+            Tuple of (state, metadata): state is 'queued', 'sent', 'failed'
+            or None if the spool has no record of the message
+        """
+        key = self._key(message_id)
+        for state, directory in (("queued", self.queue_dir), ("sent", self.sent_dir), ("failed", self.failed_dir)):
+            path = directory / f"{key}.json"
+            try:
+                return state, json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+        return None, None
+
+    def _backoff(self, attempts):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.75, 1.0)
+
+    def _move(self, key, destination):
+        for suffix in (".json", ".eml"):
+            source = self.queue_dir / f"{key}{suffix}"
+            if not source.exists():
+                continue
+            if destination is self.sent_dir and suffix == ".eml":
+                source.unlink()  # Only the record is needed once delivered
+            else:
+                os.replace(source, destination / source.name)
+
+    def flush(self, password, force=False):
+        """
+        Try to deliver every queued entry whose retry time has come.
+
+        Args:
+            password: SMTP password (see email_sender.credentials())
+            force: Ignore retry times and try every queued entry now
+
+        Returns:
+            Dictionary with counts: 'delivered' and 'failed' recipients,
+            'completed', 'deferred' (not due yet), 'pending' (still queued
+            after this flush) and 'abandoned' (out of attempts) entries
+        """
+        summary = {"delivered": 0, "failed": 0, "completed": 0, "deferred": 0, "pending": 0, "abandoned": 0}
+        now = time.time()
+
+        for meta in self.queued():
+            key = meta.pop("key")
+            if not force and meta["next_attempt_at"] > now:
+                summary["deferred"] += 1
+                continue
+
+            done = set(meta["delivered"]) | set(meta["rejected"])
+            remaining = [r for r in meta["recipients"] if r not in done]
+            recorded = set()
+
+            def record(recipient, error):
+                # Saved per recipient, so a crash mid-list never re-sends to anyone accepted
+                recorded.add(recipient)
+                if error is None:
+                    meta["delivered"].append(recipient)
+                    meta["errors"].pop(recipient, None)
+                    summary["delivered"] += 1
+                else:
+                    meta["errors"][recipient] = error
+                    summary["failed"] += 1
+                    if email_sender.is_permanent_failure(error):
+                        meta["rejected"].append(recipient)
+                self._save(key, meta)
+
+            auth_failed = False
+            failure = "Not attempted"
+            if remaining:
+                try:
+                    rendered = (self.queue_dir / f"{key}.eml").read_bytes()
+                    email_sender.deliver(rendered, meta["sender"], password, remaining, on_result=record)
+                except smtplib.SMTPAuthenticationError:
+                    auth_failed = True
+                    failure = "Not attempted (authentication failed)"
+                except Exception as e:
+                    failure = f"Delivery failed: {e}"
+                for r in remaining:
+                    if r not in recorded:
+                        record(r, failure)
+
+            meta["attempts"] += 1
+            meta["last_attempt_at"] = now
+            done = set(meta["delivered"]) | set(meta["rejected"])
+            if all(r in done for r in meta["recipients"]):
+                self._save(key, meta)
+                self._move(key, self.sent_dir)
+                summary["completed"] += 1
+            elif meta["attempts"] >= self.max_attempts:
+                self._save(key, meta)
+                self._move(key, self.failed_dir)
+                summary["abandoned"] += 1
+            else:
+                meta["next_attempt_at"] = now + self._backoff(meta["attempts"])
+                self._save(key, meta)
+
+            if auth_failed:
+                # Same credentials for every entry: no point trying the rest now
+                print("    ❌ Authentication failed. Check your email/app password.")
+                break
+
+        summary["pending"] = sum(1 for _ in self.queue_dir.glob("*.json"))
+        return summary
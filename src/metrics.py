@@ -0,0 +1,224 @@
+"""
+Metrics
+=======
+Lightweight, thread-safe instrumentation for one run.
+
+    with metrics.span("fetch", subreddit="LocalLLaMA"):   # timed section
+        ...
+    metrics.count("http.bytes", len(body))               # counter
+    metrics.record("llm.first_token", seconds)           # duration measured elsewhere
+
+Spans are aggregated by name (count, total, max) and the first
+TIMELINE_LIMIT are also kept individually with their labels. At the end
+of a run the results are written as a JSON report and, optionally, a
+Prometheus textfile (for node_exporter's textfile collector).
+
+profile() additionally captures cProfile and tracemalloc output.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Individual spans kept for the report's timeline (aggregates are always complete)
+TIMELINE_LIMIT = 5000
+
+_lock = threading.Lock()
+_state = {}
+
+
+def reset():
+    """Start recording a new run."""
+    with _lock:
+        _state.update(
+            started_at=time.time(),
+            started=time.perf_counter(),
+            spans={},
+            timeline=[],
+            counters={},
+            info={},
+        )
+
+
+reset()
+
+
+def annotate(**info):
+    """Attach run information (run ID, newsletters...) to the report."""
+    with _lock:
+        _state["info"].update(info)
+
+
+def record(name, seconds, started=None, **labels):
+    """Record a duration measured by the caller under span `name`."""
+    thread = threading.current_thread().name
+    with _lock:
+        stats = _state["spans"].setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "errors": 0})
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        if labels.get("error"):
+            stats["errors"] += 1
+        if len(_state["timeline"]) < TIMELINE_LIMIT:
+            offset = (started if started is not None else time.perf_counter() - seconds) - _state["started"]
+            _state["timeline"].append({
+                "span": name,
+                "start": round(offset, 6),
+                "seconds": round(seconds, 6),
+                "thread": thread,
+                **labels,
+            })
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the enclosed block as span `name` (also recorded if it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        record(name, time.perf_counter() - started, started, error=type(e).__name__, **labels)
+        raise
+    record(name, time.perf_counter() - started, started, **labels)
+
+
+def count(name, value=1, **labels):
+    """Add `value` to counter `name` (one series per distinct set of labels)."""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _state["counters"][key] = _state["counters"].get(key, 0) + value
+
+
+def snapshot():
+    """Everything recorded so far, as a JSON-serializable dictionary."""
+    with _lock:
+        counters = {}
+        for (name, labels), value in sorted(_state["counters"].items()):
+            counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {
+            "started_at": datetime.fromtimestamp(_state["started_at"]).isoformat(timespec="seconds"),
+            "duration_seconds": round(time.perf_counter() - _state["started"], 6),
+            "info": dict(_state["info"]),
+            "spans": {name: dict(stats) for name, stats in sorted(_state["spans"].items())},
+            "counters": counters,
+            "timeline": list(_state["timeline"]),
+        }
+
+
+def counter_total(name):
+    """Sum of counter `name` over all its labels."""
+    with _lock:
+        return sum(value for (n, _), value in _state["counters"].items() if n == name)
+
+
+def _write_atomic(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_report(path):
+    """
+    Write the JSON run report.
+
+    Returns:
+        The report dictionary
+    """
+    report = snapshot()
+    _write_atomic(Path(path), json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    return report
+
+
+def _metric_name(name):
+    return "newsletter_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def write_prometheus(path):
+    """Write counters and span aggregates in the Prometheus text exposition format."""
+    report = snapshot()
+    lines = [
+        "# HELP newsletter_run_duration_seconds Duration of the last run.",
+        "# TYPE newsletter_run_duration_seconds gauge",
+        f"newsletter_run_duration_seconds {report['duration_seconds']}",
+        "# HELP newsletter_last_run_timestamp_seconds When the last run finished.",
+        "# TYPE newsletter_last_run_timestamp_seconds gauge",
+        f"newsletter_last_run_timestamp_seconds {time.time():.0f}",
+        "# HELP newsletter_span_seconds Time spent per pipeline span in the last run.",
+        "# TYPE newsletter_span_seconds summary",
+    ]
+    for name, stats in report["spans"].items():
+        labels = _label_text({"span": name})
+        lines.append(f"newsletter_span_seconds_sum{labels} {stats['total']:.6f}")
+        lines.append(f"newsletter_span_seconds_count{labels} {stats['count']}")
+    for name, series in report["counters"].items():
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        for item in series:
+            lines.append(f"{metric}{_label_text(item['labels'])} {item['value']}")
+    _write_atomic(Path(path), "\n".join(lines) + "\n")
+
+
+@contextmanager
+def profile(directory, top=25):
+    """
+    Profile the enclosed block with cProfile and tracemalloc.
+
+    cProfile only sees the calling thread, so time spent in worker threads
+    shows up as waiting in the code that started them (see the spans for
+    the per-thread picture).
+
+    Writes <directory>/profile-<timestamp>.prof (open with `python -m pstats`
+    or snakeviz) and a readable profile-<timestamp>.txt summary, whose path
+    is printed at the end.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = f"{datetime.now():%Y%m%d-%H%M%S}"
+
+    tracemalloc.start(25)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        memory = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        prof_path = directory / f"profile-{stamp}.prof"
+        profiler.dump_stats(str(prof_path))
+
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+        out.write(f"\nMemory: peak {peak / 1024 / 1024:.1f} MB traced, {current / 1024 / 1024:.1f} MB at exit\n")
+        out.write("Top allocations still held at exit:\n")
+        for stat in memory.statistics("lineno")[:15]:
+            out.write(f"  {stat}\n")
+        text_path = directory / f"profile-{stamp}.txt"
+        text_path.write_text(out.getvalue(), encoding="utf-8")
+
+        print(f"\n🔬 Profile: peak traced memory {peak / 1024 / 1024:.1f} MB")
+        print(f"    → {text_path}")
+        print(f"    → {prof_path} (python -m pstats / snakeviz)")
@@ -0,0 +1,150 @@
+"""
+Post Ranker
+===========
+Deterministic local pre-ranking of fetched posts, so only the most
+promising candidates are sent to Gemini.
+
+Each post gets a relevance score from its Reddit score, its age and the
+reputation of the site it links to. Posts are then picked greedily: every
+pick also rewards TF-IDF novelty against what has already been picked, so
+five near-identical stories don't crowd out everything else.
+"""
+
+import math
+import re
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+# Highly reputable news sources, by domain. Also quoted in the Gemini prompt.
+REPUTABLE_SOURCES = {
+    "nytimes.com": "NYT",
+    "ft.com": "FT",
+    "theguardian.com": "Guardian",
+    "wsj.com": "WSJ",
+    "theverge.com": "TheVerge",
+    "bloomberg.com": "Bloomberg",
+    "reuters.com": "Reuters",
+    "economist.com": "The Economist",
+    "arstechnica.com": "Ars Technica",
+    "wired.com": "Wired",
+    "technologyreview.com": "MIT Technology Review",
+    "arxiv.org": "arXiv",
+}
+
+DEFAULT_WEIGHTS = {
+    "score": 1.0,
+    "recency": 0.5,
+    "reputation": 0.75,
+    "novelty": 0.5,
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+_SUBREDDIT_TAG_RE = re.compile(r"^\[r/[^\]]+\]\s*")
+_STOPWORDS = frozenset(
+    "the and for with that this from are was were has have had not but you your "
+    "its it's our out all any can new how why what when who will just about into "
+    "than then them they their there been more most some such only also over".split()
+)
+
+
+def tokenize(text):
+    """Lowercase content words of `text` (subreddit tags and stopwords removed)."""
+    text = _SUBREDDIT_TAG_RE.sub("", text or "").lower()
+    return [w for w in _WORD_RE.findall(text) if w not in _STOPWORDS]
+
+
+def domain_of(url):
+    """Registered host of `url` without a leading 'www.'."""
+    host = (urlparse(url or "").hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def is_reputable(url):
+    """True if `url` points at (a subdomain of) a reputable source."""
+    host = domain_of(url)
+    return any(host == d or host.endswith("." + d) for d in REPUTABLE_SOURCES)
+
+
+def _tfidf_vectors(posts):
+    """Unit-length TF-IDF vectors (as sparse dicts) over title + text."""
+    docs = [Counter(tokenize(f"{p.get('title', '')} {p.get('text', '')}")) for p in posts]
+    doc_freq = Counter()
+    for doc in docs:
+        doc_freq.update(doc.keys())
+
+    n = len(docs)
+    vectors = []
+    for doc in docs:
+        vec = {term: tf * math.log((1 + n) / (1 + doc_freq[term])) for term, tf in doc.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        vectors.append({t: v / norm for t, v in vec.items()} if norm else {})
+    return vectors
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+
+def rank_posts(posts, top_k=20, weights=None, recency_half_life_hours=72, now=None):
+    """
+    Rank posts and keep the best `top_k`.
+
+    Args:
+        posts: List of post dictionaries from reddit_fetcher
+        top_k: Number of posts to keep (0 or None keeps all, just reordered)
+        weights: Optional overrides for DEFAULT_WEIGHTS
+        recency_half_life_hours: Age at which the recency bonus halves
+        now: Reference Unix time (defaults to the current time)
+
+    Returns:
+        List of the selected posts, best first
+    """
+    if not posts:
+        return []
+
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    now = now if now is not None else time.time()
+    top_k = len(posts) if not top_k else min(top_k, len(posts))
+
+    max_log_score = max(math.log1p(max(p.get("score") or 0, 0)) for p in posts)
+
+    relevance = []
+    for post in posts:
+        score_part = math.log1p(max(post.get("score") or 0, 0)) / max_log_score if max_log_score else 0.0
+
+        created = post.get("created_utc")
+        if created:
+            age_hours = max(now - created, 0) / 3600
+            recency_part = 0.5 ** (age_hours / recency_half_life_hours)
+        else:
+            recency_part = 0.5
+
+        reputation_part = 1.0 if is_reputable(post.get("url")) else 0.0
+
+        relevance.append(
+            weights["score"] * score_part
+            + weights["recency"] * recency_part
+            + weights["reputation"] * reputation_part
+        )
+
+    vectors = _tfidf_vectors(posts)
+    max_similarity = [0.0] * len(posts)
+    remaining = set(range(len(posts)))
+    selected = []
+
+    while len(selected) < top_k:
+        best = min(
+            remaining,
+            key=lambda i: (-(relevance[i] + weights["novelty"] * (1 - max_similarity[i])), i),
+        )
+        selected.append(best)
+        remaining.discard(best)
+        for i in remaining:
+            sim = _cosine(vectors[best], vectors[i])
+            if sim > max_similarity[i]:
+                max_similarity[i] = sim
+
+    return [posts[i] for i in selected]
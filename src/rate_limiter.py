@@ -0,0 +1,103 @@
+"""
+Rate Limiter
+============
+Token-bucket rate limiting shared by every fetch worker.
+One bucket per host keeps us polite to Reddit no matter how many
+subreddits are being fetched in parallel.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill at `rate` per second up to `burst`. When the server
+    pushes back (HTTP 429) the bucket is paused and its rate halved, so
+    every worker sharing it slows down together. The rate then creeps
+    back to the configured value as requests succeed again.
+    """
+
+    def __init__(self, rate=1.0, burst=1):
+        self.max_rate = max(float(rate), 0.01)
+        self.rate = self.max_rate
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, wait_seconds):
+        """
+        Pause the bucket for `wait_seconds` and halve its rate.
+        Called when the host answers with 429 Too Many Requests.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + wait_seconds)
+            self._tokens = 0.0
+            self._last_refill = max(now, self._paused_until)
+            self.rate = max(self.rate / 2, self.max_rate / 16)
+
+    def reward(self):
+        """Recover 10% of the configured rate after a successful request."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+
+class HostRateLimiter:
+    """
+    Keeps one TokenBucket per host.
+
+    Hosts without an explicit limit share the default rate/burst.
+    """
+
+    def __init__(self, default_rate=1.0, default_burst=1, limits=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._limits = dict(limits or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        """Return (creating if needed) the bucket for `host`."""
+        with self._lock:
+            if host not in self._buckets:
+                limit = self._limits.get(host, {})
+                self._buckets[host] = TokenBucket(
+                    rate=limit.get("requests_per_second", self.default_rate),
+                    burst=limit.get("burst", self.default_burst),
+                )
+            return self._buckets[host]
+
+    def acquire(self, host):
+        self.bucket(host).acquire()
+
+    def penalize(self, host, wait_seconds):
+        self.bucket(host).penalize(wait_seconds)
+
+    def reward(self, host):
+        self.bucket(host).reward()
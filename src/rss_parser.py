@@ -0,0 +1,116 @@
+"""
+Streaming RSS/Atom Parser
+=========================
+Pull-parses Reddit's Atom feeds entry by entry with ElementTree's
+XMLPullParser. Posts are yielded as soon as their <entry> closes, and
+parsing stops once `limit` posts have been produced, so the rest of a
+large feed is never touched.
+"""
+
+import re
+from datetime import datetime
+from xml.etree.ElementTree import XMLPullParser, ParseError  # noqa: F401  (re-exported)
+
+# Default cap on each post's text; the prompt builder trims further to fit its token budget
+DEFAULT_MAX_TEXT_CHARS = 2000
+
+# Feed text is handed to the parser in chunks of this many characters
+CHUNK_SIZE = 64 * 1024
+
+_EXT_LINK_RE = re.compile(r'<a href="([^"]+)">\[link\]</a>')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _local_name(tag):
+    """Strip the '{namespace}' prefix from an element tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_timestamp(value):
+    """Convert an Atom ISO-8601 timestamp to a Unix timestamp (None if unparseable)."""
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def iter_rss_posts(xml_content, limit=None, max_text_chars=DEFAULT_MAX_TEXT_CHARS):
+    """
+    Yield post dictionaries from a Reddit Atom feed.
+
+    Args:
+        xml_content: Feed document as a string
+        limit: Stop after this many posts (None for all)
+        max_text_chars: Maximum length of each post's 'text'
+
+    Yields:
+        Dictionaries with 'title', 'score', 'url', 'reddit_link', 'text'
+        and 'created_utc'
+
+    Raises:
+        ParseError: If the document is not well-formed XML
+    """
+    if limit is not None and limit <= 0:
+        return
+
+    parser = XMLPullParser(events=("end",))
+    produced = 0
+
+    for start in range(0, len(xml_content), CHUNK_SIZE):
+        parser.feed(xml_content[start:start + CHUNK_SIZE])
+
+        for _, elem in parser.read_events():
+            if _local_name(elem.tag) != "entry":
+                continue
+
+            yield _entry_to_post(elem, max_text_chars)
+            elem.clear()  # Free the subtree; we never look at it again
+
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+
+    parser.close()
+
+
+def _entry_to_post(entry, max_text_chars):
+    """Convert one <entry> element into a post dictionary."""
+    title = None
+    reddit_link = None
+    content_html = None
+    published = None
+
+    for child in entry:
+        name = _local_name(child.tag)
+        if name == "title" and title is None:
+            title = child.text or ""
+        elif name == "link" and reddit_link is None and child.get("href"):
+            reddit_link = child.get("href")
+        elif name == "content" and content_html is None:
+            content_html = child.text or ""
+        elif name == "published" and published is None:
+            published = child.text
+
+    reddit_link = reddit_link or ""
+    external_url = reddit_link  # Default to reddit link
+    content = ""
+
+    if content_html is not None:
+        # Try to extract external link from content
+        ext_link_match = _EXT_LINK_RE.search(content_html)
+        if ext_link_match:
+            potential_url = ext_link_match.group(1)
+            if not potential_url.startswith("https://www.reddit.com"):
+                external_url = potential_url
+
+        # Extract text (strip HTML)
+        content = _TAG_RE.sub('', content_html)[:max_text_chars]
+
+    return {
+        "title": title if title is not None else "Untitled",
+        "score": 0,  # RSS doesn't include score
+        "url": external_url,
+        "reddit_link": reddit_link,
+        "text": content.strip(),
+        "created_utc": parse_timestamp(published)
+    }
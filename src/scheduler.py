@@ -0,0 +1,188 @@
+"""
+Scheduler
+=========
+A small in-process cron for `main.py --daemon`.
+
+Schedules use standard five-field cron syntax, evaluated in local time:
+
+    minute  hour  day-of-month  month  day-of-week
+    0       8     *             *      mon          -> every Monday at 08:00
+
+Fields accept *, numbers, ranges (1-5), lists (1,15), steps (*/15, 9-17/2)
+and month/day names (jan, mon). As in cron, when both day-of-month and
+day-of-week are restricted, a day matching either one fires. The aliases
+@hourly, @daily, @weekly, @monthly and @yearly are also understood.
+"""
+
+from datetime import datetime, timedelta
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+
+_MONTH_NAMES = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_DAY_NAMES = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+
+# (name, lowest, highest, names mapped to values)
+_FIELDS = [
+    ("minute", 0, 59, {}),
+    ("hour", 0, 23, {}),
+    ("day of month", 1, 31, {}),
+    ("month", 1, 12, {name: i for i, name in enumerate(_MONTH_NAMES, 1)}),
+    ("day of week", 0, 7, {name: i for i, name in enumerate(_DAY_NAMES)}),
+]
+
+
+def _parse_value(text, names, field_name):
+    text = text.lower()
+    if text in names:
+        return names[text]
+    if not text.isdigit():
+        raise ValueError(f"invalid {field_name} value {text!r}")
+    return int(text)
+
+
+def _parse_field(text, field_name, lowest, highest, names):
+    """Set of values one cron field allows."""
+    values = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text.isdigit() else None
+        if step_text and not step:
+            raise ValueError(f"invalid step in {field_name} {part!r}")
+
+        if base == "*":
+            start, end = lowest, highest
+        elif "-" in base:
+            start_text, end_text = base.split("-", 1)
+            start = _parse_value(start_text, names, field_name)
+            end = _parse_value(end_text, names, field_name)
+        else:
+            start = _parse_value(base, names, field_name)
+            end = highest if step else start
+
+        if not (lowest <= start <= highest and lowest <= end <= highest) or start > end:
+            raise ValueError(f"{field_name} {part!r} is outside {lowest}-{highest}")
+        values.update(range(start, end + 1, step or 1))
+    return values
+
+
+class CronSchedule:
+    """A parsed cron expression."""
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        text = ALIASES.get(self.expression.lower(), self.expression)
+        parts = text.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron expression {expression!r} needs 5 fields "
+                             "(minute hour day-of-month month day-of-week)")
+
+        parsed = [
+            _parse_field(part, name, lowest, highest, names)
+            for part, (name, lowest, highest, names) in zip(parts, _FIELDS)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}  # 7 is Sunday too
+        self._days_restricted = parts[2] != "*"
+        self._weekdays_restricted = parts[4] != "*"
+
+    def _day_matches(self, dt):
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def matches(self, dt):
+        """True if the schedule fires in the minute containing `dt`."""
+        return (dt.minute in self.minutes and dt.hour in self.hours
+                and dt.month in self.months and self._day_matches(dt))
+
+    def next_after(self, dt):
+        """The first minute strictly after `dt` at which the schedule fires."""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 8)  # Long enough for Feb 29 schedules
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"cron expression {self.expression!r} never fires")
+
+    def __repr__(self):
+        return f"CronSchedule({self.expression!r})"
+
+
+def parse_cron(expression):
+    """Parse a cron expression (raises ValueError with a readable message if invalid)."""
+    schedule = CronSchedule(expression)
+    schedule.next_after(datetime(2000, 1, 1))  # Reject expressions that can never fire
+    return schedule
+
+
+def run_forever(get_jobs, stop_event, on_idle=None, poll_seconds=30):
+    """
+    Run jobs at their scheduled times until `stop_event` is set.
+
+    A job that is running when the stop is requested is allowed to finish.
+    Slots missed while another job was running are skipped, not queued.
+
+    Args:
+        get_jobs: Callable returning a list of (name, CronSchedule, action)
+            tuples. Called every cycle, so schedule edits apply without a restart.
+        stop_event: threading.Event that ends the loop
+        on_idle: Optional callable run every cycle between jobs (housekeeping)
+        poll_seconds: Longest sleep between cycles
+    """
+    next_runs = {}
+
+    while not stop_event.is_set():
+        jobs = get_jobs()
+        now = datetime.now()
+
+        active = set()
+        for name, schedule, _ in jobs:
+            key = (name, schedule.expression)
+            active.add(key)
+            if key not in next_runs:
+                next_runs[key] = schedule.next_after(now)
+                print(f"🗓️  {name} ({schedule.expression}): next run {next_runs[key]:%a %Y-%m-%d %H:%M}")
+        for key in set(next_runs) - active:
+            del next_runs[key]
+
+        for name, schedule, action in jobs:
+            key = (name, schedule.expression)
+            if stop_event.is_set() or next_runs[key] > datetime.now():
+                continue
+            print(f"\n⏰ {datetime.now():%Y-%m-%d %H:%M} — running '{name}'")
+            try:
+                action()
+            except Exception as e:
+                print(f"🔥 '{name}' failed: {e}")
+            next_runs[key] = schedule.next_after(datetime.now())
+            print(f"🗓️  {name}: next run {next_runs[key]:%a %Y-%m-%d %H:%M}")
+
+        if on_idle and not stop_event.is_set():
+            try:
+                on_idle()
+            except Exception as e:
+                print(f"⚠️  Housekeeping failed: {e}")
+
+        until_next = min(
+            ((t - datetime.now()).total_seconds() for t in next_runs.values()),
+            default=poll_seconds,
+        )
+        stop_event.wait(max(1.0, min(poll_seconds, until_next)))
@@ -0,0 +1,123 @@
+"""
+Seen-Post Index
+===============
+A small SQLite index of every post we have fetched and every post that
+made it into a delivered newsletter. Posts already published are dropped
+before curation, so long-running top posts are not sent to Gemini (or to
+readers) week after week.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.reddit_fetcher import post_id
+
+SECONDS_PER_WEEK = 7 * 24 * 3600
+
+
+class SeenIndex:
+    """SQLite-backed record of fetched and published posts."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._published = None
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS posts (
+                    post_id TEXT PRIMARY KEY,
+                    reddit_link TEXT NOT NULL,
+                    title TEXT,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    published_at REAL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_posts_last_seen ON posts (last_seen)"
+            )
+
+    def published_ids(self):
+        """Set of IDs of every post already published (loaded once, then kept in sync)."""
+        with self._lock:
+            if self._published is None:
+                rows = self._conn.execute(
+                    "SELECT post_id FROM posts WHERE published_at IS NOT NULL"
+                )
+                self._published = {row[0] for row in rows}
+            return self._published
+
+    def record_fetched(self, posts):
+        """Remember that these posts were fetched now."""
+        now = time.time()
+        rows = [(post_id(p), p.get("reddit_link", ""), p.get("title", ""), now, now) for p in posts]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO posts (post_id, reddit_link, title, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(post_id) DO UPDATE SET last_seen = excluded.last_seen
+                """,
+                rows,
+            )
+
+    def filter_unpublished(self, posts):
+        """
+        Drop posts that were already published.
+
+        Returns:
+            Tuple of (posts still eligible, number of posts skipped)
+        """
+        published = self.published_ids()
+        fresh = [p for p in posts if post_id(p) not in published]
+        return fresh, len(posts) - len(fresh)
+
+    def mark_published(self, posts):
+        """Record these posts as delivered in a newsletter."""
+        now = time.time()
+        ids = [post_id(p) for p in posts]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE posts SET published_at = ? WHERE post_id = ? AND published_at IS NULL",
+                [(now, pid) for pid in ids],
+            )
+            if self._published is not None:
+                self._published.update(ids)
+
+    def prune(self, retention_weeks):
+        """
+        Forget posts not seen or published within `retention_weeks`.
+
+        Returns:
+            Number of entries removed
+        """
+        cutoff = time.time() - retention_weeks * SECONDS_PER_WEEK
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM posts WHERE last_seen < ? AND COALESCE(published_at, 0) < ?",
+                (cutoff, cutoff),
+            )
+            self._published = None
+        return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+def published_posts(posts, newsletter_html):
+    """
+    Posts whose Reddit thread is linked from the generated newsletter.
+    For collapsed duplicates every crosspost in 'discussions' counts as published.
+    """
+    published = []
+    for post in posts:
+        if post.get("reddit_link") and post["reddit_link"] in newsletter_html:
+            published.append(post)
+            published.extend(post.get("discussions", [])[1:])
+    return published